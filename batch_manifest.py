@@ -0,0 +1,122 @@
+"""
+Batch Manifest
+Records processed files in the output folder so reruns skip unchanged images
+"""
+
+import json
+import os
+from pathlib import Path
+from config import MANIFEST_FILE_NAME
+
+
+class BatchManifest:
+    """
+    Append-only record of processed files
+
+    One JSON line per finished file, keyed on its path relative to the input
+    folder. An entry is current while the file's size and mtime and the
+    model fingerprint are unchanged. Lines are flushed as files finish, so
+    an interrupted run resumes after the last recorded file.
+    """
+
+    def __init__(self, input_folder, output_folder, fingerprint):
+        """
+        Initialize manifest
+
+        Args:
+            input_folder: Folder the image paths are relative to
+            output_folder: Folder holding the manifest file
+            fingerprint: Model and threshold fingerprint of this run
+        """
+        self.input_folder = Path(input_folder)
+        self.path = Path(output_folder) / MANIFEST_FILE_NAME
+        self.fingerprint = fingerprint
+        self.entries = {}
+        self.file = None
+        self.load()
+
+    def load(self):
+        """Read existing entries, later lines replacing earlier ones"""
+        if not self.path.exists():
+            return
+        line_count = 0
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Partial last line of an interrupted run
+                self.entries[entry['path']] = entry
+                line_count += 1
+
+        # Drop superseded lines once they outnumber the live entries
+        if line_count > 2 * len(self.entries):
+            self.rewrite()
+
+    def rewrite(self):
+        """Replace the manifest file with one line per current entry"""
+        temp_path = self.path.with_suffix('.tmp')
+        with open(temp_path, 'w') as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry) + '\n')
+        os.replace(temp_path, self.path)
+
+    def key(self, img_path):
+        """Manifest key of an image path"""
+        try:
+            return Path(img_path).relative_to(self.input_folder).as_posix()
+        except ValueError:
+            return Path(img_path).as_posix()
+
+    def is_current(self, img_path, dir_entry=None):
+        """
+        Check whether a file was processed successfully and is unchanged since
+
+        Args:
+            img_path: Path to image file
+            dir_entry: Optional os.DirEntry of the file from a folder scan whose
+                stat() is used; on Windows that comes free with the directory
+                listing, on POSIX it is still one stat call
+
+        Returns:
+            True if the file can be skipped
+        """
+        entry = self.entries.get(self.key(img_path))
+        if entry is None or not entry['ok'] or entry['fingerprint'] != self.fingerprint:
+            return False
+        try:
+            stat = dir_entry.stat() if dir_entry is not None else os.stat(img_path)
+        except OSError:
+            return False
+        return entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns
+
+    def record(self, img_path, success):
+        """
+        Append the outcome of one file
+
+        Args:
+            img_path: Path to image file
+            success: Whether its output was saved
+        """
+        try:
+            stat = os.stat(img_path)
+        except OSError:
+            return
+        entry = {
+            'path': self.key(img_path),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'fingerprint': self.fingerprint,
+            'ok': bool(success)
+        }
+        self.entries[entry['path']] = entry
+        if self.file is None:
+            self.file = open(self.path, 'a')
+        self.file.write(json.dumps(entry) + '\n')
+        self.file.flush()
+
+    def close(self):
+        """Close the manifest file"""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
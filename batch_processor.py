@@ -3,41 +3,246 @@ Batch Processor
 Handles batch processing of multiple images
 """
 
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from itertools import chain, islice
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
 from pathlib import Path
-from config import IMAGE_EXTENSIONS, OUTPUT_FOLDER_NAME, OUTPUT_IMAGE_PREFIX
+from config import (IMAGE_EXTENSIONS, OUTPUT_FOLDER_NAME, OUTPUT_IMAGE_PREFIX,
+                    BATCH_SIZE, READER_THREADS, WRITER_THREADS, PREFETCH_SIZE,
+                    WRITE_QUEUE_SIZE, BATCH_WORKERS, BATCH_SHARD_SIZE, BATCH_RESUME,
+                    BATCH_RECURSIVE, DETECTIONS_ONLY, DETECTIONS_FORMAT, IMAGE_SIZE,
+                    REDUCED_DECODE, REDUCED_DECODE_ANNOTATE_REDUCED, BATCH_DEDUP)
+from batch_manifest import BatchManifest
+from detection_writer import create_detection_writer, WRITERS
 from image_processor import ImageProcessor
+from near_duplicates import NearDuplicateIndex
+from result_analyzer import ResultsAnalyzer
+
+# Per-process state, created once by init_worker
+worker_batch_processor = None
+worker_progress_queue = None
+worker_control = None
+
+
+class JobControl:
+    """
+    Cancel and pause flags checked by a running batch job between batches
+    
+    The events may be multiprocessing manager events so worker processes
+    can share them.
+    """
+    
+    def __init__(self, cancel_event=None, run_event=None):
+        """
+        Initialize job control
+        
+        Args:
+            cancel_event: Event set to cancel (defaults to a threading.Event)
+            run_event: Event cleared while paused (defaults to a threading.Event)
+        """
+        self.cancel_event = cancel_event or threading.Event()
+        self.run_event = run_event or threading.Event()
+        self.run_event.set()
+    
+    def cancel(self):
+        """Stop the job after the batch in progress; also ends a pause"""
+        self.cancel_event.set()
+        self.run_event.set()
+    
+    def pause(self):
+        """Hold the job before its next batch"""
+        if not self.is_cancelled():
+            self.run_event.clear()
+    
+    def resume(self):
+        """Continue a paused job"""
+        self.run_event.set()
+    
+    def is_cancelled(self):
+        """Check whether the job was cancelled"""
+        return self.cancel_event.is_set()
+    
+    def is_paused(self):
+        """Check whether the job is paused"""
+        return not self.run_event.is_set()
+    
+    def wait_if_paused(self):
+        """
+        Block while paused
+        
+        Returns:
+            True to continue, False if the job was cancelled
+        """
+        self.run_event.wait()
+        return not self.is_cancelled()
+
+
+def init_worker(threads_per_worker, progress_queue, reduced_decode=False, control=None,
+                dedup=False, model_settings=None):
+    """
+    Load a BatchProcessor with its own model in a worker process
+    
+    Args:
+        threads_per_worker: torch intra-op threads for this worker
+        progress_queue: Queue receiving (path, success, detection_record) per
+            finished image; detection_record is (image_shape, detections), or
+            None if the image could not be analyzed
+        reduced_decode: Decode oversized images at reduced resolution
+        control: JobControl on manager events, shared with the parent
+        dedup: Reuse detections for near-duplicate images within a shard
+        model_settings: Parent ModelHandler.worker_settings(), so workers run
+            the same backend and quantization
+    """
+    global worker_batch_processor, worker_progress_queue, worker_control
+    
+    from model_handler import create_worker_model_handler
+    
+    worker_batch_processor = BatchProcessor(
+        create_worker_model_handler(threads_per_worker, model_settings), reduced_decode, dedup
+    )
+    worker_progress_queue = progress_queue
+    worker_control = control
+
+
+def process_shard(image_files, output_folder, render=True):
+    """
+    Process a shard of files in a worker process
+    
+    Detections travel back with the progress items, so the parent process
+    owns the detections file and the session statistics.
+    
+    Returns:
+        Tuple (images processed successfully, images deduplicated)
+    """
+    detection_records = {}
+    
+    def keep_detections(img_path, image_shape, detections):
+        detection_records[img_path] = (image_shape, detections)
+    
+    def forward_result(img_path, success):
+        worker_progress_queue.put((str(img_path), success,
+                                   detection_records.pop(img_path, None)))
+    
+    success_count = worker_batch_processor.process_files(
+        image_files, output_folder, result_callback=forward_result,
+        detection_callback=keep_detections, render=render, control=worker_control
+    )
+    return success_count, worker_batch_processor.last_deduplicated
 
 
 class BatchProcessor:
     """Handles batch processing of images"""
     
-    def __init__(self, model_handler):
+    def __init__(self, model_handler, reduced_decode=None, dedup=None):
         """
         Initialize batch processor
         
         Args:
             model_handler: ModelHandler instance for inference
+            reduced_decode: Decode images larger than IMAGE_SIZE at 1/2, 1/4 or
+                1/8 resolution when nothing is drawn at full size; boxes are
+                still reported in original pixels (defaults to REDUCED_DECODE)
+            dedup: Run inference once per cluster of near-identical images
+                (by dHash) and reuse its detections for the others (defaults
+                to BATCH_DEDUP)
         """
         self.model_handler = model_handler
+        self.reduced_decode = REDUCED_DECODE if reduced_decode is None else reduced_decode
+        self.dedup = BATCH_DEDUP if dedup is None else dedup
+        # Counts of the last process_folder run: found, skipped, processed,
+        # succeeded, deduplicated
+        self.last_run_stats = {}
+        self.last_deduplicated = 0  # Images of the last run that reused detections
+        self.last_detections_path = None
+        
+    @staticmethod
+    def scan_image_entries(folder_path, recursive=False):
+        """
+        Yield os.DirEntry objects of image files as the directory is read
+        
+        Lists each directory once with os.scandir, matches extensions
+        case-insensitively and skips output folders and symlinked
+        directories. Files come in directory order, not sorted, so work can
+        start before a large directory has been listed completely.
+        
+        Args:
+            folder_path: Path to folder
+            recursive: Also scan subfolders
+            
+        Yields:
+            os.DirEntry of each image file
+        """
+        extensions = {ext.lower() for ext in IMAGE_EXTENSIONS}
+        pending_dirs = [str(folder_path)]
+        while pending_dirs:
+            try:
+                entries = os.scandir(pending_dirs.pop())
+            except OSError as e:
+                print(f"Error scanning folder: {str(e)}")
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive and entry.name != OUTPUT_FOLDER_NAME:
+                            pending_dirs.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in extensions:
+                        yield entry
+    
+    @staticmethod
+    def scan_images(folder_path, recursive=False):
+        """
+        Yield image file paths as the directory is read
         
-    def find_images(self, folder_path):
+        Args:
+            folder_path: Path to folder
+            recursive: Also scan subfolders
+            
+        Yields:
+            Image file paths, in the order of scan_image_entries
+        """
+        for entry in BatchProcessor.scan_image_entries(folder_path, recursive):
+            yield Path(entry.path)
+    
+    @staticmethod
+    def find_images(folder_path, recursive=False):
         """
         Find all image files in folder
         
         Args:
             folder_path: Path to folder
+            recursive: Also search subfolders
             
         Returns:
-            List of image file paths
+            Sorted list of image file paths
         """
-        folder = Path(folder_path)
-        image_files = []
+        return sorted(BatchProcessor.scan_images(folder_path, recursive))
+    
+    @staticmethod
+    def output_path(img_path, output_folder):
+        """
+        Get the annotated image path for an input image
         
-        for ext in IMAGE_EXTENSIONS:
-            image_files.extend(folder.glob(f'*{ext}'))
-            image_files.extend(folder.glob(f'*{ext.upper()}'))
+        Images in subfolders keep their relative location, so files with the
+        same name in different subfolders don't overwrite each other.
+        
+        Args:
+            img_path: Input image path
+            output_folder: Output folder inside the input folder
             
-        return sorted(image_files)
+        Returns:
+            Path of the annotated image
+        """
+        img_path = Path(img_path)
+        try:
+            relative_dir = img_path.parent.relative_to(Path(output_folder).parent)
+        except ValueError:
+            relative_dir = Path()
+        return Path(output_folder) / relative_dir / f'{OUTPUT_IMAGE_PREFIX}{img_path.name}'
     
     def create_output_folder(self, input_folder):
         """
@@ -53,51 +258,451 @@ class BatchProcessor:
         output_folder.mkdir(exist_ok=True)
         return output_folder
     
-    def process_folder(self, folder_path, progress_callback=None):
+    def process_folder(self, folder_path, progress_callback=None, workers=None, resume=None,
+                       recursive=None, detections_only=None, detections_format=None,
+                       control=None):
         """
         Process all images in folder
         
+        The folder is scanned while images are processed, so inference starts
+        as soon as the first images are found.
+        
         Args:
             folder_path: Path to folder containing images
-            progress_callback: Optional callback function(current, total)
+            progress_callback: Optional callback function(current, total), where
+                total counts only the images that need processing and is None
+                until the scan has finished
+            workers: Worker processes, each with its own model (defaults to
+                BATCH_WORKERS; 1 processes in this process)
+            resume: Skip images the output folder's manifest records as done
+                with the same file and model fingerprint (defaults to BATCH_RESUME)
+            recursive: Also process subfolders (defaults to BATCH_RECURSIVE)
+            detections_only: Skip annotated images and write detections to a
+                detections_<time>.<format> file in the output folder instead
+                (defaults to DETECTIONS_ONLY); a resumed run writes a new file
+                holding only the images it processed
+            detections_format: 'jsonl', 'csv', 'npz', 'parquet' or 'dstore'
+                (defaults to DETECTIONS_FORMAT)
+            control: Optional JobControl to pause or cancel the job; a
+                cancelled job returns what it finished, and its unfinished
+                images are picked up by the next resumed run
             
         Returns:
-            Tuple (success_count, total_count, output_folder)
+            Tuple (success_count, total_count, output_folder); skipped images
+            count as successes since their outputs are up to date
         """
-        # Find images
-        image_files = self.find_images(folder_path)
-        total = len(image_files)
+        if resume is None:
+            resume = BATCH_RESUME
+        if recursive is None:
+            recursive = BATCH_RECURSIVE
+        if workers is None:
+            workers = BATCH_WORKERS
+        if workers == 0:
+            workers = max(1, (os.cpu_count() or 1) // 2)
+        if detections_only is None:
+            detections_only = DETECTIONS_ONLY
+        detections_format = detections_format or DETECTIONS_FORMAT
         
-        if total == 0:
+        output_folder = Path(folder_path) / OUTPUT_FOLDER_NAME
+        # Output mode and decode resolution change what a run produces
+        fingerprint = self.model_handler.fingerprint()
+        if detections_only:
+            fingerprint += '-detections'
+        if self.decodes_reduced(render=not detections_only):
+            fingerprint += '-reduced'
+        if self.dedup:
+            fingerprint += '-dedup'
+        manifest = BatchManifest(folder_path, output_folder, fingerprint)
+        found = 0
+        skipped = 0
+        
+        def pending_images():
+            nonlocal found, skipped
+            for entry in self.scan_image_entries(folder_path, recursive):
+                img_path = Path(entry.path)
+                found += 1
+                if resume and manifest.is_current(img_path, entry):
+                    skipped += 1
+                    continue
+                yield img_path
+        
+        # Look ahead one shard to choose between in-process and pooled runs
+        image_iter = pending_images()
+        head = list(islice(image_iter, BATCH_SHARD_SIZE + 1))
+        image_iter = chain(head, image_iter)
+        
+        self.last_run_stats = {'found': found, 'skipped': skipped, 'processed': 0,
+                               'succeeded': 0, 'deduplicated': 0, 'cancelled': False}
+        self.last_detections_path = None
+        self.last_deduplicated = 0
+        if found == 0:
             return 0, 0, None
         
-        # Create output folder
-        output_folder = self.create_output_folder(folder_path)
+        success_count = 0
+        processed = 0
+        
+        def record(img_path, success):
+            nonlocal processed
+            processed += 1
+            manifest.record(img_path, success)
+        
+        detection_writer = None
+        statistics = self.model_handler.statistics
+        
+        def detection_callback(img_path, image_shape, detections):
+            statistics.update(detections)
+            if detection_writer is not None:
+                detection_writer.write(manifest.key(img_path), 0, None, detections,
+                                       image_shape)
         
-        # Process each image
+        try:
+            if head:
+                # Create output folder
+                output_folder = self.create_output_folder(folder_path)
+            if head and detections_only:
+                self.last_detections_path = output_folder / (
+                    f"detections_{time.strftime('%Y%m%d-%H%M%S')}"
+                    f"{WRITERS[detections_format].extension}")
+                detection_writer = create_detection_writer(self.last_detections_path,
+                                                           detections_format)
+            
+            if workers > 1 and len(head) > BATCH_SHARD_SIZE:
+                success_count = self.process_files_parallel(
+                    image_iter, output_folder, progress_callback, workers,
+                    result_callback=record, detection_callback=detection_callback,
+                    render=not detections_only, control=control
+                )
+            elif head:
+                success_count = self.process_files(image_iter, output_folder,
+                                                   progress_callback,
+                                                   result_callback=record,
+                                                   detection_callback=detection_callback,
+                                                   render=not detections_only,
+                                                   control=control)
+        finally:
+            if detection_writer is not None:
+                detection_writer.close()
+            manifest.close()
+        
+        self.last_run_stats = {'found': found, 'skipped': skipped, 'processed': processed,
+                               'succeeded': success_count,
+                               'deduplicated': self.last_deduplicated,
+                               'cancelled': control is not None and control.is_cancelled()}
+        return success_count + skipped, found, output_folder
+    
+    def process_files_parallel(self, image_files, output_folder, progress_callback, workers,
+                               result_callback=None, detection_callback=None, render=True,
+                               control=None):
+        """
+        Shard files across a process pool, one model per worker
+        
+        Shards are runs of consecutive files handed out as workers free up,
+        so uneven image sizes still balance. Near-duplicates are only
+        matched within a shard. Shards are cut from the file
+        iterator only a few at a time ahead of the workers. Workers report
+        each finished image through a queue, and progress is forwarded from
+        this thread.
+        
+        Args:
+            image_files: Iterable of image paths
+            output_folder: Folder for annotated images
+            progress_callback: Optional callback function(current, total)
+            workers: Number of worker processes
+            result_callback: Optional callback function(img_path, success),
+                called in this process
+            detection_callback: Optional callback function(img_path,
+                image_shape, detections), called in this process
+            render: Save annotated images, as in process_files
+            control: Optional JobControl, mirrored to the workers
+            
+        Returns:
+            Number of images saved successfully
+        """
+        file_iter = iter(image_files)
+        threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+        
+        # spawn: forking a parent that already holds torch threads can deadlock
+        context = multiprocessing.get_context('spawn')
+        with context.Manager() as manager:
+            progress_queue = manager.Queue()
+            shared_control = JobControl(manager.Event(), manager.Event())
+            worker_args = (threads_per_worker, progress_queue, self.reduced_decode,
+                           shared_control, self.dedup, self.model_handler.worker_settings())
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                     initializer=init_worker,
+                                     initargs=worker_args) as executor:
+                pending = set()
+                total = None  # Known once the file iterator is exhausted
+                submitted = 0
+                
+                def submit_shards():
+                    nonlocal total, submitted
+                    # Two shards per worker keep every worker busy
+                    while (total is None and len(pending) < 2 * workers
+                           and not shared_control.is_cancelled()):
+                        shard = list(islice(file_iter, BATCH_SHARD_SIZE))
+                        if not shard:
+                            total = submitted
+                            return
+                        submitted += len(shard)
+                        pending.add(executor.submit(process_shard, shard, output_folder,
+                                                    render))
+                
+                submit_shards()
+                done_count = 0
+                success_count = 0
+                deduplicated = 0
+                while True:
+                    try:
+                        img_path, success, detection_record = progress_queue.get(timeout=0.2)
+                    except queue.Empty:
+                        pass
+                    else:
+                        done_count += 1
+                        if detection_record is not None and detection_callback:
+                            detection_callback(img_path, *detection_record)
+                        if result_callback:
+                            result_callback(img_path, success)
+                        if progress_callback:
+                            progress_callback(done_count, total)
+                    
+                    if control is not None:
+                        if control.is_cancelled() and not shared_control.is_cancelled():
+                            shared_control.cancel()
+                            for future in pending:
+                                future.cancel()
+                        elif control.is_paused() != shared_control.is_paused():
+                            if control.is_paused():
+                                shared_control.pause()
+                            else:
+                                shared_control.resume()
+                    
+                    finished, _ = wait(pending, timeout=0)
+                    pending.difference_update(finished)
+                    for future in finished:
+                        if not future.cancelled():
+                            shard_successes, shard_deduplicated = future.result()
+                            success_count += shard_successes
+                            deduplicated += shard_deduplicated
+                    submit_shards()
+                    if not pending and progress_queue.empty():
+                        break
+        
+        self.last_deduplicated = deduplicated
+        return success_count
+    
+    def decodes_reduced(self, render):
+        """
+        Check whether images are decoded at reduced resolution
+        
+        Annotating at full resolution needs the full decode anyway, so
+        reduced decode only applies to detections-only runs, or when
+        REDUCED_DECODE_ANNOTATE_REDUCED draws on the reduced image.
+        
+        Args:
+            render: Whether annotated images are saved
+        """
+        return self.reduced_decode and (not render or REDUCED_DECODE_ANNOTATE_REDUCED)
+    
+    def read_image(self, img_path, reduced=False):
+        """
+        Decode one image on a reader thread
+        
+        Args:
+            img_path: Image path
+            reduced: Decode oversized images at reduced resolution
+        
+        Returns:
+            Tuple (image or None, (scale_x, scale_y) back to original pixels)
+        """
+        with self.model_handler.monitor.measure('decode'):
+            if reduced:
+                return ImageProcessor.read_image_reduced(str(img_path), max(IMAGE_SIZE))
+            return ImageProcessor.read_image(str(img_path)), (1.0, 1.0)
+    
+    def read_image_hashed(self, img_path, reduced=False):
+        """
+        Decode one image and compute its dHash on a reader thread
+        
+        Returns:
+            Tuple (image or None, scale as in read_image, dHash or None)
+        """
+        image, scale = self.read_image(img_path, reduced)
+        return image, scale, None if image is None else ImageProcessor.dhash(image)
+    
+    def save_result(self, img_path, results, output_folder):
+        """
+        Annotate and save one result on a writer thread
+        
+        Returns:
+            True if the annotated image was saved
+        """
+        try:
+            annotated_image = self.model_handler.get_annotated_image(results)
+            output_path = self.output_path(img_path, output_folder)
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            return ImageProcessor.save_image(annotated_image, str(output_path))
+        except Exception as e:
+            print(f"Error processing {img_path.name}: {str(e)}")
+            return False
+    
+    def emit_detections(self, img_path, results, detection_callback, scale=(1.0, 1.0)):
+        """
+        Pass one image's detections, in original pixels, to detection_callback
+        
+        Returns:
+            True if the detections were accepted
+        """
+        try:
+            detections = ResultsAnalyzer.extract_detections(results, scale)
+            height, width = results.orig_shape[:2]
+            original_shape = (round(height * scale[1]), round(width * scale[0]))
+            detection_callback(img_path, original_shape, detections)
+            return True
+        except Exception as e:
+            print(f"Error processing {img_path.name}: {str(e)}")
+            return False
+    
+    def process_files(self, image_files, output_folder, progress_callback=None,
+                      result_callback=None, detection_callback=None, render=True,
+                      control=None):
+        """
+        Process images through a read -> infer -> write pipeline
+        
+        Reader threads decode ahead of inference into a bounded window,
+        inference consumes them in batches, and writer threads annotate and
+        encode results, so the model is not idle during JPEG decode/encode.
+        Progress is reported from the calling thread as images finish.
+        
+        With dedup enabled, an image whose dHash is close to a recent
+        cluster representative skips inference and reuses the
+        representative's detections, scaled to its size.
+        
+        Args:
+            image_files: Iterable of image paths, consumed as the window advances
+            output_folder: Folder for annotated images
+            progress_callback: Optional callback function(current, total); total
+                is None while image_files is a not yet exhausted iterator
+            result_callback: Optional callback function(img_path, success)
+            detection_callback: Optional callback function(img_path,
+                image_shape, detections), called for every analyzed image
+            render: Save annotated images; when False nothing is rendered or
+                encoded and only detection_callback receives the results
+            control: Optional JobControl checked before each batch
+            
+        Returns:
+            Number of images saved successfully; the number of images that
+            reused detections is left in last_deduplicated
+        """
+        total = len(image_files) if isinstance(image_files, (list, tuple)) else None
+        queued_count = 0
         success_count = 0
-        for i, img_path in enumerate(image_files):
-            try:
-                # Read image
-                image = ImageProcessor.read_image(str(img_path))
-                if image is None:
-                    continue
+        done_count = 0
+        duplicate_index = NearDuplicateIndex() if self.dedup else None
+        read = self.read_image_hashed if self.dedup else self.read_image
+        reduced = self.decodes_reduced(render)
+        self.last_deduplicated = 0
+        
+        reads = deque()  # Futures of decoded images, in file order
+        writes = deque()  # (path, future of saved result), in file order
+        file_iter = iter(image_files)
+        
+        def report(img_path, success):
+            nonlocal success_count, done_count
+            success_count += bool(success)
+            done_count += 1
+            if result_callback:
+                result_callback(img_path, bool(success))
+            if progress_callback:
+                progress_callback(done_count, total)
+        
+        def fill_reads():
+            nonlocal total, queued_count
+            while len(reads) < PREFETCH_SIZE:
+                img_path = next(file_iter, None)
+                if img_path is None:
+                    total = queued_count
+                    return
+                queued_count += 1
+                reads.append((img_path, reader_pool.submit(read, img_path, reduced)))
+        
+        def drain_writes(limit):
+            # Wait for the oldest writes until at most `limit` are pending
+            while writes and (len(writes) > limit or writes[0][1].done()):
+                img_path, future = writes.popleft()
+                report(img_path, future.result())
+        
+        with ThreadPoolExecutor(READER_THREADS) as reader_pool, \
+                ThreadPoolExecutor(WRITER_THREADS) as writer_pool:
+            fill_reads()
+            while reads:
+                if control is not None and not control.wait_if_paused():
+                    break
                 
-                # Run detection
-                results = self.model_handler.predict(image)
-                annotated_image = self.model_handler.get_annotated_image(results)
+                # Collect the next batch of decoded images
+                batch_paths, batch_images, batch_scales, batch_clusters = [], [], [], []
+                duplicates = []  # (path, image, scale, cluster) reusing detections
+                while reads and len(batch_images) < BATCH_SIZE:
+                    img_path, future = reads.popleft()
+                    image, scale, *image_hash = future.result()
+                    if image is None:
+                        print(f"Error processing {img_path.name}: failed to read image")
+                        report(img_path, False)
+                        continue
+                    if duplicate_index is not None:
+                        cluster = duplicate_index.find(image_hash[0], image.shape)
+                        if cluster is not None:
+                            duplicates.append((img_path, image, scale, cluster))
+                            continue
+                        batch_clusters.append(duplicate_index.add(image_hash[0], image.shape))
+                    batch_paths.append(img_path)
+                    batch_images.append(image)
+                    batch_scales.append(scale)
+                fill_reads()
                 
-                # Save result
-                output_path = output_folder / f'{OUTPUT_IMAGE_PREFIX}{img_path.name}'
-                if ImageProcessor.save_image(annotated_image, str(output_path)):
-                    success_count += 1
+                batch_results = []
+                if batch_images:
+                    try:
+                        # Run detection
+                        batch_results = self.model_handler.predict_batch(batch_images)
+                    except Exception as e:
+                        print(f"Error processing batch starting at {batch_paths[0].name}: "
+                              f"{str(e)}")
+                        for img_path in batch_paths:
+                            report(img_path, False)
+                        for cluster in batch_clusters:
+                            cluster.failed = True
+                        batch_paths, batch_scales = [], []
                 
-            except Exception as e:
-                print(f"Error processing {img_path.name}: {str(e)}")
-                continue
+                for cluster, results in zip(batch_clusters, batch_results):
+                    cluster.data = results.boxes.data.cpu().numpy()
+                
+                analyzed = list(zip(batch_paths, batch_results, batch_scales))
+                for img_path, image, scale, cluster in duplicates:
+                    if cluster.failed:
+                        print(f"Error processing {img_path.name}: near-duplicate of an "
+                              f"image that failed")
+                        report(img_path, False)
+                        continue
+                    results = self.model_handler.cached_results(image,
+                                                                cluster.project(image.shape))
+                    analyzed.append((img_path, results, scale))
+                    self.last_deduplicated += 1
+                
+                for img_path, results, scale in analyzed:
+                    accepted = True
+                    if detection_callback is not None:
+                        accepted = self.emit_detections(img_path, results,
+                                                        detection_callback, scale)
+                    if not render:
+                        # Detections only: no rendering or encoding to hand off
+                        report(img_path, accepted)
+                        continue
+                    writes.append((img_path, writer_pool.submit(
+                        self.save_result, img_path, results, output_folder
+                    )))
+                drain_writes(WRITE_QUEUE_SIZE)
             
-            # Call progress callback
-            if progress_callback:
-                progress_callback(i + 1, total)
+            drain_writes(0)
         
-        return success_count, total, output_folder
\ No newline at end of file
+        return success_count
@@ -0,0 +1,131 @@
+"""
+Batch Worker Thread
+Runs queued folder jobs off the GUI thread with pause, cancel and ETA reporting
+"""
+
+import queue
+import time
+from collections import deque
+
+from PyQt5.QtCore import QThread, pyqtSignal
+from batch_processor import BatchProcessor, JobControl
+
+# Progress samples used for the images/sec estimate
+RATE_WINDOW = 50
+
+
+class BatchWorker(QThread):
+    """Worker thread processing one queued folder after another"""
+
+    job_started = pyqtSignal(str)  # folder
+    # folder, current, total (None while scanning), images/sec, ETA seconds (None if unknown)
+    progress = pyqtSignal(str, int, object, float, object)
+    # folder, success_count, total_count, output_folder, run stats
+    job_finished = pyqtSignal(str, int, int, object, dict)
+    job_failed = pyqtSignal(str, str)  # folder, error message
+    queue_changed = pyqtSignal(int)  # jobs waiting behind the current one
+
+    def __init__(self, model_handler):
+        """
+        Initialize batch worker
+
+        Args:
+            model_handler: ModelHandler shared with the GUI
+        """
+        super().__init__()
+        self.batch_processor = BatchProcessor(model_handler)
+        self.jobs = queue.Queue()
+        self.control = None
+        self.paused = False
+        self.restart_rate = False  # Set on resume so paused time is not in the rate
+
+    def add_job(self, folder_path):
+        """Queue a folder, starting the thread if needed"""
+        self.jobs.put(folder_path)
+        self.queue_changed.emit(self.jobs.qsize())
+        if not self.isRunning():
+            self.start()
+
+    def pending_jobs(self):
+        """Number of folders waiting behind the current one"""
+        return self.jobs.qsize()
+
+    def is_busy(self):
+        """Check whether a job is running"""
+        return self.control is not None
+
+    def pause(self):
+        """Pause the current job and any that follow"""
+        self.paused = True
+        if self.control is not None:
+            self.control.pause()
+
+    def resume(self):
+        """Resume processing"""
+        self.paused = False
+        self.restart_rate = True
+        if self.control is not None:
+            self.control.resume()
+
+    def cancel_current(self):
+        """Cancel the running job; queued jobs continue"""
+        if self.control is not None:
+            self.control.cancel()
+
+    def cancel_all(self):
+        """Drop queued jobs and cancel the running one"""
+        try:
+            while True:
+                self.jobs.get_nowait()
+        except queue.Empty:
+            pass
+        self.queue_changed.emit(0)
+        self.cancel_current()
+
+    def shutdown(self):
+        """Cancel everything and stop the thread"""
+        self.cancel_all()
+        self.jobs.put(None)
+        self.wait()
+
+    def run(self):
+        """Process jobs until shutdown() queues the end marker"""
+        while True:
+            folder_path = self.jobs.get()
+            if folder_path is None:
+                return
+            self.queue_changed.emit(self.jobs.qsize())
+            self.run_job(folder_path)
+
+    def run_job(self, folder_path):
+        """Process one folder, reporting throughput and ETA"""
+        control = JobControl()
+        if self.paused:
+            control.pause()
+        self.control = control
+        self.job_started.emit(folder_path)
+
+        samples = deque(maxlen=RATE_WINDOW)  # (time, images done)
+
+        def report_progress(current, total):
+            now = time.monotonic()
+            if self.restart_rate:
+                self.restart_rate = False
+                samples.clear()
+            samples.append((now, current))
+            rate = 0.0
+            if len(samples) > 1 and now > samples[0][0]:
+                rate = (current - samples[0][1]) / (now - samples[0][0])
+            eta = (total - current) / rate if total is not None and rate > 0 else None
+            self.progress.emit(folder_path, current, total, rate, eta)
+
+        try:
+            success_count, total_count, output_folder = self.batch_processor.process_folder(
+                folder_path, progress_callback=report_progress, control=control
+            )
+            self.job_finished.emit(folder_path, success_count, total_count, output_folder,
+                                   dict(self.batch_processor.last_run_stats))
+        except Exception as e:
+            self.job_failed.emit(folder_path, str(e))
+        finally:
+            self.control = None
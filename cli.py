@@ -0,0 +1,298 @@
+"""
+Traffic Sign Recognition System
+Headless command-line entry point (never imports Qt)
+
+Usage:
+    python cli.py image PATH [-o OUTPUT]
+    python cli.py folder PATH [--recursive] [--dedup] [--detections-only [--format FORMAT]]
+    python cli.py video PATH [-o OUTPUT] [--detections FILE] [--parallel]
+    python cli.py camera [--index N] [-o OUTPUT] [--detections FILE] [--duration SECONDS]
+    python cli.py query STORE [--class NAME] [--min-conf C] [--region X1 Y1 X2 Y2] [--rows]
+"""
+
+import argparse
+import json
+import math
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+
+from config import DEFAULT_CAMERA_INDEX, OUTPUT_IMAGE_PREFIX
+from model_handler import ModelHandler
+from batch_processor import BatchProcessor
+from detection_store import DetectionStore
+from detection_writer import create_detection_writer, WRITERS
+from image_processor import ImageProcessor
+from result_analyzer import ResultsAnalyzer
+from video_pipeline import VideoPipeline
+from segment_processor import SegmentProcessor
+from session_statistics import SessionStatistics
+
+
+def load_model(args):
+    """Create and load ModelHandler from command-line options"""
+    model_handler = ModelHandler(backend=args.backend, quantization=args.quantization)
+    success, message = model_handler.load_model(
+        progress_callback=lambda step: print(step, file=sys.stderr)
+    )
+    print(message, file=sys.stderr)
+    if not success:
+        raise SystemExit(1)
+    return model_handler
+
+
+def print_progress(current, total):
+    """Progress callback printing to stderr; total is None while still scanning"""
+    if total is None:
+        print(f'\r{current}/...', end='', file=sys.stderr, flush=True)
+        return
+    print(f'\r{current}/{total}', end='' if current < total else '\n',
+          file=sys.stderr, flush=True)
+
+
+def run_image(args, model_handler):
+    """Detect objects in one image and save annotated image plus detections"""
+    image_path = Path(args.path)
+    image = ImageProcessor.read_image(str(image_path))
+    if image is None:
+        raise SystemExit(f'Failed to load image {image_path}')
+
+    results = model_handler.predict(image)
+    output_path = Path(args.output or image_path.with_name(
+        f'{OUTPUT_IMAGE_PREFIX}{image_path.name}'))
+    ImageProcessor.save_image(model_handler.get_annotated_image(results), str(output_path))
+
+    detections = ResultsAnalyzer.extract_detections(results)
+    with open(output_path.with_suffix('.json'), 'w') as f:
+        json.dump(detections.to_dicts(), f, indent=2)
+
+    stats = ResultsAnalyzer.calculate_statistics(detections)
+    print(ResultsAnalyzer.format_statistics(stats))
+    print(f'Saved {output_path}', file=sys.stderr)
+
+
+def run_folder(args, model_handler):
+    """Batch process a folder of images"""
+    batch_processor = BatchProcessor(model_handler, reduced_decode=args.reduced_decode or None,
+                                     dedup=args.dedup or None)
+    success_count, total_count, output_folder = batch_processor.process_folder(
+        args.path, progress_callback=print_progress, workers=args.workers,
+        resume=not args.no_resume, recursive=args.recursive or None,
+        detections_only=args.detections_only or None, detections_format=args.format
+    )
+    if total_count == 0:
+        print('No images found in folder', file=sys.stderr)
+    else:
+        stats = batch_processor.last_run_stats
+        print(f'Processed {success_count}/{total_count} images '
+              f"({stats['skipped']} unchanged, skipped; {stats['deduplicated']} "
+              f'near-duplicates reused detections), results in {output_folder}')
+        if batch_processor.last_detections_path:
+            print(f'Saved {batch_processor.last_detections_path}', file=sys.stderr)
+
+
+def run_stream(source, model_handler, output_path=None, duration=None, detections_path=None):
+    """Run VideoPipeline headless until the source ends, Ctrl+C or duration"""
+    errors = []
+    detection_writer = create_detection_writer(detections_path) if detections_path else None
+    pipeline = VideoPipeline(source, model_handler, on_error=errors.append,
+                             output_path=output_path, detection_writer=detection_writer)
+
+    # Ctrl+C stops the pipeline cleanly so the output video is finalized
+    signal.signal(signal.SIGINT, lambda *_: pipeline.stop())
+    if duration:
+        timer = threading.Timer(duration, pipeline.stop)
+        timer.daemon = True
+        timer.start()
+
+    start = time.perf_counter()
+    try:
+        pipeline.run()
+    finally:
+        if detection_writer is not None:
+            detection_writer.close()
+    elapsed = time.perf_counter() - start
+
+    for error in errors:
+        print(error, file=sys.stderr)
+    fps = pipeline.frames_processed / elapsed if elapsed > 0 else 0.0
+    print(f'Processed {pipeline.frames_processed} frames in {elapsed:.1f}s ({fps:.1f} FPS)')
+    if pipeline.export_dropped:
+        print(f'Video export fell behind: {pipeline.export_dropped} frames were replaced '
+              f'by the previous frame', file=sys.stderr)
+    for path in (output_path, detections_path):
+        if path:
+            print(f'Saved {path}', file=sys.stderr)
+    return 1 if errors else 0
+
+
+def run_video(args, model_handler):
+    """Process a video file"""
+    if args.parallel:
+        segment_processor = SegmentProcessor(
+            num_workers=args.workers,
+            model_settings={'backend': args.backend, 'quantization': args.quantization}
+        )
+        records = segment_processor.process_video(
+            args.path, args.output, progress_callback=print_progress
+        )
+        if args.detections:
+            with create_detection_writer(args.detections) as detection_writer:
+                for frame_index, timestamp, detections in records:
+                    detection_writer.write(args.path, frame_index, timestamp, detections,
+                                           segment_processor.frame_shape)
+        if args.stats:
+            # Segment workers have their own models, so aggregate here
+            statistics = SessionStatistics()
+            for _, _, detections in records:
+                statistics.update(detections)
+            statistics.export(args.stats)
+            print(f'Saved {args.stats}', file=sys.stderr)
+        print(f'Processed {len(records)} frames')
+        return 0
+    return run_stream(args.path, model_handler, args.output, detections_path=args.detections)
+
+
+def run_camera(args, model_handler):
+    """Process live camera frames"""
+    return run_stream(args.index, model_handler, args.output, args.duration, args.detections)
+
+
+def run_query(args, model_handler):
+    """Query a detection store without running the model"""
+    if not (Path(args.store) / 'meta.json').exists():
+        raise SystemExit(f'No detection store at {args.store}')
+    store = DetectionStore(args.store)
+    conditions = {
+        'class_names': args.class_names,
+        'min_confidence': args.min_conf,
+        'region': tuple(args.region) if args.region else None,
+        'sources': args.sources
+    }
+    if args.rows:
+        result = store.query(**conditions)
+        for i in range(len(result['row'])):
+            print(json.dumps({
+                'source': result['source'][i],
+                'frame_index': int(result['frame_index'][i]),
+                'timestamp': (None if math.isnan(result['timestamp'][i])
+                              else float(result['timestamp'][i])),
+                'class_name': result['class_name'][i],
+                'confidence': round(float(result['confidence'][i]), 4),
+                'box': [round(float(v), 1) for v in result['box'][i]]
+            }))
+        count = len(result['row'])
+    else:
+        frames = store.frames(**conditions)
+        for source, frame_index, timestamp in frames:
+            print(json.dumps({'source': source, 'frame_index': frame_index,
+                              'timestamp': timestamp}))
+        count = len(frames)
+    print(f'{count} matches in {len(store)} stored detections', file=sys.stderr)
+    return 0
+
+
+def build_parser():
+    """Create command-line argument parser"""
+    parser = argparse.ArgumentParser(description='Headless traffic sign detection')
+    parser.add_argument('--backend', default=None,
+                        help="Inference backend: 'pytorch', 'onnxruntime' or 'openvino'")
+    parser.add_argument('--quantization', default=None,
+                        help="INT8 mode: 'none', 'dynamic' or 'static'")
+    parser.add_argument('--stats', metavar='FILE', default=None,
+                        help='Export session detection statistics (.json or .csv) at exit')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    image_parser = subparsers.add_parser('image', help='Detect objects in one image')
+    image_parser.add_argument('path')
+    image_parser.add_argument('-o', '--output', help='Annotated image path')
+    image_parser.set_defaults(handler=run_image)
+
+    folder_parser = subparsers.add_parser('folder', help='Batch process a folder of images')
+    folder_parser.add_argument('path')
+    folder_parser.add_argument('--workers', type=int, default=None,
+                               help='Worker processes, each with its own model '
+                                    '(0 = one per two cores)')
+    folder_parser.add_argument('-r', '--recursive', action='store_true',
+                               help='Include images in subfolders')
+    folder_parser.add_argument('--detections-only', action='store_true',
+                               help='Write a detections file instead of annotated images')
+    folder_parser.add_argument('--format', choices=list(WRITERS), default=None,
+                               help='Detections file format for --detections-only')
+    folder_parser.add_argument('--reduced-decode', action='store_true',
+                               help='Decode oversized images at reduced resolution '
+                                    '(with --detections-only)')
+    folder_parser.add_argument('--dedup', action='store_true',
+                               help='Infer once per cluster of near-identical images')
+    folder_parser.add_argument('--no-resume', action='store_true',
+                               help='Reprocess images already recorded in the manifest')
+    folder_parser.set_defaults(handler=run_folder)
+
+    video_parser = subparsers.add_parser('video', help='Process a video file')
+    video_parser.add_argument('path')
+    video_parser.add_argument('-o', '--output', help='Annotated video path')
+    video_parser.add_argument('--detections', metavar='FILE',
+                              help='Write per-frame detections (.jsonl, .csv, .npz, .parquet or '
+                                   'a .dstore store directory)')
+    video_parser.add_argument('--parallel', action='store_true',
+                              help='Split into segments processed by a process pool')
+    video_parser.add_argument('--workers', type=int, default=None,
+                              help='Worker processes for --parallel')
+    video_parser.set_defaults(handler=run_video)
+
+    camera_parser = subparsers.add_parser('camera', help='Process a live camera')
+    camera_parser.add_argument('--index', type=int, default=DEFAULT_CAMERA_INDEX)
+    camera_parser.add_argument('-o', '--output', help='Annotated video path')
+    camera_parser.add_argument('--detections', metavar='FILE',
+                               help='Write per-frame detections (.jsonl, .csv, .npz, .parquet or '
+                                    'a .dstore store directory)')
+    camera_parser.add_argument('--duration', type=float, default=None,
+                               help='Stop after this many seconds')
+    camera_parser.set_defaults(handler=run_camera)
+
+    query_parser = subparsers.add_parser(
+        'query', help='Find stored detections without running the model')
+    query_parser.add_argument('store', help='.dstore directory written by --detections '
+                                            'or --format dstore')
+    query_parser.add_argument('--class', dest='class_names', action='append', default=None,
+                              metavar='NAME', help='Class name to match (repeatable)')
+    query_parser.add_argument('--min-conf', type=float, default=None,
+                              help='Minimum confidence')
+    query_parser.add_argument('--region', type=float, nargs=4, default=None,
+                              metavar=('X1', 'Y1', 'X2', 'Y2'),
+                              help='Image region for box centers as fractions, '
+                                   'e.g. 0.667 0 1 1 for the right third')
+    query_parser.add_argument('--source', dest='sources', action='append', default=None,
+                              help='Source to match (repeatable)')
+    query_parser.add_argument('--rows', action='store_true',
+                              help='Print matching detections instead of matching frames')
+    query_parser.set_defaults(handler=run_query)
+
+    return parser
+
+
+def main():
+    """Headless application entry point"""
+    args = build_parser().parse_args()
+
+    # Segment workers load their own models; queries need none
+    if args.command == 'query' or (args.command == 'video' and args.parallel):
+        sys.exit(args.handler(args, None) or 0)
+
+    model_handler = load_model(args)
+    try:
+        exit_code = args.handler(args, model_handler) or 0
+    finally:
+        cache = model_handler.prediction_cache
+        if cache is not None and cache.hits:
+            print(cache.format_stats(), file=sys.stderr)
+        if args.stats:
+            model_handler.statistics.export(args.stats)
+            print(f'Saved {args.stats}', file=sys.stderr)
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
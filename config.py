@@ -3,22 +3,103 @@ Configuration file for Traffic Sign Recognition System
 Contains all configurable parameters and constants
 """
 
+import os
+
 # Model Configuration
 MODEL_NAME = 'yolov8n.pt'  # YOLOv8 nano for speed
 CONFIDENCE_THRESHOLD = 0.25
 IOU_THRESHOLD = 0.45
+MAX_DETECTIONS = 300  # Detections kept per image after NMS (ultralytics default)
+BATCH_SIZE = 8  # Images per forward pass for folder jobs
+READER_THREADS = 4  # Threads decoding images ahead of inference
+WRITER_THREADS = 4  # Threads annotating and encoding results
+PREFETCH_SIZE = 32  # Decoded images waiting for inference
+WRITE_QUEUE_SIZE = 32  # Results waiting to be written
+BATCH_WORKERS = 1  # Processes for folder jobs; 0 uses one per two CPU cores
+BATCH_SHARD_SIZE = 64  # Consecutive files handed to a worker at a time
+BATCH_RECURSIVE = False  # Include images in subfolders of the selected folder
+BATCH_DEDUP = False  # Infer once per cluster of near-identical images and reuse detections
+DEDUP_MAX_DISTANCE = 4  # Differing dHash bits (of 64) that still count as a duplicate
+DEDUP_WINDOW = 64  # Recent cluster representatives each image is compared with
+DEDUP_REPROJECT = True  # Reuse detections across sizes of the same aspect ratio, scaling boxes
+
+# Threshold Tuning
+CANDIDATE_CONFIDENCE = 0.01  # Lowest confidence kept in cached candidates (slider minimum)
+CANDIDATE_MAX_DETECTIONS = 3000  # Candidates kept per image before re-thresholding
+THRESHOLD_DEBOUNCE_MS = 60  # Slider pause before the current image is re-filtered
+
+# Prediction Cache
+PREDICTION_CACHE = True  # Reuse detections for identical images and video frames
+PREDICTION_CACHE_SIZE = 4096  # Entries kept in memory
+PREDICTION_CACHE_DIR = None  # Persistent tier directory; None keeps the cache in memory only
+PREDICTION_CACHE_DISK_MB = 256  # Size cap of the persistent tier
+
+# Inference Backend
+INFERENCE_BACKEND = 'pytorch'  # 'pytorch', 'onnxruntime' or 'openvino'
+EXPORT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache',
+                                'traffic_sign_recognition', 'exports')
+
+# INT8 Quantization (ONNX Runtime, CPU)
+QUANTIZATION_MODE = 'none'  # 'none', 'dynamic' or 'static'
+CALIBRATION_FOLDER = None  # Image folder used for static calibration
+CALIBRATION_IMAGES = 64  # Maximum calibration images
 
 # Image Processing
 IMAGE_SIZE = (640, 640)
 IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp']
+REDUCED_DECODE = False  # Detections-only folder jobs decode oversized images at 1/2, 1/4 or 1/8 size
+REDUCED_DECODE_ANNOTATE_REDUCED = False  # Also decode reduced when annotating, drawing on the reduced image
 
 # Video Processing
 VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mov', '.mkv']
 DEFAULT_CAMERA_INDEX = 0
+VIDEO_BATCH_SIZE = 4  # Frames per forward pass for video files (cameras stay at 1)
+PIPELINE_QUEUE_SIZE = 4  # Frames buffered between capture, inference and render
+CAMERA_DROP_POLICY = 'latest'  # 'latest' drops stale frames, 'never' blocks capture
+VIDEO_DROP_POLICY = 'never'
+MULTI_STREAM_BATCH_SIZE = 8  # Frames per forward pass across all streams
+
+# Video Export
+VIDEO_FOURCC = 'mp4v'
+VIDEO_WRITER_QUEUE_SIZE = 64  # Frames buffered for the encoder before dropping
+DEFAULT_OUTPUT_FPS = 30.0  # Used when the source does not report its FPS
+
+# Parallel Segment Processing (long video files)
+SEGMENT_SECONDS = 60  # Length of each independently processed segment
+SEGMENT_WORKERS = 0  # Worker processes; 0 uses half the CPU cores
+
+# Frame Skipping (video and camera)
+DETECTION_INTERVAL = 1  # Run the detector every N frames; 1 runs it on every frame
+DETECTION_TIME_BUDGET = 0.0  # Seconds between detector runs; 0 disables, overrides interval
+TRACKER_IOU_THRESHOLD = 0.3  # Minimum IoU to keep a track on a new detection
+TRACKER_MAX_AGE = 3  # Detector runs a track may go unmatched before removal
+
+# Motion Gating (video and camera)
+MOTION_GATING = False  # Reuse the last results while the scene is unchanged
+MOTION_THRESHOLD = 8.0  # Mean gray-level difference of any block that counts as change
+MOTION_GRID = (12, 9)  # Comparison blocks as (columns, rows)
+MOTION_MAX_SKIP = 150  # Force an inference after this many unchanged frames
+
+# Performance Instrumentation
+PERF_WINDOW_SIZE = 500  # Recent samples per stage used for p50/p95/p99
+PERF_OVERLAY_INTERVAL_MS = 1000  # Refresh period of the on-image stats overlay
+
+# Session Statistics
+SESSION_HISTOGRAM_BINS = 20  # Confidence histogram bins over [0, 1]
+SESSION_QUANTILES = (0.5, 0.9, 0.99)  # Confidence quantiles tracked online
+SESSION_RATE_MINUTES = 720  # Per-minute detection rates kept (12 hours)
+SESSION_STATS_INTERVAL_MS = 1000  # Refresh period of the session stats panel
 
 # Output
 OUTPUT_FOLDER_NAME = 'detected_output'
 OUTPUT_IMAGE_PREFIX = 'detected_'
+DETECTIONS_ONLY = False  # Folder jobs write a detections file instead of annotated images
+DETECTIONS_FORMAT = 'jsonl'  # 'jsonl', 'csv', 'npz', 'parquet' (needs pyarrow) or 'dstore'
+DETECTION_WRITER_BUFFER = 10000  # Detections per Parquet row group or NPZ spill to disk
+DETECTION_STORE_GRID = 8  # Spatial index cells per image side in detection stores
+DETECTION_STORE_CAPACITY = 65536  # Initial rows of a detection store; doubles when full
+MANIFEST_FILE_NAME = 'manifest.jsonl'  # Processed-file record used to resume folder jobs
+BATCH_RESUME = True  # Skip images already processed unchanged with the same model
 
 # UI Configuration
 WINDOW_TITLE = 'Traffic Sign Recognition System - AI Hackathon'
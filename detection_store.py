@@ -0,0 +1,328 @@
+"""
+Detection Store
+Persistent memory-mapped detection columns with class and spatial grid indexes
+
+A store is a directory of raw column files plus meta.json and index files,
+so analysts can query past runs without running inference again:
+
+    store = DetectionStore('runs.dstore')
+    frames = store.frames(class_names=['stop sign'], region=(2 / 3, 0, 1, 1),
+                          min_confidence=0.6)
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+from config import DETECTION_STORE_GRID, DETECTION_STORE_CAPACITY
+
+# Column name -> (dtype, values per row)
+COLUMNS = {
+    'source_id': (np.int32, 1),
+    'frame_index': (np.int64, 1),
+    'timestamp': (np.float64, 1),  # NaN for still images
+    'class_id': (np.int16, 1),
+    'confidence': (np.float32, 1),
+    'box': (np.float32, 4),  # x1, y1, x2, y2 in pixels
+    'image_size': (np.int32, 2),  # width, height; 0 if unknown
+    'cell': (np.int16, 1)  # Grid cell of the box center; -1 if image size unknown
+}
+
+
+class PostingList:
+    """Ascending row ids of one index key in a growable array"""
+
+    __slots__ = ('array', 'size')
+
+    def __init__(self, rows=None):
+        """
+        Initialize posting list
+
+        Args:
+            rows: Optional initial row ids, ascending
+        """
+        self.array = np.array([] if rows is None else rows, dtype=np.int64)
+        self.size = len(self.array)
+
+    def extend(self, rows):
+        """Append row ids, doubling the array when it is full"""
+        end = self.size + len(rows)
+        if end > len(self.array):
+            grown = np.empty(max(end, 2 * len(self.array), 16), dtype=np.int64)
+            grown[:self.size] = self.array[:self.size]
+            self.array = grown
+        self.array[self.size:end] = rows
+        self.size = end
+
+    def rows(self):
+        """Row ids as an array view"""
+        return self.array[:self.size]
+
+
+class DetectionStore:
+    """Append-only columnar detection store with indexed queries"""
+
+    def __init__(self, path, grid=None):
+        """
+        Open or create a store
+
+        Args:
+            path: Store directory
+            grid: Cells per image side of the spatial index (defaults to
+                DETECTION_STORE_GRID; an existing store keeps its own)
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.columns = {}
+
+        meta_path = self.path / 'meta.json'
+        if meta_path.exists():
+            with open(meta_path) as f:
+                meta = json.load(f)
+            self.count = meta['count']
+            self.capacity = meta['capacity']
+            self.grid = meta['grid']
+            self.sources = meta['sources']
+            self.names = {int(k): v for k, v in meta['names'].items()}
+        else:
+            self.count = 0
+            self.capacity = DETECTION_STORE_CAPACITY
+            self.grid = grid or DETECTION_STORE_GRID
+            self.sources = []
+            self.names = {}
+        self.source_ids = {source: i for i, source in enumerate(self.sources)}
+
+        for name in COLUMNS:
+            self.open_column(name)
+        self.class_postings = self.load_postings('class_index.npz')
+        self.cell_postings = self.load_postings('grid_index.npz')
+
+    def column_path(self, name):
+        """File holding one column"""
+        return self.path / f'{name}.bin'
+
+    def open_column(self, name):
+        """Map a column file at the current capacity, growing the file if needed"""
+        dtype, width = COLUMNS[name]
+        path = self.column_path(name)
+        size = self.capacity * width * np.dtype(dtype).itemsize
+        with open(path, 'ab') as f:
+            if f.tell() < size:
+                f.truncate(size)
+        shape = (self.capacity, width) if width > 1 else (self.capacity,)
+        self.columns[name] = np.memmap(path, dtype=dtype, mode='r+', shape=shape)
+
+    def grow(self, required):
+        """Double capacity until required rows fit"""
+        while self.capacity < required:
+            self.capacity *= 2
+        for name, column in self.columns.items():
+            column.flush()
+            del column
+            self.open_column(name)
+
+    def load_postings(self, file_name):
+        """Read a posting-list file into key -> PostingList"""
+        path = self.path / file_name
+        if not path.exists():
+            return {}
+        with np.load(path) as data:
+            return {int(key): PostingList(data[key]) for key in data.files}
+
+    def save_postings(self, postings, file_name):
+        """Write key -> row ids as one array per key"""
+        arrays = {str(key): posting.rows() for key, posting in postings.items()}
+        temp_path = self.path / f'{file_name}.tmp.npz'
+        np.savez(temp_path, **arrays)
+        os.replace(temp_path, self.path / file_name)
+
+    def append(self, source, frame_index, timestamp, detections, image_size=None):
+        """
+        Append one frame's or image's detections
+
+        Args:
+            source: Image path or video source name
+            frame_index: Frame number (0 for still images)
+            timestamp: Seconds from the start of the video, or None
+            detections: Detections instance
+            image_size: Optional (width, height) of the analyzed image
+        """
+        count = len(detections)
+        if count == 0:
+            return
+
+        width, height = image_size if image_size and image_size[0] else (0, 0)
+        if width and height:
+            centers = (detections.boxes[:, :2] + detections.boxes[:, 2:]) / 2
+            cell_x = np.clip((centers[:, 0] / width * self.grid).astype(np.int16),
+                             0, self.grid - 1)
+            cell_y = np.clip((centers[:, 1] / height * self.grid).astype(np.int16),
+                             0, self.grid - 1)
+            cells = cell_y * self.grid + cell_x
+        else:
+            cells = np.full(count, -1, dtype=np.int16)
+
+        with self.lock:
+            if source not in self.source_ids:
+                self.source_ids[source] = len(self.sources)
+                self.sources.append(source)
+            for class_id in np.unique(detections.class_ids).tolist():
+                self.names.setdefault(class_id, detections.names.get(class_id, str(class_id)))
+
+            start, end = self.count, self.count + count
+            if end > self.capacity:
+                self.grow(end)
+            columns = self.columns
+            columns['source_id'][start:end] = self.source_ids[source]
+            columns['frame_index'][start:end] = frame_index
+            columns['timestamp'][start:end] = np.nan if timestamp is None else timestamp
+            columns['class_id'][start:end] = detections.class_ids
+            columns['confidence'][start:end] = detections.confidences
+            columns['box'][start:end] = detections.boxes
+            columns['image_size'][start:end] = (width, height)
+            columns['cell'][start:end] = cells
+            self.count = end
+
+            rows = np.arange(start, end, dtype=np.int64)
+            self.add_postings(self.class_postings, detections.class_ids, rows)
+            self.add_postings(self.cell_postings, cells, rows)
+
+    @staticmethod
+    def add_postings(postings, keys, rows):
+        """
+        Append rows to the posting list of each of their keys
+
+        Posting lists grow in place, so memory stays at one row id per
+        detection per index however many appends a long run makes.
+        """
+        order = np.argsort(keys, kind='stable')
+        unique_keys, starts = np.unique(keys[order], return_index=True)
+        for key, chunk in zip(unique_keys.tolist(), np.split(rows[order], starts[1:])):
+            if key not in postings:
+                postings[key] = PostingList()
+            postings[key].extend(chunk)
+
+    @staticmethod
+    def posting_rows(postings, keys):
+        """Sorted row ids listed under any of keys"""
+        chunks = [postings[key].rows() for key in set(keys) if key in postings]
+        if not chunks:
+            return np.zeros(0, dtype=np.int64)
+        if len(chunks) == 1:
+            return chunks[0].copy()
+        return np.unique(np.concatenate(chunks))
+
+    def flush(self):
+        """Write columns, indexes and metadata to disk"""
+        with self.lock:
+            for column in self.columns.values():
+                column.flush()
+            self.save_postings(self.class_postings, 'class_index.npz')
+            self.save_postings(self.cell_postings, 'grid_index.npz')
+            meta = {
+                'count': self.count,
+                'capacity': self.capacity,
+                'grid': self.grid,
+                'sources': self.sources,
+                'names': {str(k): v for k, v in self.names.items()}
+            }
+            temp_path = self.path / 'meta.json.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(meta, f)
+            os.replace(temp_path, self.path / 'meta.json')
+
+    def close(self):
+        """Flush the store"""
+        self.flush()
+
+    def class_ids_for(self, class_names):
+        """Class ids of the given class names"""
+        wanted = set(class_names)
+        return [class_id for class_id, name in self.names.items() if name in wanted]
+
+    def query(self, class_ids=None, class_names=None, min_confidence=None, region=None,
+              sources=None, frame_range=None):
+        """
+        Find detections matching all given conditions
+
+        The class and grid indexes narrow the candidate rows before the
+        remaining conditions are checked on the memory-mapped columns.
+
+        Args:
+            class_ids: Class ids to match
+            class_names: Class names to match (combined with class_ids)
+            min_confidence: Minimum confidence
+            region: (x1, y1, x2, y2) as fractions of the image the box
+                center must lie in, e.g. (2/3, 0, 1, 1) for the right third
+            sources: Source names to match
+            frame_range: (first, last) frame indexes, inclusive
+
+        Returns:
+            Dictionary of column arrays for the matching rows plus 'source'
+            names and 'class_name' names
+        """
+        with self.lock:
+            count = self.count
+            candidates = None
+
+            if class_ids is not None or class_names is not None:
+                wanted = list(class_ids or []) + self.class_ids_for(class_names or [])
+                candidates = self.posting_rows(self.class_postings, wanted)
+
+            if region is not None:
+                x1, y1, x2, y2 = region
+                first_x, last_x = int(x1 * self.grid), min(int(x2 * self.grid), self.grid - 1)
+                first_y, last_y = int(y1 * self.grid), min(int(y2 * self.grid), self.grid - 1)
+                cells = [cy * self.grid + cx for cy in range(first_y, last_y + 1)
+                         for cx in range(first_x, last_x + 1)]
+                region_rows = self.posting_rows(self.cell_postings, cells)
+                candidates = (region_rows if candidates is None
+                              else np.intersect1d(candidates, region_rows, assume_unique=True))
+
+            rows = np.arange(count) if candidates is None else candidates[candidates < count]
+            columns = {name: np.asarray(column[rows]) for name, column in self.columns.items()}
+            sources_list = list(self.sources)
+            names = dict(self.names)
+
+        keep = np.ones(len(rows), dtype=bool)
+        if min_confidence is not None:
+            keep &= columns['confidence'] >= min_confidence
+        if region is not None:
+            size = columns['image_size'].astype(np.float32)
+            centers = (columns['box'][:, :2] + columns['box'][:, 2:]) / 2
+            relative = centers / np.maximum(size, 1)
+            keep &= ((size[:, 0] > 0) & (relative[:, 0] >= x1) & (relative[:, 0] <= x2) &
+                     (relative[:, 1] >= y1) & (relative[:, 1] <= y2))
+        if sources is not None:
+            wanted_sources = set(sources)
+            source_ids = [i for i, source in enumerate(sources_list) if source in wanted_sources]
+            keep &= np.isin(columns['source_id'], source_ids)
+        if frame_range is not None:
+            keep &= ((columns['frame_index'] >= frame_range[0]) &
+                     (columns['frame_index'] <= frame_range[1]))
+
+        result = {name: values[keep] for name, values in columns.items()}
+        result['row'] = rows[keep]
+        result['source'] = [sources_list[i] for i in result['source_id'].tolist()]
+        result['class_name'] = [names.get(i, str(i)) for i in result['class_id'].tolist()]
+        return result
+
+    def frames(self, **conditions):
+        """
+        Find frames with at least one detection matching query() conditions
+
+        Returns:
+            Sorted list of (source, frame_index, timestamp)
+        """
+        result = self.query(**conditions)
+        frames = {(source, int(frame), None if np.isnan(ts) else float(ts))
+                  for source, frame, ts in zip(result['source'],
+                                               result['frame_index'].tolist(),
+                                               result['timestamp'].tolist())}
+        return sorted(frames, key=lambda f: (f[0], f[1]))
+
+    def __len__(self):
+        return self.count
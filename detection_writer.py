@@ -0,0 +1,338 @@
+"""
+Detection Writers
+Stream per-image and per-frame detections to JSON Lines, CSV, NPZ, Parquet
+or a queryable DetectionStore
+
+pyarrow is only needed for Parquet and is imported when such a writer is created.
+"""
+
+import csv
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+from config import DETECTION_WRITER_BUFFER
+from detection_store import DetectionStore
+from result_analyzer import Detections
+
+CSV_COLUMNS = ['source', 'frame_index', 'timestamp', 'width', 'height', 'class_id',
+               'class_name', 'confidence', 'x1', 'y1', 'x2', 'y2']
+
+
+class DetectionWriter:
+    """Base class: one write() per image or frame, close() when done"""
+
+    extension = ''
+
+    def __init__(self, path):
+        """
+        Initialize writer
+
+        Args:
+            path: Output file path
+        """
+        self.path = str(path)
+        # Video render and batch threads may share a writer
+        self.lock = threading.Lock()
+
+    def write(self, source, frame_index, timestamp, detections, image_shape=None):
+        """
+        Record the detections of one image or frame
+
+        Args:
+            source: Image path or video source name
+            frame_index: Frame number (0 for still images)
+            timestamp: Seconds from the start of the video, or None
+            detections: Detections from ResultsAnalyzer.extract_detections, or
+                None if nothing was found
+            image_shape: Optional (height, width, ...) of the analyzed image
+        """
+        if detections is None:
+            detections = Detections.empty()
+        with self.lock:
+            self.write_record(source, frame_index, timestamp, detections,
+                              image_shape[:2] if image_shape is not None else (None, None))
+
+    def write_record(self, source, frame_index, timestamp, detections, size):
+        """Format-specific write, called under the lock"""
+        raise NotImplementedError
+
+    def close(self):
+        """Flush and close the output file"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class JSONLinesWriter(DetectionWriter):
+    """One JSON object per image or frame, including those without detections"""
+
+    extension = '.jsonl'
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.file = open(self.path, 'w')
+
+    def write_record(self, source, frame_index, timestamp, detections, size):
+        record = {
+            'source': source,
+            'frame_index': frame_index,
+            'timestamp': timestamp,
+            'height': size[0],
+            'width': size[1],
+            'detections': detections.to_dicts()
+        }
+        self.file.write(json.dumps(record) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class CSVDetectionWriter(DetectionWriter):
+    """One row per detection; images without detections produce no rows"""
+
+    extension = '.csv'
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.file = open(self.path, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(CSV_COLUMNS)
+
+    def write_record(self, source, frame_index, timestamp, detections, size):
+        for class_id, class_name, confidence, box in zip(
+                detections.class_ids, detections.class_names(), detections.confidences,
+                detections.boxes):
+            self.writer.writerow([source, frame_index, timestamp, size[1], size[0],
+                                  int(class_id), class_name, f'{confidence:.4f}',
+                                  *(f'{v:.1f}' for v in box)])
+
+    def close(self):
+        self.file.close()
+
+
+class ColumnarDetectionWriter(DetectionWriter):
+    """Collects detections into typed columns, one entry per detection"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.sources = {}  # source -> id
+        self.class_names = {}  # class_id -> name
+        self.reset_columns()
+
+    def reset_columns(self):
+        """Start empty column buffers"""
+        self.columns = {name: [] for name in
+                        ('source_id', 'frame_index', 'timestamp', 'class_id',
+                         'confidence', 'box')}
+        self.buffered = 0
+
+    def write_record(self, source, frame_index, timestamp, detections, size):
+        if not detections:
+            return
+        source_id = self.sources.setdefault(source, len(self.sources))
+        count = len(detections)
+        self.columns['source_id'].append(np.full(count, source_id, dtype=np.int32))
+        self.columns['frame_index'].append(np.full(count, frame_index, dtype=np.int64))
+        self.columns['timestamp'].append(np.full(
+            count, np.nan if timestamp is None else timestamp, dtype=np.float64))
+        self.columns['class_id'].append(detections.class_ids.astype(np.int16))
+        self.columns['confidence'].append(detections.confidences)
+        self.columns['box'].append(detections.boxes)
+        for class_id in np.unique(detections.class_ids):
+            self.class_names.setdefault(int(class_id), detections.names.get(int(class_id),
+                                                                            str(class_id)))
+        self.buffered += count
+
+    def concatenated_columns(self):
+        """Buffered columns as single arrays"""
+        empty = {'box': np.zeros((0, 4), dtype=np.float32)}
+        return {name: np.concatenate(chunks) if chunks else empty.get(name, np.zeros(0))
+                for name, chunks in self.columns.items()}
+
+
+class NPZDetectionWriter(ColumnarDetectionWriter):
+    """
+    Compressed NumPy archive written on close
+
+    Arrays: source_id, frame_index, timestamp (NaN for images), class_id,
+    confidence, box (N, 4 xyxy), plus sources and class_ids/class_names lookups.
+
+    Every DETECTION_WRITER_BUFFER detections the columns are appended to raw
+    files in a temporary folder next to the output, and close() compresses
+    them from memory maps, so memory stays bounded on long videos.
+    """
+
+    extension = '.npz'
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.spill_dir = None
+        self.spill_formats = {}  # column -> (dtype, shape of one row)
+        self.spilled = 0
+
+    def write_record(self, source, frame_index, timestamp, detections, size):
+        super().write_record(source, frame_index, timestamp, detections, size)
+        if self.buffered >= DETECTION_WRITER_BUFFER:
+            self.spill()
+
+    def spill(self):
+        """Append buffered detections to the temporary column files"""
+        if not self.buffered:
+            return
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(
+                prefix='npz_', dir=os.path.dirname(os.path.abspath(self.path)))
+        for name, array in self.concatenated_columns().items():
+            self.spill_formats[name] = (array.dtype, array.shape[1:])
+            with open(os.path.join(self.spill_dir, name), 'ab') as f:
+                array.tofile(f)
+        self.spilled += self.buffered
+        self.reset_columns()
+
+    def spilled_columns(self):
+        """Temporary column files as read-only memory maps"""
+        return {name: np.memmap(os.path.join(self.spill_dir, name), dtype=dtype, mode='r',
+                                shape=(self.spilled, *row_shape))
+                for name, (dtype, row_shape) in self.spill_formats.items()}
+
+    def close(self):
+        with self.lock:
+            try:
+                if self.spilled:
+                    self.spill()
+                    columns = self.spilled_columns()
+                else:
+                    columns = self.concatenated_columns()
+                class_ids = sorted(self.class_names)
+                np.savez_compressed(
+                    self.path,
+                    sources=np.array(list(self.sources), dtype=str),
+                    class_ids=np.array(class_ids, dtype=np.int16),
+                    class_names=np.array([self.class_names[c] for c in class_ids], dtype=str),
+                    **columns
+                )
+                del columns  # Release the memory maps before removing their files
+            finally:
+                if self.spill_dir is not None:
+                    shutil.rmtree(self.spill_dir, ignore_errors=True)
+                    self.spill_dir = None
+
+
+class ParquetDetectionWriter(ColumnarDetectionWriter):
+    """Parquet file written in row groups of DETECTION_WRITER_BUFFER detections"""
+
+    extension = '.parquet'
+
+    @staticmethod
+    def is_available():
+        """Check whether pyarrow is installed"""
+        return importlib.util.find_spec('pyarrow') is not None
+
+    def __init__(self, path):
+        if not self.is_available():
+            raise ImportError("Parquet output requires pyarrow (pip install pyarrow)")
+        super().__init__(path)
+        self.writer = None
+
+    def write_record(self, source, frame_index, timestamp, detections, size):
+        super().write_record(source, frame_index, timestamp, detections, size)
+        if self.buffered >= DETECTION_WRITER_BUFFER:
+            self.flush()
+
+    def flush(self):
+        """Write buffered detections as one row group"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not self.buffered:
+            return
+        columns = self.concatenated_columns()
+        sources = np.array(list(self.sources), dtype=object)
+        names = np.array([self.class_names[c] for c in columns['class_id']], dtype=object)
+        table = pa.table({
+            'source': sources[columns['source_id']],
+            'frame_index': columns['frame_index'],
+            'timestamp': columns['timestamp'],
+            'class_id': columns['class_id'],
+            'class_name': names,
+            'confidence': columns['confidence'],
+            'x1': columns['box'][:, 0],
+            'y1': columns['box'][:, 1],
+            'x2': columns['box'][:, 2],
+            'y2': columns['box'][:, 3]
+        })
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+        self.reset_columns()
+
+    def close(self):
+        with self.lock:
+            self.flush()
+            if self.writer is not None:
+                self.writer.close()
+
+
+class StoreDetectionWriter(DetectionWriter):
+    """
+    Appends to a DetectionStore directory, created if missing
+
+    Unlike the file writers an existing store is extended, not replaced, so
+    several runs can be queried together.
+    """
+
+    extension = '.dstore'
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.store = DetectionStore(self.path)
+
+    def write_record(self, source, frame_index, timestamp, detections, size):
+        height, width = size
+        self.store.append(source, frame_index, timestamp, detections,
+                          (width, height) if width else None)
+
+    def close(self):
+        self.store.close()
+
+
+WRITERS = {
+    'jsonl': JSONLinesWriter,
+    'csv': CSVDetectionWriter,
+    'npz': NPZDetectionWriter,
+    'parquet': ParquetDetectionWriter,
+    'dstore': StoreDetectionWriter
+}
+
+
+def detection_format(path):
+    """Format name for an output path, from its extension"""
+    suffix = str(path).lower().rstrip('/\\').rsplit('.', 1)[-1]
+    return 'jsonl' if suffix == 'json' else suffix
+
+
+def create_detection_writer(path, fmt=None):
+    """
+    Create a detection writer
+
+    Args:
+        path: Output file path (a directory for 'dstore')
+        fmt: 'jsonl', 'csv', 'npz', 'parquet' or 'dstore' (defaults to the path's
+            extension)
+
+    Returns:
+        DetectionWriter instance
+    """
+    fmt = fmt or detection_format(path)
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown detection format '{fmt}', "
+                         f"choose from: {', '.join(WRITERS)}")
+    return WRITERS[fmt](path)
@@ -1,12 +1,18 @@
 """
 Image Processing Utilities
-Handles image reading, processing, and display conversion
+Handles image reading, writing, resizing and annotation (no Qt dependency)
 """
 
 import cv2
 import numpy as np
-from PyQt5.QtGui import QImage, QPixmap
-from PyQt5.QtCore import Qt
+from PIL import Image
+
+# Decode flags by downscale factor; JPEG decodes these directly from DCT blocks
+REDUCED_READ_FLAGS = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8
+}
 
 
 class ImageProcessor:
@@ -26,6 +32,59 @@ class ImageProcessor:
         image = cv2.imread(image_path)
         return image
     
+    @staticmethod
+    def reduction_factor(width, height, target_size):
+        """
+        Largest decode downscale that keeps the long side at least target_size
+        
+        Args:
+            width: Original image width
+            height: Original image height
+            target_size: Long side the model letterboxes to
+            
+        Returns:
+            1, 2, 4 or 8
+        """
+        factor = 1
+        for candidate in sorted(REDUCED_READ_FLAGS):
+            if max(width, height) // candidate >= target_size:
+                factor = candidate
+        return factor
+    
+    @staticmethod
+    def read_image_reduced(image_path, target_size):
+        """
+        Read image at a reduced resolution that still covers target_size
+        
+        The original size comes from the file header, so oversized images
+        are never decoded at full resolution.
+        
+        Args:
+            image_path: Path to image file
+            target_size: Long side the model letterboxes to
+            
+        Returns:
+            Tuple (image or None if failed, (scale_x, scale_y)) where scale
+            maps reduced pixel coordinates back to the original image
+        """
+        try:
+            with Image.open(image_path) as header:
+                width, height = header.size
+        except Exception:
+            return ImageProcessor.read_image(image_path), (1.0, 1.0)
+        
+        factor = ImageProcessor.reduction_factor(width, height, target_size)
+        if factor == 1:
+            return ImageProcessor.read_image(image_path), (1.0, 1.0)
+        
+        image = cv2.imread(image_path, REDUCED_READ_FLAGS[factor])
+        if image is None:
+            return None, (1.0, 1.0)
+        # imread applies EXIF rotation, the header size does not
+        if (image.shape[1] > image.shape[0]) != (width > height):
+            width, height = height, width
+        return image, (width / image.shape[1], height / image.shape[0])
+    
     @staticmethod
     def save_image(image, output_path):
         """
@@ -45,44 +104,96 @@ class ImageProcessor:
             return False
     
     @staticmethod
-    def numpy_to_pixmap(image):
+    def class_color(class_id):
+        """Stable BGR color for a class id"""
+        hue = (int(class_id) * 37) % 180
+        hsv = np.uint8([[[hue, 200, 255]]])
+        return tuple(int(c) for c in cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)[0, 0])
+    
+    @staticmethod
+    def draw_detections(image, boxes, class_ids, confidences, names, track_ids=None):
         """
-        Convert numpy array to QPixmap for display
+        Draw detection boxes and labels on a copy of image
         
         Args:
-            image: numpy array (BGR format)
+            image: numpy array of image (BGR)
+            boxes: Array (N, 4) of [x1, y1, x2, y2]
+            class_ids: Array (N,) of class ids
+            confidences: Array (N,) of confidences
+            names: Dictionary mapping class id to class name
+            track_ids: Optional array (N,) of track ids shown in labels
             
         Returns:
-            QPixmap object
+            Annotated copy of image
         """
-        # Convert BGR to RGB
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb_image.shape
-        bytes_per_line = ch * w
+        annotated = image.copy()
+        line_width = max(2, round(sum(image.shape[:2]) / 2 * 0.003))
         
-        # Convert to QImage
-        qt_image = QImage(rgb_image.data, w, h, bytes_per_line, 
-                         QImage.Format_RGB888)
+        for i, box in enumerate(boxes):
+            x1, y1, x2, y2 = (int(v) for v in box)
+            color = ImageProcessor.class_color(class_ids[i])
+            label = f"{names.get(int(class_ids[i]), int(class_ids[i]))} {confidences[i]:.2f}"
+            if track_ids is not None:
+                label = f"#{int(track_ids[i])} {label}"
+            
+            cv2.rectangle(annotated, (x1, y1), (x2, y2), color, line_width)
+            (text_w, text_h), baseline = cv2.getTextSize(
+                label, cv2.FONT_HERSHEY_SIMPLEX, line_width / 3, max(1, line_width - 1)
+            )
+            top = max(y1 - text_h - baseline, 0)
+            cv2.rectangle(annotated, (x1, top), (x1 + text_w, top + text_h + baseline),
+                          color, -1)
+            cv2.putText(annotated, label, (x1, top + text_h), cv2.FONT_HERSHEY_SIMPLEX,
+                        line_width / 3, (255, 255, 255), max(1, line_width - 1),
+                        cv2.LINE_AA)
         
-        # Convert to QPixmap
-        return QPixmap.fromImage(qt_image)
+        return annotated
     
     @staticmethod
-    def scale_pixmap(pixmap, label_size, keep_aspect_ratio=True):
+    def letterbox(image, new_shape, color=(114, 114, 114)):
         """
-        Scale pixmap to fit label
-        
+        Resize image keeping aspect ratio and pad to new_shape
+
         Args:
-            pixmap: QPixmap to scale
-            label_size: QSize of target label
-            keep_aspect_ratio: Whether to maintain aspect ratio
-            
+            image: numpy array of image
+            new_shape: Target (height, width)
+            color: Padding color (BGR)
+
+        Returns:
+            Tuple (padded image, scale ratio, (pad_x, pad_y))
+        """
+        h, w = image.shape[:2]
+        ratio = min(new_shape[0] / h, new_shape[1] / w)
+        new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+        pad_x = (new_shape[1] - new_w) / 2
+        pad_y = (new_shape[0] - new_h) / 2
+
+        if (new_w, new_h) != (w, h):
+            image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+        top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+        left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+        padded = cv2.copyMakeBorder(image, top, bottom, left, right,
+                                    cv2.BORDER_CONSTANT, value=color)
+        return padded, ratio, (pad_x, pad_y)
+    
+    @staticmethod
+    def dhash(image, hash_size=8):
+        """
+        Difference hash of an image for near-duplicate detection
+
+        The grayscale image is shrunk to (hash_size + 1) x hash_size and each
+        bit records whether a pixel is brighter than its right neighbour, so
+        small changes in exposure, noise or compression keep most bits.
+
+        Args:
+            image: numpy array of image (BGR)
+            hash_size: Bits per row and rows of the hash
+
         Returns:
-            Scaled QPixmap
+            Hash as an int of hash_size * hash_size bits
         """
-        if keep_aspect_ratio:
-            return pixmap.scaled(label_size, Qt.KeepAspectRatio, 
-                               Qt.SmoothTransformation)
-        else:
-            return pixmap.scaled(label_size, Qt.IgnoreAspectRatio,
-                               Qt.SmoothTransformation)
\ No newline at end of file
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+        bits = (small[:, 1:] > small[:, :-1]).flatten()
+        return int.from_bytes(np.packbits(bits).tobytes(), 'big')
@@ -0,0 +1,190 @@
+"""
+Inference Backends
+Runs the YOLO model on PyTorch, ONNX Runtime or OpenVINO behind one interface
+
+ultralytics (and with it torch) is imported on first load, not at module import.
+"""
+
+import hashlib
+import importlib.util
+import shutil
+from pathlib import Path
+from config import EXPORT_CACHE_DIR
+
+
+class ExportCache:
+    """Stores exported models keyed by weights hash and input size"""
+
+    def __init__(self, cache_dir=None):
+        """
+        Initialize export cache
+
+        Args:
+            cache_dir: Directory holding exported models (defaults to EXPORT_CACHE_DIR)
+        """
+        self.cache_dir = Path(cache_dir or EXPORT_CACHE_DIR)
+
+    @staticmethod
+    def file_hash(path, chunk_size=1 << 20):
+        """
+        Hash a weights file
+
+        Args:
+            path: Path to file
+            chunk_size: Bytes read per step
+
+        Returns:
+            Short hex digest of the file contents
+        """
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()[:16]
+
+    def entry_path(self, weights_path, imgsz, tag, artifact_name):
+        """
+        Get cache location for an exported model
+
+        Args:
+            weights_path: Path to source PyTorch weights
+            imgsz: Export input size
+            tag: Export variant (e.g. 'onnx', 'openvino')
+            artifact_name: File or directory name of the exported model
+
+        Returns:
+            Path inside the cache (may not exist yet)
+        """
+        weights_path = Path(weights_path)
+        key = f'{weights_path.stem}-{self.file_hash(weights_path)}-{imgsz}-{tag}'
+        return self.cache_dir / key / artifact_name
+
+
+class PyTorchBackend:
+    """Runs the PyTorch weights directly"""
+
+    name = 'pytorch'
+    required_module = None
+    predict_kwargs = {}
+
+    @classmethod
+    def is_available(cls):
+        """Check if the backend's runtime is installed"""
+        return (cls.required_module is None or
+                importlib.util.find_spec(cls.required_module) is not None)
+
+    def load(self, weights, imgsz, progress_callback=None):
+        """
+        Load model for this backend
+
+        Args:
+            weights: PyTorch weights file name or path
+            imgsz: Inference input size
+            progress_callback: Optional callback function(message)
+
+        Returns:
+            YOLO model ready for inference
+        """
+        from ultralytics import YOLO
+
+        if progress_callback:
+            progress_callback('Loading PyTorch weights...')
+        return YOLO(weights)
+
+
+class ExportedBackend(PyTorchBackend):
+    """Base for backends that run an exported copy of the PyTorch weights"""
+
+    export_format = None
+    export_kwargs = {}
+    artifact_name = None
+
+    def __init__(self, cache=None):
+        self.cache = cache or ExportCache()
+
+    def export(self, weights, imgsz, target, progress_callback=None):
+        """
+        Export PyTorch weights and move the result into the cache
+
+        Args:
+            weights: Path to PyTorch weights
+            imgsz: Export input size
+            target: Cache path for the exported model
+            progress_callback: Optional callback function(message)
+        """
+        from ultralytics import YOLO
+
+        if progress_callback:
+            progress_callback(f'Exporting model to {self.name} (first run only)...')
+
+        exported = YOLO(str(weights)).export(format=self.export_format,
+                                             imgsz=imgsz, **self.export_kwargs)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(exported), str(target))
+
+    def resolve_weights(self, weights, progress_callback=None):
+        """Return local path to the PyTorch weights, downloading them if needed"""
+        weights = Path(weights)
+        if weights.exists():
+            return weights
+
+        # Let ultralytics fetch the weights, then use its local copy
+        model = super().load(str(weights), None, progress_callback)
+        return Path(getattr(model, 'ckpt_path', None) or weights)
+
+    def load(self, weights, imgsz, progress_callback=None):
+        from ultralytics import YOLO
+
+        weights = self.resolve_weights(weights, progress_callback)
+        target = self.cache.entry_path(weights, imgsz, self.name, self.artifact_name)
+
+        if not target.exists():
+            self.export(weights, imgsz, target, progress_callback)
+
+        if progress_callback:
+            progress_callback(f'Loading {self.name} model...')
+        return YOLO(str(target), task='detect')
+
+
+class ONNXRuntimeBackend(ExportedBackend):
+    """Runs an ONNX export on the ONNX Runtime CPU execution provider"""
+
+    name = 'onnxruntime'
+    required_module = 'onnxruntime'
+    predict_kwargs = {'device': 'cpu'}
+    export_format = 'onnx'
+    export_kwargs = {'dynamic': True}  # Allow batched inference
+    artifact_name = 'model.onnx'
+
+
+class OpenVINOBackend(ExportedBackend):
+    """Runs an OpenVINO IR export on CPU"""
+
+    name = 'openvino'
+    required_module = 'openvino'
+    predict_kwargs = {'device': 'cpu'}
+    export_format = 'openvino'
+    export_kwargs = {'dynamic': True}
+    artifact_name = 'model_openvino_model'  # Suffix lets ultralytics detect the format
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (PyTorchBackend, ONNXRuntimeBackend, OpenVINOBackend)
+}
+
+
+def get_backend(name):
+    """
+    Create backend by name
+
+    Args:
+        name: One of BACKENDS keys
+
+    Returns:
+        Backend instance
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}', "
+                         f"expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
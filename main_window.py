@@ -5,19 +5,24 @@ Contains the main UI and application logic
 
 from PyQt5.QtWidgets import (QMainWindow, QPushButton, QLabel, QVBoxLayout, 
                              QHBoxLayout, QWidget, QFileDialog, QTableWidget, 
-                             QTableWidgetItem, QMessageBox, QProgressBar)
+                             QTableWidgetItem, QMessageBox, QProgressBar, QSlider)
 from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QFont
 
 from config import (WINDOW_TITLE, WINDOW_WIDTH, WINDOW_HEIGHT, 
-                   VIDEO_EXTENSIONS, DEFAULT_CAMERA_INDEX)
+                   VIDEO_EXTENSIONS, DEFAULT_CAMERA_INDEX, SESSION_STATS_INTERVAL_MS,
+                   CONFIDENCE_THRESHOLD, IOU_THRESHOLD, CANDIDATE_CONFIDENCE,
+                   THRESHOLD_DEBOUNCE_MS)
 from styles import (get_main_stylesheet, get_status_style, get_stats_style, 
                    get_image_label_style)
 from model_handler import ModelHandler
+from model_loader import ModelLoaderThread
+from performance_overlay import TimedImageLabel, PerformanceOverlay
 from video_thread import VideoThread
 from image_processor import ImageProcessor
-from results_analyzer import ResultsAnalyzer
-from batch_processor import BatchProcessor
+from qt_image_utils import QtImageUtils
+from result_analyzer import ResultsAnalyzer
+from batch_worker import BatchWorker
 
 
 class TrafficSignRecognition(QMainWindow):
@@ -28,18 +33,29 @@ class TrafficSignRecognition(QMainWindow):
         
         # Initialize components
         self.model_handler = ModelHandler()
-        self.batch_processor = BatchProcessor(self.model_handler)
+        # Folder jobs run on their own thread, one queued folder at a time
+        self.batch_worker = BatchWorker(self.model_handler)
+        self.batch_worker.job_started.connect(self.batch_started)
+        self.batch_worker.progress.connect(self.batch_progress)
+        self.batch_worker.job_finished.connect(self.batch_finished)
+        self.batch_worker.job_failed.connect(self.batch_failed)
         
         # State variables
         self.current_image = None
+        self.source_image = None  # Unannotated image the candidates belong to
+        self.current_candidates = None  # Pre-NMS candidates for re-thresholding
+        self.current_video_path = None
         self.video_thread = None
         self.camera_active = False
+        self.model_loader = None
+        self.pending_tasks = []  # Work requested before the model was ready
         
         # Initialize UI
         self.init_ui()
         
-        # Load YOLO model
-        self.load_model()
+        # Load YOLO model once the event loop is running so the window
+        # appears immediately
+        QTimer.singleShot(0, self.load_model)
         
     def init_ui(self):
         """Initialize the user interface"""
@@ -87,6 +103,9 @@ class TrafficSignRecognition(QMainWindow):
         
         layout.addSpacing(20)
         
+        # Threshold sliders
+        self.create_threshold_controls(layout)
+        
         # Progress bar
         self.progress_bar = QProgressBar()
         self.progress_bar.setVisible(False)
@@ -102,6 +121,20 @@ class TrafficSignRecognition(QMainWindow):
         self.stats_display.setWordWrap(True)
         layout.addWidget(self.stats_display)
         
+        # Session-wide aggregates across video, camera and batch runs
+        session_label = QLabel('🧮 Session Statistics')
+        session_label.setFont(QFont('Arial', 12, QFont.Bold))
+        layout.addWidget(session_label)
+        
+        self.session_display = QLabel(self.model_handler.statistics.format_snapshot())
+        self.session_display.setStyleSheet(get_stats_style())
+        self.session_display.setWordWrap(True)
+        layout.addWidget(self.session_display)
+        
+        self.session_timer = QTimer(self)
+        self.session_timer.timeout.connect(self.refresh_session_statistics)
+        self.session_timer.start(SESSION_STATS_INTERVAL_MS)
+        
         layout.addStretch()
         
         return panel
@@ -125,6 +158,16 @@ class TrafficSignRecognition(QMainWindow):
         btn_batch.clicked.connect(self.batch_process)
         layout.addWidget(btn_batch)
         
+        batch_controls = QHBoxLayout()
+        self.btn_batch_pause = QPushButton('⏸️ Pause Batch')
+        self.btn_batch_pause.clicked.connect(self.toggle_batch_pause)
+        batch_controls.addWidget(self.btn_batch_pause)
+        
+        btn_batch_cancel = QPushButton('✖️ Cancel Batch')
+        btn_batch_cancel.clicked.connect(self.cancel_batch)
+        batch_controls.addWidget(btn_batch_cancel)
+        layout.addLayout(batch_controls)
+        
         layout.addSpacing(20)
         
         # Save buttons
@@ -132,10 +175,65 @@ class TrafficSignRecognition(QMainWindow):
         btn_save_image.clicked.connect(self.save_image)
         layout.addWidget(btn_save_image)
         
+        btn_save_video = QPushButton('🎬 Save Video with Detections')
+        btn_save_video.clicked.connect(self.save_video)
+        layout.addWidget(btn_save_video)
+        
         btn_stop = QPushButton('⏹️ Stop Processing')
         btn_stop.clicked.connect(self.stop_processing)
         layout.addWidget(btn_stop)
         
+        layout.addSpacing(20)
+        
+        # Performance buttons
+        btn_overlay = QPushButton('📈 Toggle Performance Overlay')
+        btn_overlay.clicked.connect(self.toggle_performance_overlay)
+        layout.addWidget(btn_overlay)
+        
+        btn_export_perf = QPushButton('📤 Export Performance Stats')
+        btn_export_perf.clicked.connect(self.export_performance_stats)
+        layout.addWidget(btn_export_perf)
+        
+        btn_export_session = QPushButton('🧮 Export Session Statistics')
+        btn_export_session.clicked.connect(self.export_session_statistics)
+        layout.addWidget(btn_export_session)
+        
+    def create_threshold_controls(self, layout):
+        """Create confidence and IoU sliders that re-filter the current image"""
+        # Re-filter once the slider pauses rather than on every step of a drag
+        self.threshold_timer = QTimer(self)
+        self.threshold_timer.setSingleShot(True)
+        self.threshold_timer.setInterval(THRESHOLD_DEBOUNCE_MS)
+        self.threshold_timer.timeout.connect(self.apply_thresholds)
+        
+        self.conf_label = QLabel()
+        layout.addWidget(self.conf_label)
+        self.conf_slider = QSlider(Qt.Horizontal)
+        self.conf_slider.setRange(round(CANDIDATE_CONFIDENCE * 100), 100)
+        self.conf_slider.setValue(round(CONFIDENCE_THRESHOLD * 100))
+        self.conf_slider.valueChanged.connect(self.schedule_thresholds)
+        layout.addWidget(self.conf_slider)
+        
+        self.iou_label = QLabel()
+        layout.addWidget(self.iou_label)
+        self.iou_slider = QSlider(Qt.Horizontal)
+        self.iou_slider.setRange(1, 100)
+        self.iou_slider.setValue(round(IOU_THRESHOLD * 100))
+        self.iou_slider.valueChanged.connect(self.schedule_thresholds)
+        layout.addWidget(self.iou_slider)
+        
+        self.update_threshold_labels()
+        
+    def schedule_thresholds(self):
+        """Show the new slider values and re-filter after the slider pauses"""
+        self.update_threshold_labels()
+        self.threshold_timer.start()
+        
+    def update_threshold_labels(self):
+        """Show the current slider values"""
+        self.conf_label.setText(f'Confidence: {self.conf_slider.value() / 100:.2f}')
+        self.iou_label.setText(f'IoU: {self.iou_slider.value() / 100:.2f}')
+    
     def create_right_panel(self):
         """Create right display panel"""
         panel = QWidget()
@@ -143,11 +241,16 @@ class TrafficSignRecognition(QMainWindow):
         panel.setLayout(layout)
         
         # Image display
-        self.image_label = QLabel('No image loaded')
+        self.image_label = TimedImageLabel('No image loaded', self.model_handler.monitor)
         self.image_label.setAlignment(Qt.AlignCenter)
         self.image_label.setStyleSheet(get_image_label_style())
         layout.addWidget(self.image_label, 3)
         
+        # Per-stage latency overlay drawn over the image
+        self.performance_overlay = PerformanceOverlay(
+            self.image_label, self.model_handler.monitor
+        )
+        
         # Results table
         results_label = QLabel('📋 Detection Results')
         results_label.setFont(QFont('Arial', 12, QFont.Bold))
@@ -164,17 +267,47 @@ class TrafficSignRecognition(QMainWindow):
         return panel
     
     def load_model(self):
-        """Load YOLO model"""
+        """Load YOLO model in background thread"""
         self.update_status('Loading YOLO model...', 'info')
         
-        success, message = self.model_handler.load_model()
+        self.model_loader = ModelLoaderThread(self.model_handler)
+        self.model_loader.progress.connect(
+            lambda message: self.update_status(message, 'info')
+        )
+        self.model_loader.loaded.connect(self.model_loaded)
+        self.model_loader.start()
+    
+    def model_loaded(self, success, message):
+        """Handle model loading completion and run queued work"""
+        pending_tasks, self.pending_tasks = self.pending_tasks, []
         
         if success:
             self.update_status('Model loaded ✓', 'success')
+            for task in pending_tasks:
+                task()
         else:
             self.update_status('Model loading failed ✗', 'error')
             QMessageBox.critical(self, 'Error', message)
     
+    def run_when_model_ready(self, task):
+        """
+        Run task now if the model is loaded, otherwise queue it
+        
+        Args:
+            task: Callable to run once the model is ready
+        """
+        if self.model_handler.is_loaded():
+            task()
+            return
+        
+        if self.model_loader is not None and self.model_loader.isRunning():
+            self.pending_tasks.append(task)
+            self.update_status(
+                f'Waiting for model ({len(self.pending_tasks)} queued)...', 'info'
+            )
+        else:
+            QMessageBox.warning(self, 'Warning', 'Model is not loaded')
+    
     def upload_image(self):
         """Upload and process a single image"""
         file_path, _ = QFileDialog.getOpenFileName(
@@ -183,7 +316,7 @@ class TrafficSignRecognition(QMainWindow):
         )
         
         if file_path:
-            self.process_image(file_path)
+            self.run_when_model_ready(lambda: self.process_image(file_path))
     
     def process_image(self, image_path):
         """Process image with YOLO detection"""
@@ -191,18 +324,15 @@ class TrafficSignRecognition(QMainWindow):
             self.update_status('Processing image...', 'info')
             
             # Read image
-            image = ImageProcessor.read_image(image_path)
+            with self.model_handler.monitor.measure('decode'):
+                image = ImageProcessor.read_image(image_path)
             if image is None:
                 raise ValueError('Failed to load image')
             
-            # Run detection
-            results = self.model_handler.predict(image)
-            annotated_image = self.model_handler.get_annotated_image(results)
-            self.current_image = annotated_image
-            
-            # Display and analyze results
-            self.display_image(annotated_image)
-            self.analyze_and_display_results(results)
+            # Run detection once; slider changes re-filter the candidates
+            self.source_image = image
+            self.current_candidates = self.model_handler.predict_candidates(image)
+            self.apply_thresholds()
             
             self.update_status('Detection complete ✓', 'success')
             
@@ -212,17 +342,37 @@ class TrafficSignRecognition(QMainWindow):
     
     def display_image(self, image):
         """Display image in label"""
-        pixmap = ImageProcessor.numpy_to_pixmap(image)
-        scaled_pixmap = ImageProcessor.scale_pixmap(
-            pixmap, self.image_label.size()
-        )
+        monitor = self.model_handler.monitor
+        with monitor.measure('numpy_to_pixmap'):
+            pixmap = QtImageUtils.numpy_to_pixmap(image)
+            scaled_pixmap = QtImageUtils.scale_pixmap(
+                pixmap, self.image_label.size()
+            )
         self.image_label.setPixmap(scaled_pixmap)
+        monitor.tick()
     
-    def analyze_and_display_results(self, results):
-        """Analyze detection results and update displays"""
-        # Extract detections
-        detections = ResultsAnalyzer.extract_detections(results)
+    def apply_thresholds(self):
+        """Re-filter the current image's candidates with the slider values"""
+        self.update_threshold_labels()
+        if self.current_candidates is None:
+            return
         
+        detections = ResultsAnalyzer.apply_thresholds(
+            self.current_candidates, self.conf_slider.value() / 100,
+            self.iou_slider.value() / 100
+        )
+        with self.model_handler.monitor.measure('plot'):
+            annotated_image = ImageProcessor.draw_detections(
+                self.source_image, detections.boxes, detections.class_ids,
+                detections.confidences, detections.names
+            )
+        self.current_image = annotated_image
+        
+        self.display_image(annotated_image)
+        self.display_detections(detections)
+    
+    def display_detections(self, detections):
+        """Update results table and statistics for one image's detections"""
         if not detections:
             self.results_table.setRowCount(0)
             self.stats_display.setText('No objects detected')
@@ -271,18 +421,22 @@ class TrafficSignRecognition(QMainWindow):
         )
         
         if file_path:
-            self.process_video(file_path)
+            self.current_video_path = file_path
+            self.run_when_model_ready(lambda: self.process_video(file_path))
     
-    def process_video(self, video_path):
-        """Process video with YOLO detection"""
+    def process_video(self, video_path, output_path=None):
+        """Process video with YOLO detection, optionally saving the annotated video"""
         try:
             self.update_status('Processing video...', 'info')
             
             # Stop any existing thread
             self.stop_processing()
             
+            # Threshold sliders apply to still images only
+            self.current_candidates = None
+            
             # Create and start video thread
-            self.video_thread = VideoThread(video_path, self.model_handler)
+            self.video_thread = VideoThread(video_path, self.model_handler, output_path)
             self.video_thread.frame_ready.connect(self.display_image)
             self.video_thread.finished.connect(self.video_finished)
             self.video_thread.error_occurred.connect(self.handle_error)
@@ -294,7 +448,7 @@ class TrafficSignRecognition(QMainWindow):
     def toggle_camera(self):
         """Toggle live camera detection"""
         if not self.camera_active:
-            self.start_camera()
+            self.run_when_model_ready(self.start_camera)
         else:
             self.stop_camera()
     
@@ -303,6 +457,9 @@ class TrafficSignRecognition(QMainWindow):
         try:
             self.update_status('Starting camera...', 'info')
             
+            # Threshold sliders apply to still images only
+            self.current_candidates = None
+            
             # Create and start camera thread
             self.video_thread = VideoThread(DEFAULT_CAMERA_INDEX, self.model_handler)
             self.video_thread.frame_ready.connect(self.display_image)
@@ -329,7 +486,12 @@ class TrafficSignRecognition(QMainWindow):
     
     def video_finished(self):
         """Handle video processing completion"""
-        self.update_status('Video processing complete ✓', 'success')
+        dropped = self.video_thread.pipeline.export_dropped if self.video_thread else 0
+        if dropped:
+            self.update_status(f'Video processing complete; export repeated {dropped} '
+                               f'frames it could not keep up with', 'warning')
+        else:
+            self.update_status('Video processing complete ✓', 'success')
         if self.camera_active:
             self.stop_camera()
     
@@ -351,40 +513,90 @@ class TrafficSignRecognition(QMainWindow):
         if not folder_path:
             return
         
-        try:
-            self.update_status('Batch processing...', 'info')
-            self.progress_bar.setVisible(True)
-            self.progress_bar.setValue(0)
-            
-            # Progress callback
-            def update_progress(current, total):
-                progress = int((current / total) * 100)
-                self.progress_bar.setValue(progress)
-                from PyQt5.QtWidgets import QApplication
-                QApplication.processEvents()
-            
-            # Process folder
-            success_count, total_count, output_folder = self.batch_processor.process_folder(
-                folder_path, progress_callback=update_progress
+        self.run_when_model_ready(lambda: self.queue_batch(folder_path))
+    
+    def queue_batch(self, folder_path):
+        """Queue a folder on the batch worker"""
+        self.batch_worker.add_job(folder_path)
+        if self.batch_worker.is_busy():
+            self.update_status(
+                f'Batch queued ({self.batch_worker.pending_jobs()} waiting)', 'info'
             )
-            
+    
+    def batch_started(self, folder_path):
+        """Show progress for a batch job that started"""
+        self.update_status(f'Batch processing {folder_path}...', 'info')
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+    
+    def batch_progress(self, folder_path, current, total, rate, eta):
+        """Update progress bar, throughput and ETA of the running batch job"""
+        if total is None:
+            # Still scanning the folder: show a busy indicator
+            self.progress_bar.setRange(0, 0)
+            progress_text = f'{current} images'
+        else:
+            self.progress_bar.setRange(0, 100)
+            self.progress_bar.setValue(int((current / total) * 100))
+            progress_text = f'{current}/{total} images'
+        
+        eta_text = f', ETA {int(eta) // 60}:{int(eta) % 60:02d}' if eta is not None else ''
+        pending = self.batch_worker.pending_jobs()
+        queued_text = f', {pending} queued' if pending else ''
+        paused_text = ' (paused)' if self.batch_worker.paused else ''
+        self.update_status(
+            f'Batch{paused_text}: {progress_text} ({rate:.1f} img/s{eta_text}){queued_text}',
+            'info'
+        )
+    
+    def batch_finished(self, folder_path, success_count, total_count, output_folder, stats):
+        """Report a finished batch job"""
+        if self.batch_worker.pending_jobs() == 0:
             self.progress_bar.setVisible(False)
-            
-            if total_count == 0:
-                QMessageBox.information(self, 'Info', 'No images found in folder')
-                self.update_status('No images found', 'warning')
-            else:
-                self.update_status(f'Processed {success_count}/{total_count} images ✓', 'success')
+        
+        if total_count == 0:
+            self.update_status('No images found', 'warning')
+            QMessageBox.information(self, 'Info', f'No images found in {folder_path}')
+        elif stats.get('cancelled'):
+            self.update_status(
+                f"Batch cancelled after {stats['processed']} images", 'warning'
+            )
+        else:
+            self.update_status(f'Processed {success_count}/{total_count} images ✓', 'success')
+            if self.batch_worker.pending_jobs() == 0:
                 QMessageBox.information(
                     self, 'Success', 
                     f'Successfully processed {success_count} out of {total_count} images.\n'
+                    f"{stats['skipped']} unchanged images were skipped.\n"
+                    f"{stats['deduplicated']} near-duplicates reused detections.\n"
                     f'Results saved to: {output_folder}'
                 )
-            
-        except Exception as e:
+    
+    def batch_failed(self, folder_path, message):
+        """Report a failed batch job"""
+        if self.batch_worker.pending_jobs() == 0:
             self.progress_bar.setVisible(False)
-            QMessageBox.critical(self, 'Error', f'Batch processing failed: {str(e)}')
-            self.update_status('Batch processing failed ✗', 'error')
+        QMessageBox.critical(self, 'Error', f'Batch processing failed: {message}')
+        self.update_status('Batch processing failed ✗', 'error')
+    
+    def toggle_batch_pause(self):
+        """Pause or resume batch processing"""
+        if self.batch_worker.paused:
+            self.batch_worker.resume()
+            self.btn_batch_pause.setText('⏸️ Pause Batch')
+            self.update_status('Batch resumed', 'info')
+        else:
+            self.batch_worker.pause()
+            self.btn_batch_pause.setText('▶️ Resume Batch')
+            self.update_status('Batch paused', 'warning')
+    
+    def cancel_batch(self):
+        """Cancel the running batch job and drop queued ones"""
+        if not self.batch_worker.is_busy() and self.batch_worker.pending_jobs() == 0:
+            return
+        self.batch_worker.cancel_all()
+        self.update_status('Cancelling batch...', 'warning')
     
     def save_image(self):
         """Save current annotated image"""
@@ -405,6 +617,71 @@ class TrafficSignRecognition(QMainWindow):
                 QMessageBox.critical(self, 'Error', 'Failed to save image')
                 self.update_status('Save failed ✗', 'error')
     
+    def save_video(self):
+        """Process a video and save it with detections drawn"""
+        video_path = self.current_video_path
+        if video_path is None:
+            video_path, _ = QFileDialog.getOpenFileName(
+                self, 'Select Video', '', 
+                'Videos (*.mp4 *.avi *.mov *.mkv)'
+            )
+            if not video_path:
+                return
+        
+        output_path, _ = QFileDialog.getSaveFileName(
+            self, 'Save Video', 'detected_video.mp4',
+            'Videos (*.mp4)'
+        )
+        
+        if output_path:
+            self.current_video_path = video_path
+            self.run_when_model_ready(
+                lambda: self.process_video(video_path, output_path)
+            )
+    
+    def toggle_performance_overlay(self):
+        """Show or hide the performance overlay"""
+        self.performance_overlay.setVisible(not self.performance_overlay.isVisible())
+        self.performance_overlay.refresh()
+    
+    def export_performance_stats(self):
+        """Export per-stage latency statistics of this session"""
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, 'Export Performance Stats', 'performance_stats.csv',
+            'CSV (*.csv);;JSON (*.json)'
+        )
+        
+        if file_path:
+            try:
+                self.model_handler.monitor.export(file_path)
+                self.update_status('Performance stats exported ✓', 'success')
+            except Exception as e:
+                QMessageBox.critical(self, 'Error', f'Export failed: {str(e)}')
+                self.update_status('Export failed ✗', 'error')
+    
+    def refresh_session_statistics(self):
+        """Update the session statistics panel"""
+        text = self.model_handler.statistics.format_snapshot()
+        cache = self.model_handler.prediction_cache
+        if cache is not None:
+            text += '\n' + cache.format_stats()
+        self.session_display.setText(text)
+    
+    def export_session_statistics(self):
+        """Export aggregate detection statistics of this session"""
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, 'Export Session Statistics', 'session_statistics.json',
+            'JSON (*.json);;CSV (*.csv)'
+        )
+        
+        if file_path:
+            try:
+                self.model_handler.statistics.export(file_path)
+                self.update_status('Session statistics exported ✓', 'success')
+            except Exception as e:
+                QMessageBox.critical(self, 'Error', f'Export failed: {str(e)}')
+                self.update_status('Export failed ✗', 'error')
+    
     def update_status(self, message, status_type='info'):
         """Update status label"""
         self.status_label.setText(f'Status: {message}')
@@ -418,4 +695,8 @@ class TrafficSignRecognition(QMainWindow):
     def closeEvent(self, event):
         """Handle window close event"""
         self.stop_processing()
+        if self.batch_worker.isRunning():
+            self.batch_worker.shutdown()
+        if self.model_loader is not None and self.model_loader.isRunning():
+            self.model_loader.wait()
         event.accept()
\ No newline at end of file
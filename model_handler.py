@@ -3,175 +3,333 @@ Model Handler for YOLO Detection
 Handles model loading, inference, and optimization
 """
 
+import hashlib
+import threading
+from pathlib import Path
+
 import numpy as np
-from ultralytics import YOLO
-from config import MODEL_NAME, CONFIDENCE_THRESHOLD, IOU_THRESHOLD, IMAGE_SIZE
+from config import (MODEL_NAME, CONFIDENCE_THRESHOLD, IOU_THRESHOLD, IMAGE_SIZE,
+                    BATCH_SIZE, INFERENCE_BACKEND, QUANTIZATION_MODE, CALIBRATION_FOLDER,
+                    CANDIDATE_CONFIDENCE, CANDIDATE_MAX_DETECTIONS, PREDICTION_CACHE)
+from inference_backends import get_backend
+from performance_monitor import PerformanceMonitor
+from prediction_cache import PredictionCache
+from session_statistics import SessionStatistics
+from quantization import QuantizedONNXBackend
+from result_analyzer import ResultsAnalyzer
 
 
 class ModelHandler:
     """Handles YOLO model operations"""
-    
-    def __init__(self):
+
+    def __init__(self, backend=None, quantization=None, calibration_folder=None):
+        """
+        Initialize model handler
+
+        Args:
+            backend: Inference backend name (defaults to INFERENCE_BACKEND)
+            quantization: 'none', 'dynamic' or 'static' (defaults to QUANTIZATION_MODE);
+                any INT8 mode runs on ONNX Runtime regardless of backend
+            calibration_folder: Static quantization image folder (defaults to
+                CALIBRATION_FOLDER)
+        """
         self.model = None
-        
-    def load_model(self):
-        """Load YOLOv8 model with optimization"""
+        self.backend_name = backend or INFERENCE_BACKEND
+        self.quantization = quantization or QUANTIZATION_MODE
+        self.calibration_folder = calibration_folder
+        self.weights_id = None  # Content digest of the weights file, set at load
+        self.backend = None
+        # The ultralytics predictor is not thread-safe; video, multi-stream
+        # and GUI callers share one handler
+        self.lock = threading.Lock()
+        self.monitor = PerformanceMonitor()
+        # Detection aggregates fed by the video, camera and batch paths
+        self.statistics = SessionStatistics()
+        # Detections of previously seen images, keyed by content and fingerprint
+        self.prediction_cache = PredictionCache() if PREDICTION_CACHE else None
+
+    def create_backend(self):
+        """Create the configured inference backend"""
+        if self.quantization != 'none':
+            return QuantizedONNXBackend(self.quantization, self.calibration_folder)
+        return get_backend(self.backend_name)
+
+    def load_model(self, progress_callback=None):
+        """
+        Load YOLOv8 model with optimization
+
+        Heavy imports (ultralytics, torch) happen here rather than at module
+        import, so callers can run this on a worker thread.
+
+        Args:
+            progress_callback: Optional callback function(message)
+
+        Returns:
+            Tuple (success, message)
+        """
         try:
-            # Load YOLOv8 model
-            self.model = YOLO(MODEL_NAME)
-            
+            note = ''
+            backend = self.create_backend()
+            if not backend.is_available():
+                note = f" ({backend.name} not installed, using pytorch)"
+                backend = get_backend('pytorch')
+
+            # Load YOLOv8 model, falling back to PyTorch if export fails
+            try:
+                model = backend.load(MODEL_NAME, IMAGE_SIZE[0], progress_callback)
+            except Exception as e:
+                if backend.name == 'pytorch':
+                    raise
+                note = f" ({backend.name} failed: {str(e)}, using pytorch)"
+                backend = get_backend('pytorch')
+                model = backend.load(MODEL_NAME, IMAGE_SIZE[0], progress_callback)
+
             # Warm up model with dummy input for faster inference
+            if progress_callback:
+                progress_callback('Warming up model...')
             dummy_img = np.zeros((*IMAGE_SIZE, 3), dtype=np.uint8)
-            self.model(dummy_img, verbose=False)
-            
-            return True, "Model loaded successfully"
-            
+            model(dummy_img, verbose=False, **backend.predict_kwargs)
+
+            self.weights_id = weights_digest(getattr(model, 'ckpt_path', None) or MODEL_NAME)
+
+            # Publish only once fully warmed up so is_loaded() means ready
+            self.backend = backend
+            self.model = model
+
+            return True, f"Model loaded successfully [{backend.name}]{note}"
+
         except Exception as e:
             return False, f"Failed to load model: {str(e)}"
-    
-    def predict(self, image, conf=None, iou=None):
+
+    def predict(self, image, conf=None, iou=None, use_cache=True):
         """
         Run inference on image
-        
+
         Args:
             image: numpy array of image
             conf: confidence threshold (optional)
             iou: IoU threshold (optional)
-            
+            use_cache: Look up and store the result in the prediction cache
+
         Returns:
             YOLO results object
         """
-        if self.model is None:
-            raise ValueError("Model not loaded")
-            
-        conf = conf or CONFIDENCE_THRESHOLD
-        iou = iou or IOU_THRESHOLD
-        
-        results = self.model(image, conf=conf, iou=iou)
-        return results[0]
-    
-    def get_annotated_image(self, results):
-        """Get annotated image from results"""
-        return results.plot()
-    
-    def is_loaded(self):
-        """Check if model is loaded"""
-        return self.model is not None
-"""
-Model Handler for YOLO Detection
-Handles model loading, inference, and optimization
-"""
+        return self.predict_batch([image], 1, conf, iou, use_cache)[0]
 
-import numpy as np
-from ultralytics import YOLO
-from config import MODEL_NAME, CONFIDENCE_THRESHOLD, IOU_THRESHOLD, IMAGE_SIZE
+    def predict_batch(self, images, batch_size=None, conf=None, iou=None, use_cache=True):
+        """
+        Run inference on many images, stacking them into batched forward passes
 
+        Images of different sizes are letterboxed to IMAGE_SIZE so they can
+        share one input tensor; boxes are scaled back to each image's own
+        pixel space. Images found in the prediction cache skip the model.
 
-class ModelHandler:
-    """Handles YOLO model operations"""
-    
-    def __init__(self):
-        self.model = None
-        
-    def load_model(self):
-        """Load YOLOv8 model with optimization"""
-        try:
-            # Load YOLOv8 model
-            self.model = YOLO(MODEL_NAME)
-            
-            # Warm up model with dummy input for faster inference
-            dummy_img = np.zeros((*IMAGE_SIZE, 3), dtype=np.uint8)
-            self.model(dummy_img, verbose=False)
-            
-            return True, "Model loaded successfully"
-            
-        except Exception as e:
-            return False, f"Failed to load model: {str(e)}"
-    
-    def predict(self, image, conf=None, iou=None):
-        """
-        Run inference on image
-        
         Args:
-            image: numpy array of image
+            images: list of numpy arrays (BGR)
+            batch_size: images per forward pass (defaults to BATCH_SIZE)
             conf: confidence threshold (optional)
             iou: IoU threshold (optional)
-            
+            use_cache: Look up and store results in the prediction cache
+
         Returns:
-            YOLO results object
+            List of YOLO results objects, one per input image, in order
         """
         if self.model is None:
             raise ValueError("Model not loaded")
-            
+
         conf = conf or CONFIDENCE_THRESHOLD
         iou = iou or IOU_THRESHOLD
-        
-        results = self.model(image, conf=conf, iou=iou)
-        return results[0]
-    
-    def get_annotated_image(self, results):
-        """Get annotated image from results"""
-        return results.plot()
-    
-    def is_loaded(self):
-        """Check if model is loaded"""
-        return self.model is not None
-"""
-Model Handler for YOLO Detection
-Handles model loading, inference, and optimization
-"""
+        batch_size = max(1, batch_size or BATCH_SIZE)
 
-import numpy as np
-from ultralytics import YOLO
-from config import MODEL_NAME, CONFIDENCE_THRESHOLD, IOU_THRESHOLD, IMAGE_SIZE
+        images = list(images)
+        results = [None] * len(images)
+        keys = [None] * len(images)
+        cache = self.prediction_cache if use_cache else None
+        if cache is not None:
+            with self.monitor.measure('cache'):
+                fingerprint = self.fingerprint(conf, iou)
+                for i, image in enumerate(images):
+                    keys[i] = cache.key(image, fingerprint)
+                    data = cache.get(keys[i])
+                    if data is not None:
+                        results[i] = self.cached_results(image, data)
 
+        pending = [i for i, result in enumerate(results) if result is None]
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            with self.lock:
+                chunk_results = self.model([images[i] for i in chunk], conf=conf, iou=iou,
+                                           imgsz=IMAGE_SIZE[0], verbose=False,
+                                           **self.backend.predict_kwargs)
+            for i, result in zip(chunk, chunk_results):
+                self.monitor.record_results_speed(result)
+                results[i] = result
+                if cache is not None:
+                    cache.put(keys[i], result.boxes.data.cpu().numpy())
+        return results
 
-class ModelHandler:
-    """Handles YOLO model operations"""
-    
-    def __init__(self):
-        self.model = None
-        
-    def load_model(self):
-        """Load YOLOv8 model with optimization"""
-        try:
-            # Load YOLOv8 model
-            self.model = YOLO(MODEL_NAME)
-            
-            # Warm up model with dummy input for faster inference
-            dummy_img = np.zeros((*IMAGE_SIZE, 3), dtype=np.uint8)
-            self.model(dummy_img, verbose=False)
-            
-            return True, "Model loaded successfully"
-            
-        except Exception as e:
-            return False, f"Failed to load model: {str(e)}"
-    
-    def predict(self, image, conf=None, iou=None):
+    def cached_results(self, image, data):
         """
-        Run inference on image
-        
+        Rebuild a YOLO results object from cached detection rows
+
         Args:
-            image: numpy array of image
-            conf: confidence threshold (optional)
-            iou: IoU threshold (optional)
-            
+            image: Image the detections belong to
+            data: (N, 6) array of [x1, y1, x2, y2, confidence, class_id]
+
         Returns:
             YOLO results object
         """
+        import torch
+        from ultralytics.engine.results import Results
+
+        return Results(image, path=None, names=self.model.names,
+                       boxes=torch.from_numpy(np.array(data, dtype=np.float32)))
+
+    def predict_candidates(self, image, use_cache=True):
+        """
+        Run inference once with loose thresholds for later re-thresholding
+
+        Keeps every box from CANDIDATE_CONFIDENCE up and disables NMS
+        suppression (IoU 1.0), so ResultsAnalyzer.apply_thresholds can
+        reproduce predict() for any conf/IoU without running the model again.
+
+        Args:
+            image: numpy array of image
+            use_cache: Look up and store the candidates in the prediction cache,
+                so reopening an image skips inference
+
+        Returns:
+            Detections with all candidates
+        """
         if self.model is None:
             raise ValueError("Model not loaded")
-            
-        conf = conf or CONFIDENCE_THRESHOLD
-        iou = iou or IOU_THRESHOLD
-        
-        results = self.model(image, conf=conf, iou=iou)
-        return results[0]
-    
-    def get_annotated_image(self, results):
-        """Get annotated image from results"""
-        return results.plot()
-    
+
+        cache = self.prediction_cache if use_cache else None
+        if cache is not None:
+            with self.monitor.measure('cache'):
+                fingerprint = self.fingerprint(CANDIDATE_CONFIDENCE, 1.0)
+                key = cache.key(image, f'{fingerprint}|{CANDIDATE_MAX_DETECTIONS}')
+                data = cache.get(key)
+            if data is not None:
+                return ResultsAnalyzer.extract_detections(self.cached_results(image, data))
+
+        with self.lock:
+            results = self.model(image, conf=CANDIDATE_CONFIDENCE, iou=1.0,
+                                 max_det=CANDIDATE_MAX_DETECTIONS, imgsz=IMAGE_SIZE[0],
+                                 verbose=False, **self.backend.predict_kwargs)
+        self.monitor.record_results_speed(results[0])
+        if cache is not None:
+            cache.put(key, results[0].boxes.data.cpu().numpy())
+        return ResultsAnalyzer.extract_detections(results[0])
+
+    def get_annotated_image(self, results, image=None):
+        """
+        Get annotated image from results
+
+        Args:
+            results: YOLO results object
+            image: Image to draw on (defaults to the image the results came from)
+
+        Returns:
+            Annotated image (numpy array)
+        """
+        with self.monitor.measure('plot'):
+            if image is None:
+                return results.plot()
+            return results.plot(img=image)
+
+    def fingerprint(self, conf=None, iou=None):
+        """
+        Identify the model and thresholds that produce this handler's results
+
+        The weights file's content digest is part of the key, so persistent
+        caches and resume manifests notice retrained weights saved under the
+        same name.
+
+        Args:
+            conf: confidence threshold (defaults to CONFIDENCE_THRESHOLD)
+            iou: IoU threshold (defaults to IOU_THRESHOLD)
+
+        Returns:
+            Short hex digest; equal digests mean equal detections for an image
+        """
+        if self.weights_id is None:
+            self.weights_id = weights_digest(MODEL_NAME)
+        backend_name = self.backend.name if self.backend else self.backend_name
+        calibration = self.calibration_folder or CALIBRATION_FOLDER
+        key = (f'{MODEL_NAME}|{self.weights_id}|{backend_name}|{self.quantization}|'
+               f'{calibration if self.quantization == "static" else ""}|'
+               f'{conf or CONFIDENCE_THRESHOLD}|{iou or IOU_THRESHOLD}|{IMAGE_SIZE[0]}')
+        return hashlib.sha256(key.encode()).hexdigest()[:16]
+
     def is_loaded(self):
         """Check if model is loaded"""
-        return self.model is not None
\ No newline at end of file
+        return self.model is not None
+
+    def worker_settings(self):
+        """
+        Constructor arguments that give a worker process the same model
+
+        Returns:
+            Dictionary for create_worker_model_handler
+        """
+        return {'backend': self.backend_name, 'quantization': self.quantization,
+                'calibration_folder': self.calibration_folder}
+
+
+def weights_digest(weights):
+    """
+    Content digest of a weights file
+
+    Looks for the file as given, then in the ultralytics weights folder
+    where downloaded models are kept.
+
+    Args:
+        weights: Weights file name or path
+
+    Returns:
+        Hex digest, or 'missing' if the file cannot be found
+    """
+    path = Path(weights)
+    if not path.is_file():
+        try:
+            from ultralytics.utils import SETTINGS
+            path = Path(SETTINGS['weights_dir']) / path.name
+        except Exception:
+            return 'missing'
+        if not path.is_file():
+            return 'missing'
+
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def create_worker_model_handler(threads_per_worker, settings=None):
+    """
+    Load a ModelHandler for a worker process of a process pool
+
+    Caps torch and OpenCV threads so several workers share the CPU
+    without oversubscribing it.
+
+    Args:
+        threads_per_worker: torch intra-op threads for this process
+        settings: ModelHandler arguments from the parent's worker_settings()
+            (defaults to config values)
+
+    Returns:
+        Loaded ModelHandler
+    """
+    import cv2
+    import torch
+
+    torch.set_num_threads(threads_per_worker)
+    cv2.setNumThreads(1)
+
+    model_handler = ModelHandler(**(settings or {}))
+    success, message = model_handler.load_model()
+    if not success:
+        raise RuntimeError(message)
+    return model_handler
@@ -0,0 +1,30 @@
+"""
+Model Loading Thread
+Loads the YOLO model in a separate thread so the window shows immediately
+"""
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+class ModelLoaderThread(QThread):
+    """Worker thread for model loading and warm-up"""
+
+    progress = pyqtSignal(str)  # Emits loading step descriptions
+    loaded = pyqtSignal(bool, str)  # Emits (success, message) when done
+
+    def __init__(self, model_handler):
+        """
+        Initialize model loader thread
+
+        Args:
+            model_handler: ModelHandler instance to load
+        """
+        super().__init__()
+        self.model_handler = model_handler
+
+    def run(self):
+        """Load model in separate thread"""
+        success, message = self.model_handler.load_model(
+            progress_callback=self.progress.emit
+        )
+        self.loaded.emit(success, message)
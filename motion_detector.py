@@ -0,0 +1,87 @@
+"""
+Motion Detector
+Cheap change detection that decides whether a frame needs a new inference
+"""
+
+import cv2
+import numpy as np
+from config import MOTION_THRESHOLD, MOTION_GRID, MOTION_MAX_SKIP
+
+
+class MotionDetector:
+    """Block-wise frame differencing against the last inferred frame"""
+
+    def __init__(self, threshold=None, grid=None, max_skip=None, block_size=8):
+        """
+        Initialize motion detector
+
+        Args:
+            threshold: Mean absolute gray-level difference of a block that
+                counts as change (defaults to MOTION_THRESHOLD)
+            grid: Blocks as (columns, rows) (defaults to MOTION_GRID)
+            max_skip: Force a change after this many unchanged frames so
+                slow drift is eventually picked up (defaults to MOTION_MAX_SKIP)
+            block_size: Pixels per block side in the downscaled frame
+        """
+        self.threshold = threshold or MOTION_THRESHOLD
+        self.grid = grid or MOTION_GRID
+        self.max_skip = max_skip if max_skip is not None else MOTION_MAX_SKIP
+        self.block_size = block_size
+        self.size = (self.grid[0] * block_size, self.grid[1] * block_size)
+
+        self.reference = None
+        self.candidate = None
+        self.skipped = 0
+
+    def downscale(self, frame):
+        """Convert frame to a small grayscale float image"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        return cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    def block_differences(self, small):
+        """
+        Mean absolute difference per block against the reference
+
+        Args:
+            small: Downscaled grayscale frame
+
+        Returns:
+            Array of shape (rows, columns)
+        """
+        columns, rows = self.grid
+        diff = np.abs(small - self.reference)
+        blocks = diff.reshape(rows, self.block_size, columns, self.block_size)
+        return blocks.mean(axis=(1, 3))
+
+    def has_changed(self, frame):
+        """
+        Check whether frame differs enough from the last inferred frame
+
+        A change in any single block counts, so a small sign entering one
+        corner of an otherwise static scene still triggers inference.
+
+        Args:
+            frame: numpy array of frame (BGR)
+
+        Returns:
+            True if the frame should be inferred
+        """
+        self.candidate = self.downscale(frame)
+        if self.reference is None or self.skipped >= self.max_skip:
+            return True
+        if self.block_differences(self.candidate).max() > self.threshold:
+            return True
+
+        self.skipped += 1
+        return False
+
+    def update_reference(self):
+        """Mark the most recently checked frame as the last inferred one"""
+        self.reference = self.candidate
+        self.skipped = 0
+
+    def reset(self):
+        """Forget the reference frame"""
+        self.reference = None
+        self.candidate = None
+        self.skipped = 0
@@ -0,0 +1,218 @@
+"""
+Multi-Stream Engine
+Runs several cameras and video files through one shared model with
+fair cross-stream micro-batching
+"""
+
+import threading
+import time
+
+from config import (MULTI_STREAM_BATCH_SIZE, PIPELINE_QUEUE_SIZE, CAMERA_DROP_POLICY,
+                    VIDEO_DROP_POLICY)
+from video_pipeline import (FrameQueue, END_OF_STREAM, open_capture,
+                            capture_frames)
+from result_analyzer import ResultsAnalyzer
+
+
+class StreamState:
+    """Queues, threads and counters for one source of a MultiStreamEngine"""
+
+    def __init__(self, stream_id, source, on_frame, drop_policy, queue_size):
+        """
+        Initialize stream state
+
+        Args:
+            stream_id: Index of the stream within the engine
+            source: Video file path or camera index
+            on_frame: Callback function(annotated_frame) for this stream
+            drop_policy: 'latest' or 'never' for this stream's queues
+            queue_size: Capacity of the stream's queues
+        """
+        self.stream_id = stream_id
+        self.source = source
+        self.on_frame = on_frame
+        self.capture_queue = FrameQueue(queue_size, drop_policy)
+        self.render_queue = FrameQueue(queue_size, drop_policy)
+        self.capture_done = False
+        self.cap = None
+        self.threads = []
+        self.frames_inferred = 0
+
+
+class MultiStreamEngine:
+    """Schedules frames from many sources into micro-batches for one model"""
+
+    def __init__(self, model_handler, on_error=None, max_batch_size=None,
+                 queue_size=None):
+        """
+        Initialize multi-stream engine
+
+        Args:
+            model_handler: Shared ModelHandler instance
+            on_error: Optional callback function(stream_id, message); stream_id
+                is None for engine-wide errors
+            max_batch_size: Frames per forward pass across all streams
+                (defaults to MULTI_STREAM_BATCH_SIZE)
+            queue_size: Capacity of each stream queue (defaults to PIPELINE_QUEUE_SIZE)
+        """
+        self.model_handler = model_handler
+        self.on_error = on_error
+        self.max_batch_size = max_batch_size or MULTI_STREAM_BATCH_SIZE
+        self.queue_size = queue_size or PIPELINE_QUEUE_SIZE
+        self.streams = []
+        self.next_stream = 0  # Stream that gets first pick in the next batch
+        self.stop_event = threading.Event()
+
+    def add_stream(self, source, on_frame, drop_policy=None):
+        """
+        Register a source before run()
+
+        Args:
+            source: Video file path or camera index
+            on_frame: Callback function(annotated_frame), called from the stream's
+                render thread
+            drop_policy: 'latest' or 'never' (defaults to CAMERA_DROP_POLICY for
+                cameras and VIDEO_DROP_POLICY for files)
+
+        Returns:
+            Stream id
+        """
+        if drop_policy is None:
+            drop_policy = CAMERA_DROP_POLICY if isinstance(source, int) else VIDEO_DROP_POLICY
+        stream = StreamState(len(self.streams), source, on_frame, drop_policy,
+                             self.queue_size)
+        self.streams.append(stream)
+        return stream.stream_id
+
+    def report_error(self, stream_id, message):
+        """Forward error to on_error"""
+        if self.on_error:
+            self.on_error(stream_id, message)
+
+    def capture_loop(self, stream):
+        """Capture thread for one stream"""
+        try:
+            capture_frames(stream.cap, stream.capture_queue, self.stop_event,
+                           isinstance(stream.source, int), self.model_handler.monitor)
+        except Exception as e:
+            self.report_error(stream.stream_id, f"Video processing error: {str(e)}")
+
+    def render_loop(self, stream):
+        """Render thread for one stream"""
+        try:
+            while not self.stop_event.is_set():
+                packet = stream.render_queue.get(self.stop_event)
+                if packet is END_OF_STREAM:
+                    break
+                self.model_handler.statistics.update(
+                    ResultsAnalyzer.extract_detections(packet.results))
+                stream.on_frame(self.model_handler.get_annotated_image(
+                    packet.results, packet.image))
+        except Exception as e:
+            self.report_error(stream.stream_id, f"Rendering error: {str(e)}")
+
+    def collect_batch(self):
+        """
+        Take frames round-robin, one per stream per pass, until the batch is full
+
+        The stream that starts each batch rotates, so no stream is starved
+        when there are more streams than batch slots.
+
+        Streams whose capture ended are marked done; their end marker is
+        sent by the caller after this batch's frames, so it stays behind them.
+
+        Returns:
+            Tuple (list of (StreamState, FramePacket), list of ended StreamState)
+        """
+        batch = []
+        ended = []
+        count = len(self.streams)
+        order = [self.streams[(self.next_stream + i) % count] for i in range(count)]
+        self.next_stream = (self.next_stream + 1) % count
+
+        took_frame = True
+        while took_frame and len(batch) < self.max_batch_size:
+            took_frame = False
+            for stream in order:
+                if stream.capture_done or len(batch) >= self.max_batch_size:
+                    continue
+                packet = stream.capture_queue.get_nowait()
+                if packet is None:
+                    continue
+                if packet is END_OF_STREAM:
+                    stream.capture_done = True
+                    ended.append(stream)
+                    continue
+                batch.append((stream, packet))
+                took_frame = True
+        return batch, ended
+
+    def schedule_loop(self):
+        """Inference loop: batch frames across streams and dispatch results"""
+        while not self.stop_event.is_set():
+            if all(stream.capture_done for stream in self.streams):
+                break
+
+            batch, ended = self.collect_batch()
+            if not batch:
+                for stream in ended:
+                    stream.render_queue.put(END_OF_STREAM, self.stop_event)
+                if not ended:
+                    time.sleep(0.002)
+                continue
+
+            # Camera frames never repeat, so batches with one skip the cache
+            use_cache = not any(isinstance(stream.source, int) for stream, _ in batch)
+            batch_results = self.model_handler.predict_batch(
+                [packet.image for _, packet in batch], len(batch), use_cache=use_cache
+            )
+            for (stream, packet), results in zip(batch, batch_results):
+                packet.results = results
+                stream.frames_inferred += 1
+                stream.render_queue.put(packet, self.stop_event)
+            for stream in ended:
+                stream.render_queue.put(END_OF_STREAM, self.stop_event)
+
+    def run(self):
+        """Run all streams until every source ends or stop() is called"""
+        if not self.streams:
+            return
+
+        try:
+            for stream in self.streams:
+                stream.cap = open_capture(stream.source)
+                if not stream.cap.isOpened():
+                    self.report_error(stream.stream_id,
+                                      f"Failed to open video source {stream.source}")
+                    stream.capture_done = True
+                    stream.render_queue.put(END_OF_STREAM, self.stop_event)
+                    continue
+
+                stream.threads = [
+                    threading.Thread(target=self.capture_loop, args=(stream,), daemon=True),
+                    threading.Thread(target=self.render_loop, args=(stream,), daemon=True)
+                ]
+                for thread in stream.threads:
+                    thread.start()
+
+            try:
+                self.schedule_loop()
+            except Exception as e:
+                self.report_error(None, f"Detection error: {str(e)}")
+                self.stop_event.set()
+
+            for stream in self.streams:
+                if len(stream.threads) == 2:
+                    stream.threads[1].join()  # Let renders drain
+            self.stop_event.set()
+            for stream in self.streams:
+                for thread in stream.threads:
+                    thread.join()
+        finally:
+            for stream in self.streams:
+                if stream.cap is not None:
+                    stream.cap.release()
+
+    def stop(self):
+        """Stop all streams"""
+        self.stop_event.set()
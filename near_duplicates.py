@@ -0,0 +1,115 @@
+"""
+Near-Duplicate Index
+Groups images with close perceptual hashes so batch jobs infer once per cluster
+"""
+
+import numpy as np
+from config import DEDUP_MAX_DISTANCE, DEDUP_WINDOW, DEDUP_REPROJECT
+
+
+class DuplicateCluster:
+    """Representative image of a cluster and its detections once inferred"""
+
+    __slots__ = ('shape', 'data', 'failed')
+
+    def __init__(self, shape):
+        """
+        Initialize cluster
+
+        Args:
+            shape: (height, width, ...) of the representative's decoded image
+        """
+        self.shape = shape
+        self.data = None  # (N, 6) Boxes.data rows of the representative
+        self.failed = False
+
+    def project(self, shape):
+        """
+        Representative detections mapped onto an image of another size
+
+        Args:
+            shape: (height, width, ...) of the duplicate's decoded image
+
+        Returns:
+            (N, 6) array of [x1, y1, x2, y2, confidence, class_id]
+        """
+        data = np.array(self.data, dtype=np.float32)
+        scale_x = shape[1] / self.shape[1]
+        scale_y = shape[0] / self.shape[0]
+        if (scale_x, scale_y) != (1.0, 1.0):
+            data[:, :4] *= np.array([scale_x, scale_y, scale_x, scale_y], dtype=np.float32)
+        return data
+
+
+class NearDuplicateIndex:
+    """
+    Recent cluster representatives searched by Hamming distance of 64-bit dHashes
+
+    Only the last `window` representatives are kept, which suits bursts of
+    consecutive frames and keeps lookups constant-time.
+    """
+
+    def __init__(self, max_distance=None, window=None, reproject=None):
+        """
+        Initialize index
+
+        Args:
+            max_distance: Most differing hash bits that still count as a
+                duplicate (defaults to DEDUP_MAX_DISTANCE)
+            window: Representatives kept for matching (defaults to DEDUP_WINDOW)
+            reproject: Match images of other sizes with the same aspect ratio
+                and scale boxes to them; otherwise sizes must be equal
+                (defaults to DEDUP_REPROJECT)
+        """
+        self.max_distance = DEDUP_MAX_DISTANCE if max_distance is None else max_distance
+        self.window = window or DEDUP_WINDOW
+        self.reproject = DEDUP_REPROJECT if reproject is None else reproject
+        self.hashes = np.zeros(self.window, dtype=np.uint64)
+        self.clusters = [None] * self.window
+        self.count = 0
+
+    def compatible(self, cluster, shape):
+        """Check whether a cluster's detections can be used for an image of shape"""
+        if tuple(cluster.shape[:2]) == tuple(shape[:2]):
+            return True
+        if not self.reproject:
+            return False
+        aspect = cluster.shape[1] / cluster.shape[0]
+        return abs(shape[1] / shape[0] - aspect) <= 0.01 * aspect
+
+    def find(self, image_hash, shape):
+        """
+        Find the closest compatible cluster
+
+        Args:
+            image_hash: dHash from ImageProcessor.dhash
+            shape: Decoded image shape
+
+        Returns:
+            DuplicateCluster, or None if no representative is close enough
+        """
+        size = min(self.count, self.window)
+        if size == 0:
+            return None
+        differing = self.hashes[:size] ^ np.uint64(image_hash)
+        distances = np.unpackbits(differing.view(np.uint8)).reshape(size, 64).sum(axis=1)
+        for i in np.argsort(distances, kind='stable'):
+            if distances[i] > self.max_distance:
+                break
+            if self.compatible(self.clusters[i], shape):
+                return self.clusters[i]
+        return None
+
+    def add(self, image_hash, shape):
+        """
+        Start a new cluster with this image as representative
+
+        Returns:
+            The new DuplicateCluster, replacing the oldest one if the window is full
+        """
+        cluster = DuplicateCluster(shape)
+        slot = self.count % self.window
+        self.hashes[slot] = image_hash
+        self.clusters[slot] = cluster
+        self.count += 1
+        return cluster
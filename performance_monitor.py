@@ -0,0 +1,158 @@
+"""
+Performance Monitor
+Per-stage latency histograms, FPS and per-session export
+"""
+
+import csv
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+from config import PERF_WINDOW_SIZE
+
+# Display order; stages recorded under other names are listed after these
+STAGES = ['decode', 'preprocess', 'inference', 'nms', 'plot', 'numpy_to_pixmap', 'paint']
+PERCENTILES = (50, 95, 99)
+
+
+class PerformanceMonitor:
+    """Collects rolling latency samples per pipeline stage"""
+
+    def __init__(self, window=None):
+        """
+        Initialize performance monitor
+
+        Args:
+            window: Samples kept per stage for percentiles (defaults to PERF_WINDOW_SIZE)
+        """
+        self.window = window or PERF_WINDOW_SIZE
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Start a new session"""
+        with self.lock:
+            self.session_start = time.time()
+            self.samples = {}
+            self.totals = {}  # stage -> [count, total_ms] over the whole session
+            self.frame_times = deque(maxlen=self.window)
+
+    def record(self, stage, milliseconds):
+        """
+        Add a latency sample
+
+        Args:
+            stage: Stage name
+            milliseconds: Duration in milliseconds
+        """
+        with self.lock:
+            if stage not in self.samples:
+                self.samples[stage] = deque(maxlen=self.window)
+                self.totals[stage] = [0, 0.0]
+            self.samples[stage].append(milliseconds)
+            self.totals[stage][0] += 1
+            self.totals[stage][1] += milliseconds
+
+    @contextmanager
+    def measure(self, stage):
+        """Context manager recording the duration of its block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, (time.perf_counter() - start) * 1000)
+
+    def record_results_speed(self, results):
+        """
+        Record preprocess/inference/NMS timings reported by ultralytics
+
+        Args:
+            results: YOLO results object
+        """
+        speed = getattr(results, 'speed', None) or {}
+        for key, stage in (('preprocess', 'preprocess'), ('inference', 'inference'),
+                           ('postprocess', 'nms')):
+            if speed.get(key) is not None:
+                self.record(stage, speed[key])
+
+    def tick(self):
+        """Mark one displayed frame for FPS measurement"""
+        with self.lock:
+            self.frame_times.append(time.perf_counter())
+
+    def fps(self):
+        """Frames per second over the recent window"""
+        with self.lock:
+            if len(self.frame_times) < 2:
+                return 0.0
+            elapsed = self.frame_times[-1] - self.frame_times[0]
+            return (len(self.frame_times) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def summary(self):
+        """
+        Get statistics per stage
+
+        Returns:
+            Dictionary stage -> {count, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}
+            where count and mean cover the session and percentiles the window
+        """
+        with self.lock:
+            snapshot = {stage: np.array(samples) for stage, samples in self.samples.items()}
+            totals = {stage: list(total) for stage, total in self.totals.items()}
+
+        ordered = [s for s in STAGES if s in snapshot] + \
+                  sorted(s for s in snapshot if s not in STAGES)
+        summary = {}
+        for stage in ordered:
+            samples = snapshot[stage]
+            count, total_ms = totals[stage]
+            stats = {'count': count, 'mean_ms': total_ms / count if count else 0.0}
+            for p, value in zip(PERCENTILES, np.percentile(samples, PERCENTILES)):
+                stats[f'p{p}_ms'] = float(value)
+            stats['max_ms'] = float(samples.max())
+            summary[stage] = stats
+        return summary
+
+    def format_summary(self):
+        """
+        Format statistics for the UI overlay
+
+        Returns:
+            Formatted string
+        """
+        lines = [f"FPS: {self.fps():.1f}", "stage        p50    p95    p99 (ms)"]
+        for stage, stats in self.summary().items():
+            lines.append(f"{stage[:12]:<12}{stats['p50_ms']:>5.1f}  "
+                         f"{stats['p95_ms']:>5.1f}  {stats['p99_ms']:>5.1f}")
+        return '\n'.join(lines)
+
+    def export_json(self, path):
+        """Write session statistics to a JSON file"""
+        report = {
+            'session_start': self.session_start,
+            'duration_s': time.time() - self.session_start,
+            'fps': self.fps(),
+            'stages': self.summary()
+        }
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    def export_csv(self, path):
+        """Write session statistics to a CSV file, one row per stage"""
+        columns = ['count', 'mean_ms'] + [f'p{p}_ms' for p in PERCENTILES] + ['max_ms']
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['stage'] + columns)
+            for stage, stats in self.summary().items():
+                writer.writerow([stage] + [f'{stats[c]:.3f}' if isinstance(stats[c], float)
+                                           else stats[c] for c in columns])
+
+    def export(self, path):
+        """Write session statistics as CSV or JSON based on the file extension"""
+        if str(path).lower().endswith('.csv'):
+            self.export_csv(path)
+        else:
+            self.export_json(path)
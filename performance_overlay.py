@@ -0,0 +1,69 @@
+"""
+Performance Overlay
+Qt widgets that time painting and show live stage latencies over the image
+"""
+
+import time
+
+from PyQt5.QtWidgets import QLabel
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QFont
+from config import PERF_OVERLAY_INTERVAL_MS
+
+
+class TimedImageLabel(QLabel):
+    """QLabel that records its paint time in a PerformanceMonitor"""
+
+    def __init__(self, text, monitor):
+        """
+        Initialize timed label
+
+        Args:
+            text: Initial label text
+            monitor: PerformanceMonitor receiving 'paint' timings
+        """
+        super().__init__(text)
+        self.monitor = monitor
+
+    def paintEvent(self, event):
+        """Paint and record how long it took"""
+        if self.pixmap() is None:
+            super().paintEvent(event)
+            return
+        start = time.perf_counter()
+        super().paintEvent(event)
+        self.monitor.record('paint', (time.perf_counter() - start) * 1000)
+
+
+class PerformanceOverlay(QLabel):
+    """Semi-transparent stats panel drawn in the corner of its parent"""
+
+    def __init__(self, parent, monitor):
+        """
+        Initialize overlay
+
+        Args:
+            parent: Widget to draw over
+            monitor: PerformanceMonitor to display
+        """
+        super().__init__(parent)
+        self.monitor = monitor
+        self.setFont(QFont('Courier', 9))
+        self.setStyleSheet(
+            'background-color: rgba(0, 0, 0, 160); color: #4CAF50; '
+            'padding: 6px; border-radius: 4px;'
+        )
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.move(10, 10)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(PERF_OVERLAY_INTERVAL_MS)
+
+    def refresh(self):
+        """Update the displayed statistics"""
+        if not self.isVisible():
+            return
+        self.setText(self.monitor.format_summary())
+        self.adjustSize()
+        self.raise_()
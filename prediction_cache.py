@@ -0,0 +1,214 @@
+"""
+Prediction Cache
+Content-addressed cache of detection results with a memory LRU and an optional disk tier
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+from config import PREDICTION_CACHE_SIZE, PREDICTION_CACHE_DIR, PREDICTION_CACHE_DISK_MB
+
+
+class PredictionCache:
+    """
+    Maps image content plus model fingerprint to raw detection rows
+
+    Entries are (N, 6) arrays of [x1, y1, x2, y2, confidence, class_id] as
+    in ultralytics Boxes.data, so they are small whatever the image size.
+
+    The disk tier may be shared by several processes. Lookups check the
+    directory itself, so entries written by other processes are found, and
+    eviction rescans the directory, so the size cap applies to all of them
+    together. Access times are kept in file mtimes.
+    """
+
+    def __init__(self, max_entries=None, disk_dir=None, disk_max_bytes=None):
+        """
+        Initialize cache
+
+        Args:
+            max_entries: Entries kept in memory (defaults to PREDICTION_CACHE_SIZE)
+            disk_dir: Directory of the disk tier (defaults to PREDICTION_CACHE_DIR;
+                None keeps the cache in memory only)
+            disk_max_bytes: Disk tier size cap (defaults to PREDICTION_CACHE_DISK_MB)
+        """
+        self.max_entries = max_entries or PREDICTION_CACHE_SIZE
+        self.disk_dir = disk_dir or PREDICTION_CACHE_DIR
+        self.disk_max_bytes = disk_max_bytes or PREDICTION_CACHE_DISK_MB * 1024 * 1024
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()  # key -> array, least recently used first
+        self.disk = OrderedDict()  # key -> file size as of the last scan plus own writes
+        self.disk_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.disk_dir:
+            self.disk_dir = Path(self.disk_dir)
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self.load_disk_index()
+
+    def load_disk_index(self):
+        """Index the disk directory, oldest access first (caller holds the lock)"""
+        self.disk.clear()
+        self.disk_bytes = 0
+        entries = []
+        for path in self.disk_dir.glob('*.npy'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, path.stem, stat.st_size))
+        for _, key, size in sorted(entries):
+            self.disk[key] = size
+            self.disk_bytes += size
+
+    @staticmethod
+    def key(image, fingerprint):
+        """
+        Cache key of an image for one model configuration
+
+        Args:
+            image: Decoded image (numpy array)
+            fingerprint: ModelHandler.fingerprint() of the model and thresholds
+
+        Returns:
+            Hex digest
+        """
+        image = np.ascontiguousarray(image)
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f'{fingerprint}|{image.shape}|{image.dtype.str}'.encode())
+        digest.update(memoryview(image).cast('B'))
+        return digest.hexdigest()
+
+    def disk_path(self, key):
+        """File of a disk entry"""
+        return self.disk_dir / f'{key}.npy'
+
+    def get(self, key):
+        """
+        Look up an entry, promoting disk hits to memory
+
+        Returns:
+            (N, 6) array, or None on a miss
+        """
+        with self.lock:
+            data = self.memory.get(key)
+            if data is not None:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return data
+
+        if self.disk_dir:
+            # Not only indexed keys: another process may have written it
+            path = self.disk_path(key)
+            try:
+                data = np.load(path)
+                os.utime(path)
+                size = path.stat().st_size
+            except (OSError, ValueError):
+                data = None  # Not cached, evicted or partially written
+            if data is not None:
+                with self.lock:
+                    if key not in self.disk:
+                        self.disk[key] = size
+                        self.disk_bytes += size
+                    self.disk.move_to_end(key)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    self.add_to_memory(key, data)
+                return data
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, data):
+        """
+        Store an entry in memory and, if enabled, on disk
+
+        Args:
+            key: Cache key from key()
+            data: (N, 6) detection array
+        """
+        data = np.asarray(data, dtype=np.float32)
+        with self.lock:
+            self.add_to_memory(key, data)
+            if not self.disk_dir:
+                return
+
+        path = self.disk_path(key)
+        if path.exists():
+            return  # Already stored, possibly by another process
+        temp_path = path.with_name(f'{key}.{os.getpid()}.{threading.get_ident()}.tmp')
+        try:
+            with open(temp_path, 'wb') as f:
+                np.save(f, data)
+                size = f.tell()
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Prediction cache write failed: {str(e)}")
+            return
+
+        with self.lock:
+            self.disk[key] = size
+            self.disk_bytes += size
+            if self.disk_bytes <= self.disk_max_bytes:
+                return
+
+            # Other processes write to the same directory, so evict from a
+            # fresh scan, down to 90% of the cap so scans stay infrequent
+            self.load_disk_index()
+            evicted = []
+            while self.disk_bytes > 0.9 * self.disk_max_bytes and len(self.disk) > 1:
+                old_key, old_size = self.disk.popitem(last=False)
+                self.disk_bytes -= old_size
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                self.disk_path(old_key).unlink()
+            except FileNotFoundError:
+                pass
+
+    def add_to_memory(self, key, data):
+        """Insert into the memory tier, evicting the oldest entry (caller holds the lock)"""
+        self.memory[key] = data
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def stats(self):
+        """
+        Get hit/miss counters and tier sizes
+
+        Returns:
+            Dictionary with hits, disk_hits, misses, hit_rate, memory_entries,
+            disk_entries and disk_bytes
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'memory_entries': len(self.memory),
+                'disk_entries': len(self.disk),
+                'disk_bytes': self.disk_bytes
+            }
+
+    def format_stats(self):
+        """One-line summary for status displays"""
+        stats = self.stats()
+        return (f"Prediction cache: {stats['hits']} hits, {stats['misses']} misses "
+                f"({stats['hit_rate']:.0%})")
+
+    def clear(self):
+        """Drop the memory tier and reset counters; the disk tier is kept"""
+        with self.lock:
+            self.memory.clear()
+            self.hits = self.disk_hits = self.misses = 0
@@ -0,0 +1,381 @@
+"""
+INT8 Quantization
+Builds INT8 ONNX Runtime models and compares them against the FP32 model
+
+Usage:
+    python quantization.py IMAGE_FOLDER [--mode static] [--calibration FOLDER]
+"""
+
+import argparse
+import hashlib
+import time
+from pathlib import Path
+
+import numpy as np
+from config import (IMAGE_SIZE, QUANTIZATION_MODE, CALIBRATION_FOLDER,
+                    CALIBRATION_IMAGES)
+from inference_backends import ONNXRuntimeBackend
+from batch_processor import BatchProcessor
+from image_processor import ImageProcessor
+from result_analyzer import ResultsAnalyzer
+
+QUANTIZATION_MODES = ('dynamic', 'static')
+
+# Only convolutions and matmuls are quantized; the detection head's
+# concat/sigmoid/DFL ops mix box coordinates with class scores in one
+# tensor and lose most class precision under INT8.
+QUANTIZED_OP_TYPES = ['Conv', 'MatMul']
+
+
+class CalibrationReader:
+    """Feeds letterboxed calibration images to the ONNX Runtime calibrator"""
+
+    def __init__(self, image_paths, input_name, imgsz):
+        """
+        Initialize calibration reader
+
+        Args:
+            image_paths: List of calibration image paths
+            input_name: Name of the model input tensor
+            imgsz: Model input size
+        """
+        self.image_paths = list(image_paths)
+        self.input_name = input_name
+        self.imgsz = imgsz
+        self.index = 0
+
+    def preprocess(self, image):
+        """Convert BGR image to the model's NCHW float input"""
+        padded, _, _ = ImageProcessor.letterbox(image, (self.imgsz, self.imgsz))
+        tensor = padded[:, :, ::-1].transpose(2, 0, 1)  # BGR HWC -> RGB CHW
+        tensor = np.ascontiguousarray(tensor, dtype=np.float32) / 255.0
+        return tensor[None]
+
+    def get_next(self):
+        """Return next input feed, or None when exhausted"""
+        while self.index < len(self.image_paths):
+            image = ImageProcessor.read_image(str(self.image_paths[self.index]))
+            self.index += 1
+            if image is not None:
+                return {self.input_name: self.preprocess(image)}
+        return None
+
+    def rewind(self):
+        """Restart from the first image"""
+        self.index = 0
+
+
+def find_calibration_images(folder_path, limit=None):
+    """
+    Pick calibration images from a folder
+
+    Args:
+        folder_path: Folder in the format BatchProcessor.find_images reads
+        limit: Maximum number of images (defaults to CALIBRATION_IMAGES)
+
+    Returns:
+        List of image paths, evenly spread over the folder
+    """
+    image_files = BatchProcessor.find_images(folder_path)
+    limit = limit or CALIBRATION_IMAGES
+    if len(image_files) > limit:
+        step = len(image_files) / limit
+        image_files = [image_files[int(i * step)] for i in range(limit)]
+    return image_files
+
+
+def calibration_fingerprint(image_paths):
+    """Hash calibration file names and sizes for the export cache key"""
+    digest = hashlib.sha256()
+    for path in image_paths:
+        path = Path(path)
+        digest.update(f'{path.name}:{path.stat().st_size};'.encode())
+    return digest.hexdigest()[:8]
+
+
+def quantize_onnx_model(fp32_path, int8_path, mode, calibration_images=None,
+                        imgsz=None):
+    """
+    Quantize an ONNX model to INT8
+
+    Args:
+        fp32_path: Path to FP32 ONNX model
+        int8_path: Output path for INT8 model
+        mode: 'dynamic' or 'static'
+        calibration_images: Image paths for static calibration
+        imgsz: Model input size (defaults to IMAGE_SIZE)
+    """
+    import onnx
+    import onnxruntime
+    from onnxruntime.quantization import (QuantFormat, QuantType,
+                                          quantize_dynamic, quantize_static)
+
+    int8_path = Path(int8_path)
+    int8_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if mode == 'dynamic':
+        quantize_dynamic(str(fp32_path), str(int8_path),
+                         weight_type=QuantType.QUInt8,
+                         op_types_to_quantize=QUANTIZED_OP_TYPES)
+    elif mode == 'static':
+        if not calibration_images:
+            raise ValueError("Static quantization needs calibration images")
+        session = onnxruntime.InferenceSession(
+            str(fp32_path), providers=['CPUExecutionProvider'])
+        reader = CalibrationReader(calibration_images,
+                                   session.get_inputs()[0].name,
+                                   imgsz or IMAGE_SIZE[0])
+        quantize_static(str(fp32_path), str(int8_path), reader,
+                        quant_format=QuantFormat.QDQ,
+                        activation_type=QuantType.QUInt8,
+                        weight_type=QuantType.QInt8,
+                        per_channel=True,
+                        op_types_to_quantize=QUANTIZED_OP_TYPES)
+    else:
+        raise ValueError(f"Unknown quantization mode '{mode}', "
+                         f"expected one of {', '.join(QUANTIZATION_MODES)}")
+
+    # Keep ultralytics metadata (class names, stride, imgsz) on the INT8 model
+    source = onnx.load(str(fp32_path))
+    quantized = onnx.load(str(int8_path))
+    if not quantized.metadata_props and source.metadata_props:
+        quantized.metadata_props.extend(source.metadata_props)
+        onnx.save(quantized, str(int8_path))
+
+
+class QuantizedONNXBackend(ONNXRuntimeBackend):
+    """Runs an INT8-quantized ONNX export on the ONNX Runtime CPU provider"""
+
+    name = 'onnxruntime-int8'
+
+    def __init__(self, mode=None, calibration_folder=None, cache=None):
+        """
+        Initialize quantized backend
+
+        Args:
+            mode: 'dynamic' or 'static' (defaults to QUANTIZATION_MODE)
+            calibration_folder: Static calibration folder (defaults to CALIBRATION_FOLDER)
+            cache: ExportCache instance (optional)
+        """
+        super().__init__(cache)
+        self.mode = mode or QUANTIZATION_MODE
+        self.calibration_folder = calibration_folder or CALIBRATION_FOLDER
+
+    def load(self, weights, imgsz, progress_callback=None):
+        from ultralytics import YOLO
+
+        weights = self.resolve_weights(weights, progress_callback)
+
+        # The FP32 export is shared with the plain ONNX Runtime backend
+        fp32_target = self.cache.entry_path(weights, imgsz, ONNXRuntimeBackend.name,
+                                            self.artifact_name)
+        if not fp32_target.exists():
+            self.export(weights, imgsz, fp32_target, progress_callback)
+
+        calibration_images = []
+        tag = f'int8-{self.mode}'
+        if self.mode == 'static':
+            if not self.calibration_folder:
+                raise ValueError("Static quantization needs CALIBRATION_FOLDER")
+            calibration_images = find_calibration_images(self.calibration_folder)
+            tag += f'-{calibration_fingerprint(calibration_images)}'
+
+        target = self.cache.entry_path(weights, imgsz, tag, 'model_int8.onnx')
+        if not target.exists():
+            if progress_callback:
+                progress_callback(f'Quantizing model to INT8 ({self.mode})...')
+            quantize_onnx_model(fp32_target, target, self.mode,
+                                calibration_images, imgsz)
+
+        if progress_callback:
+            progress_callback('Loading INT8 model...')
+        return YOLO(str(target), task='detect')
+
+
+def match_detections(reference, candidate, iou_threshold=0.5):
+    """
+    Greedily match detections of the same class by IoU
+
+    Args:
+        reference: Detections from the FP32 model
+        candidate: Detections from the INT8 model
+        iou_threshold: Minimum IoU for a match
+
+    Returns:
+        List of (reference index, candidate index, IoU) tuples
+    """
+    if not reference or not candidate:
+        return []
+
+    ious = ResultsAnalyzer.box_iou(reference.boxes, candidate.boxes)
+    same_class = reference.class_ids[:, None] == candidate.class_ids[None, :]
+    ious = np.where(same_class, ious, 0.0)
+
+    matches = []
+    while True:
+        i, j = np.unravel_index(np.argmax(ious), ious.shape)
+        if ious[i, j] < iou_threshold:
+            break
+        matches.append((int(i), int(j), float(ious[i, j])))
+        ious[i, :] = 0.0
+        ious[:, j] = 0.0
+    return matches
+
+
+def timed_predict(model_handler, image):
+    """Run prediction and return (results, seconds)"""
+    start = time.perf_counter()
+    results = model_handler.predict(image, use_cache=False)
+    return results, time.perf_counter() - start
+
+
+def compare_models(reference_handler, quantized_handler, image_paths,
+                   iou_threshold=0.5):
+    """
+    Compare latency and detections of two loaded models on the same images
+
+    Args:
+        reference_handler: Loaded FP32 ModelHandler
+        quantized_handler: Loaded INT8 ModelHandler
+        image_paths: Images to run
+        iou_threshold: Minimum IoU for two detections to agree
+
+    Returns:
+        Dictionary with comparison report
+    """
+    reference_times, quantized_times = [], []
+    reference_total = quantized_total = matched = 0
+    conf_deltas, match_ious = [], []
+    missed_by_class = {}
+
+    for path in image_paths:
+        image = ImageProcessor.read_image(str(path))
+        if image is None:
+            continue
+
+        reference_results, reference_time = timed_predict(reference_handler, image)
+        quantized_results, quantized_time = timed_predict(quantized_handler, image)
+        reference_times.append(reference_time)
+        quantized_times.append(quantized_time)
+
+        reference = ResultsAnalyzer.extract_detections(reference_results)
+        candidate = ResultsAnalyzer.extract_detections(quantized_results)
+        matches = match_detections(reference, candidate, iou_threshold)
+
+        reference_total += len(reference)
+        quantized_total += len(candidate)
+        matched += len(matches)
+        for i, j, iou in matches:
+            match_ious.append(iou)
+            conf_deltas.append(abs(float(reference.confidences[i] - candidate.confidences[j])))
+
+        missed = np.ones(len(reference), dtype=bool)
+        missed[[i for i, _, _ in matches]] = False
+        for name in reference[missed].class_names():
+            missed_by_class[name] = missed_by_class.get(name, 0) + 1
+
+    def latency(times):
+        if not times:
+            return {'mean_ms': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0}
+        times_ms = np.array(times) * 1000
+        return {
+            'mean_ms': float(times_ms.mean()),
+            'p50_ms': float(np.percentile(times_ms, 50)),
+            'p95_ms': float(np.percentile(times_ms, 95))
+        }
+
+    reference_latency = latency(reference_times)
+    quantized_latency = latency(quantized_times)
+
+    return {
+        'images': len(reference_times),
+        'reference_latency': reference_latency,
+        'quantized_latency': quantized_latency,
+        'speedup': (reference_latency['mean_ms'] / quantized_latency['mean_ms']
+                    if quantized_latency['mean_ms'] else 0.0),
+        'reference_detections': reference_total,
+        'quantized_detections': quantized_total,
+        'matched_detections': matched,
+        'recall': matched / reference_total if reference_total else 1.0,
+        'precision': matched / quantized_total if quantized_total else 1.0,
+        'mean_match_iou': float(np.mean(match_ious)) if match_ious else 0.0,
+        'mean_confidence_delta': float(np.mean(conf_deltas)) if conf_deltas else 0.0,
+        'missed_by_class': missed_by_class
+    }
+
+
+def format_report(report):
+    """
+    Format comparison report for display
+
+    Args:
+        report: Dictionary from compare_models
+
+    Returns:
+        Formatted string
+    """
+    ref, quant = report['reference_latency'], report['quantized_latency']
+    lines = [
+        f"Images compared: {report['images']}",
+        f"FP32 latency: mean {ref['mean_ms']:.1f} ms, p50 {ref['p50_ms']:.1f} ms, "
+        f"p95 {ref['p95_ms']:.1f} ms",
+        f"INT8 latency: mean {quant['mean_ms']:.1f} ms, p50 {quant['p50_ms']:.1f} ms, "
+        f"p95 {quant['p95_ms']:.1f} ms",
+        f"Speedup: {report['speedup']:.2f}x",
+        f"Detections: FP32 {report['reference_detections']}, "
+        f"INT8 {report['quantized_detections']}, matched {report['matched_detections']}",
+        f"Agreement: recall {report['recall']:.2%}, precision {report['precision']:.2%}",
+        f"Matched boxes: mean IoU {report['mean_match_iou']:.3f}, "
+        f"mean |conf delta| {report['mean_confidence_delta']:.3f}"
+    ]
+    if report['missed_by_class']:
+        lines.append('Missed by INT8:')
+        for name, count in sorted(report['missed_by_class'].items(),
+                                  key=lambda item: -item[1]):
+            lines.append(f'  {name}: {count}')
+    return '\n'.join(lines)
+
+
+def main():
+    """Compare the INT8 model against the FP32 model on a folder of images"""
+    parser = argparse.ArgumentParser(
+        description='Compare INT8 quantized inference against the FP32 model')
+    parser.add_argument('images', help='Folder of images to compare on')
+    parser.add_argument('--mode', choices=QUANTIZATION_MODES,
+                        default=QUANTIZATION_MODE if QUANTIZATION_MODE in QUANTIZATION_MODES
+                        else 'static')
+    parser.add_argument('--calibration', default=None,
+                        help='Calibration folder for static mode (defaults to '
+                             'CALIBRATION_FOLDER, then the compared images)')
+    parser.add_argument('--limit', type=int, default=200,
+                        help='Maximum number of images to compare')
+    parser.add_argument('--iou', type=float, default=0.5,
+                        help='IoU needed for two detections to agree')
+    args = parser.parse_args()
+
+    from model_handler import ModelHandler
+
+    image_paths = BatchProcessor.find_images(args.images)[:args.limit]
+    if not image_paths:
+        parser.error(f'No images found in {args.images}')
+
+    reference_handler = ModelHandler(quantization='none')
+    quantized_handler = ModelHandler(
+        quantization=args.mode,
+        calibration_folder=args.calibration or CALIBRATION_FOLDER or args.images)
+
+    for label, handler in (('FP32', reference_handler), ('INT8', quantized_handler)):
+        success, message = handler.load_model()
+        print(f'{label}: {message}')
+        if not success:
+            raise SystemExit(1)
+    if quantized_handler.backend.name != QuantizedONNXBackend.name:
+        raise SystemExit('INT8 model could not be loaded, nothing to compare')
+
+    report = compare_models(reference_handler, quantized_handler, image_paths,
+                            args.iou)
+    print(format_report(report))
+
+
+if __name__ == '__main__':
+    main()
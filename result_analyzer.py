@@ -4,42 +4,154 @@ Analyzes YOLO detection results and generates statistics
 """
 
 import numpy as np
-from config import STATS_PRECISION
+from config import STATS_PRECISION, MAX_DETECTIONS
+
+
+class Detections:
+    """
+    Detections of one image or frame stored as parallel NumPy columns
+    
+    Analysis works on the columns directly; to_dicts() builds per-box
+    dictionaries only where they are displayed or serialized.
+    """
+    
+    __slots__ = ('boxes', 'class_ids', 'confidences', 'names', 'track_ids')
+    
+    def __init__(self, boxes, class_ids, confidences, names=None, track_ids=None):
+        """
+        Initialize detections
+        
+        Args:
+            boxes: Array (N, 4) of [x1, y1, x2, y2]
+            class_ids: Array (N,) of class ids
+            confidences: Array (N,) of confidences
+            names: Dictionary mapping class id to class name
+            track_ids: Optional array (N,) of track ids
+        """
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.class_ids = np.asarray(class_ids, dtype=np.int64).reshape(-1)
+        self.confidences = np.asarray(confidences, dtype=np.float32).reshape(-1)
+        self.names = names or {}
+        self.track_ids = (None if track_ids is None
+                          else np.asarray(track_ids, dtype=np.int64).reshape(-1))
+    
+    @classmethod
+    def empty(cls, names=None):
+        """Detections with no boxes"""
+        return cls(np.zeros((0, 4)), np.zeros(0), np.zeros(0), names)
+    
+    @classmethod
+    def from_dicts(cls, detections):
+        """
+        Build from detection dictionaries as produced by to_dicts()
+        
+        Args:
+            detections: List of detection dictionaries, or None
+            
+        Returns:
+            Detections instance
+        """
+        if not detections:
+            return cls.empty()
+        names = {d['class_id']: d['class_name'] for d in detections}
+        track_ids = ([d['track_id'] for d in detections]
+                     if all('track_id' in d for d in detections) else None)
+        return cls([d['box'] for d in detections], [d['class_id'] for d in detections],
+                   [d['confidence'] for d in detections], names, track_ids)
+    
+    def __len__(self):
+        return len(self.class_ids)
+    
+    def __getitem__(self, index):
+        """Subset by index array or boolean mask"""
+        return Detections(self.boxes[index], self.class_ids[index], self.confidences[index],
+                          self.names,
+                          None if self.track_ids is None else self.track_ids[index])
+    
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+    
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+    
+    def class_names(self):
+        """Class name of every detection"""
+        return [self.names.get(int(class_id), str(int(class_id)))
+                for class_id in self.class_ids]
+    
+    def to_dicts(self):
+        """
+        Per-detection dictionaries for display and JSON output
+        
+        Returns:
+            List of dictionaries with class_id, class_name, confidence, box
+            and, for tracked frames, track_id
+        """
+        detections = [
+            {'class_id': int(class_id), 'class_name': class_name,
+             'confidence': float(confidence), 'box': box}
+            for class_id, class_name, confidence, box in zip(
+                self.class_ids, self.class_names(), self.confidences, self.boxes.tolist())
+        ]
+        if self.track_ids is not None:
+            for detection, track_id in zip(detections, self.track_ids):
+                detection['track_id'] = int(track_id)
+        return detections
 
 
 class ResultsAnalyzer:
     """Analyzes detection results and generates statistics"""
     
     @staticmethod
-    def extract_detections(results):
+    def extract_detections(results, scale=None):
         """
         Extract detection information from YOLO results
         
         Args:
             results: YOLO results object
+            scale: Optional (scale_x, scale_y) applied to boxes, e.g. to map a
+                reduced-resolution decode back to original pixels
             
         Returns:
-            Dictionary with detection data
+            Detections (empty, and falsy, if nothing was found)
+        """
+        boxes, class_ids, confidences = ResultsAnalyzer.extract_arrays(results, scale)
+        return Detections(boxes, class_ids, confidences, results.names)
+    
+    @staticmethod
+    def extract_arrays(results, scale=None):
         """
-        if len(results.boxes) == 0:
-            return None
+        Extract detection arrays from YOLO results
+        
+        Args:
+            results: YOLO results object
+            scale: Optional (scale_x, scale_y) applied to boxes
             
-        classes = results.boxes.cls.cpu().numpy()
-        confidences = results.boxes.conf.cpu().numpy()
-        boxes = results.boxes.xyxy.cpu().numpy()
-        names = results.names
-        
-        detections = []
-        for i in range(len(classes)):
-            detection = {
-                'class_id': int(classes[i]),
-                'class_name': names[int(classes[i])],
-                'confidence': float(confidences[i]),
-                'box': boxes[i].tolist()
-            }
-            detections.append(detection)
+        Returns:
+            Tuple (boxes (N, 4) xyxy, class_ids (N,), confidences (N,))
+        """
+        boxes = results.boxes
+        return (ResultsAnalyzer.scale_boxes(boxes.xyxy.cpu().numpy(), scale),
+                boxes.cls.cpu().numpy().astype(int),
+                boxes.conf.cpu().numpy())
+    
+    @staticmethod
+    def scale_boxes(boxes, scale):
+        """
+        Scale xyxy boxes per axis
+        
+        Args:
+            boxes: Array (N, 4) of [x1, y1, x2, y2]
+            scale: (scale_x, scale_y), or None to return boxes unchanged
             
-        return detections
+        Returns:
+            Scaled array
+        """
+        if scale is None or tuple(scale) == (1.0, 1.0):
+            return boxes
+        scale_x, scale_y = scale
+        return boxes * np.array([scale_x, scale_y, scale_x, scale_y], dtype=boxes.dtype)
     
     @staticmethod
     def group_by_class(detections):
@@ -47,38 +159,34 @@ class ResultsAnalyzer:
         Group detections by class
         
         Args:
-            detections: List of detection dictionaries
+            detections: Detections instance
             
         Returns:
-            Dictionary grouped by class name
+            Dictionary class name -> {count, confidences, boxes, max_confidence,
+            representative_box}, ordered by descending max confidence
         """
         if not detections:
             return {}
-            
+        
+        # Sort by class, then by descending confidence within each class
+        order = np.lexsort((-detections.confidences, detections.class_ids))
+        sorted_confidences = detections.confidences[order]
+        sorted_boxes = detections.boxes[order]
+        class_ids, starts, counts = np.unique(detections.class_ids[order],
+                                              return_index=True, return_counts=True)
+        max_confidences = np.maximum.reduceat(sorted_confidences, starts)
+        
         class_groups = {}
-        for detection in detections:
-            class_name = detection['class_name']
-            
-            if class_name not in class_groups:
-                class_groups[class_name] = {
-                    'count': 0,
-                    'confidences': [],
-                    'boxes': []
-                }
-            
-            class_groups[class_name]['count'] += 1
-            class_groups[class_name]['confidences'].append(detection['confidence'])
-            class_groups[class_name]['boxes'].append(detection['box'])
-        
-        # Calculate max confidence and representative box for each class
-        for class_name in class_groups:
-            confidences = class_groups[class_name]['confidences']
-            boxes = class_groups[class_name]['boxes']
-            
-            max_conf_idx = np.argmax(confidences)
-            class_groups[class_name]['max_confidence'] = confidences[max_conf_idx]
-            class_groups[class_name]['representative_box'] = boxes[max_conf_idx]
-            
+        for i in np.argsort(-max_confidences, kind='stable'):
+            start, count = starts[i], counts[i]
+            class_id = int(class_ids[i])
+            class_groups[detections.names.get(class_id, str(class_id))] = {
+                'count': int(count),
+                'confidences': sorted_confidences[start:start + count],
+                'boxes': sorted_boxes[start:start + count],
+                'max_confidence': float(max_confidences[i]),
+                'representative_box': sorted_boxes[start].tolist()
+            }
         return class_groups
     
     @staticmethod
@@ -87,7 +195,7 @@ class ResultsAnalyzer:
         Calculate detection statistics
         
         Args:
-            detections: List of detection dictionaries
+            detections: Detections instance
             
         Returns:
             Dictionary with statistics
@@ -101,15 +209,13 @@ class ResultsAnalyzer:
                 'min_confidence': 0.0
             }
         
-        confidences = [d['confidence'] for d in detections]
-        unique_classes = len(set(d['class_name'] for d in detections))
-        
+        confidences = detections.confidences
         stats = {
             'total_detections': len(detections),
-            'unique_classes': unique_classes,
-            'avg_confidence': np.mean(confidences),
-            'max_confidence': np.max(confidences),
-            'min_confidence': np.min(confidences)
+            'unique_classes': int(np.unique(detections.class_ids).size),
+            'avg_confidence': float(confidences.mean()),
+            'max_confidence': float(confidences.max()),
+            'min_confidence': float(confidences.min())
         }
         
         return stats
@@ -140,6 +246,85 @@ Min Confidence: {stats['min_confidence']:.{precision}%}
         
         return formatted.strip()
     
+    @staticmethod
+    def box_iou(boxes_a, boxes_b):
+        """
+        Compute pairwise IoU between two sets of boxes
+
+        Args:
+            boxes_a: Array of shape (N, 4) in [x1, y1, x2, y2] format
+            boxes_b: Array of shape (M, 4) in [x1, y1, x2, y2] format
+
+        Returns:
+            Array of shape (N, M) with IoU values
+        """
+        boxes_a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+        boxes_b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+
+        top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+        bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+        intersection = np.clip(bottom_right - top_left, 0, None).prod(axis=2)
+
+        area_a = (boxes_a[:, 2:] - boxes_a[:, :2]).prod(axis=1)
+        area_b = (boxes_b[:, 2:] - boxes_b[:, :2]).prod(axis=1)
+        union = area_a[:, None] + area_b[None, :] - intersection
+        return intersection / np.maximum(union, 1e-9)
+
+    @staticmethod
+    def non_max_suppression(detections, iou_threshold, max_detections=None):
+        """
+        Per-class greedy non-maximum suppression
+
+        Matches the ultralytics NMS: boxes are visited in descending
+        confidence and drop every later box of the same class whose IoU
+        exceeds the threshold. Boxes are offset by class so one IoU pass
+        handles every class, and IoU is only computed between each kept box
+        and the boxes still left, so memory stays linear in the candidates.
+
+        Args:
+            detections: Detections instance
+            iou_threshold: IoU above which the lower-confidence box is dropped
+            max_detections: Optional number of kept boxes after which to stop
+
+        Returns:
+            Indices of kept detections, in descending confidence
+        """
+        order = np.argsort(-detections.confidences, kind='stable')
+        boxes = detections.boxes[order]
+        if len(boxes):
+            # Boxes of different classes land far apart and never overlap
+            offset = boxes.max() + 1
+            boxes = boxes + detections.class_ids[order, None] * offset
+
+        keep = []
+        remaining = np.arange(len(order))
+        while remaining.size and len(keep) != max_detections:
+            best = remaining[0]
+            keep.append(best)
+            remaining = remaining[1:]
+            overlaps = ResultsAnalyzer.box_iou(boxes[best:best + 1], boxes[remaining])[0]
+            remaining = remaining[overlaps <= iou_threshold]
+        return order[np.array(keep, dtype=np.intp)]
+
+    @staticmethod
+    def apply_thresholds(candidates, conf_threshold, iou_threshold, max_detections=None):
+        """
+        Filter cached candidates as if the model had run with new thresholds
+
+        Args:
+            candidates: Detections from ModelHandler.predict_candidates
+            conf_threshold: Minimum confidence (not below CANDIDATE_CONFIDENCE)
+            iou_threshold: NMS IoU threshold
+            max_detections: Optional cap on kept detections (defaults to MAX_DETECTIONS)
+
+        Returns:
+            Detections in descending confidence
+        """
+        candidates = candidates[candidates.confidences >= conf_threshold]
+        keep = ResultsAnalyzer.non_max_suppression(candidates, iou_threshold,
+                                                   max_detections or MAX_DETECTIONS)
+        return candidates[keep]
+
     @staticmethod
     def format_box_coordinates(box):
         """
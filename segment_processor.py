@@ -0,0 +1,261 @@
+"""
+Segment Processor
+Processes long video files as time segments in parallel worker processes
+"""
+
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import cv2
+from config import (SEGMENT_SECONDS, SEGMENT_WORKERS, VIDEO_BATCH_SIZE, VIDEO_FOURCC,
+                    DEFAULT_OUTPUT_FPS)
+from result_analyzer import ResultsAnalyzer
+
+# Per-process model, created once by init_worker
+worker_model_handler = None
+
+
+def init_worker(threads_per_worker, model_settings=None):
+    """
+    Load a ModelHandler in a worker process
+
+    Args:
+        threads_per_worker: torch intra-op threads for this worker
+        model_settings: ModelHandler arguments (backend, quantization,
+            calibration_folder); defaults to config values
+    """
+    global worker_model_handler
+
+    from model_handler import create_worker_model_handler
+
+    worker_model_handler = create_worker_model_handler(threads_per_worker, model_settings)
+
+
+def seek(cap, start_frame):
+    """Position capture at start_frame, stepping forward if the seek lands early"""
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    while position < start_frame and cap.grab():
+        position += 1
+
+
+def process_segment(video_path, segment_index, start_frame, end_frame, segment_path=None):
+    """
+    Run detection on frames [start_frame, end_frame) of a video
+
+    Args:
+        video_path: Path to video file
+        segment_index: Position of the segment in the video
+        start_frame: First frame index
+        end_frame: Frame index after the last one, or None to read to the end
+        segment_path: Optional path for this segment's annotated video
+
+    Returns:
+        Tuple (segment_index, list of (frame_index, timestamp, detections))
+    """
+    cap = cv2.VideoCapture(str(video_path))
+    writer = None
+    records = []
+    try:
+        if not cap.isOpened():
+            raise IOError(f"Failed to open {video_path}")
+        fps = cap.get(cv2.CAP_PROP_FPS) or DEFAULT_OUTPUT_FPS
+        seek(cap, start_frame)
+
+        if end_frame is None:
+            end_frame = float('inf')
+
+        frame_index = start_frame
+        while frame_index < end_frame:
+            frames = []
+            while len(frames) < VIDEO_BATCH_SIZE and frame_index + len(frames) < end_frame:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                frames.append(frame)
+            if not frames:
+                break
+
+            for frame, results in zip(frames, worker_model_handler.predict_batch(frames)):
+                records.append((frame_index, frame_index / fps,
+                                ResultsAnalyzer.extract_detections(results)))
+                frame_index += 1
+
+                if segment_path:
+                    annotated_frame = worker_model_handler.get_annotated_image(results)
+                    if writer is None:
+                        height, width = annotated_frame.shape[:2]
+                        writer = cv2.VideoWriter(str(segment_path),
+                                                 cv2.VideoWriter_fourcc(*VIDEO_FOURCC),
+                                                 fps, (width, height))
+                    writer.write(annotated_frame)
+    finally:
+        cap.release()
+        if writer is not None:
+            writer.release()
+
+    return segment_index, records
+
+
+class SegmentProcessor:
+    """Splits a video into segments and processes them in a process pool"""
+
+    def __init__(self, num_workers=None, segment_seconds=None, model_settings=None):
+        """
+        Initialize segment processor
+
+        Args:
+            num_workers: Worker processes (defaults to SEGMENT_WORKERS, or half
+                the CPU cores when that is 0)
+            segment_seconds: Target segment length (defaults to SEGMENT_SECONDS)
+            model_settings: ModelHandler arguments for the workers, as from
+                ModelHandler.worker_settings() (defaults to config values)
+        """
+        cpu_count = os.cpu_count() or 1
+        self.num_workers = num_workers or SEGMENT_WORKERS or max(1, cpu_count // 2)
+        self.segment_seconds = segment_seconds or SEGMENT_SECONDS
+        # Split cores between workers so they don't oversubscribe the CPU
+        self.threads_per_worker = max(1, cpu_count // self.num_workers)
+        self.model_settings = model_settings
+        self.frame_shape = None  # (height, width) of the last processed video
+
+    def plan_segments(self, frame_count, fps):
+        """
+        Split a video into frame ranges
+
+        Args:
+            frame_count: Total frames in the video
+            fps: Video frame rate
+
+        Returns:
+            List of (start_frame, end_frame); the last segment's end is None
+            because container frame counts are often approximate
+        """
+        segment_frames = max(1, int(self.segment_seconds * fps))
+        starts = list(range(0, max(frame_count, 1), segment_frames))
+        return [(start, starts[i + 1] if i + 1 < len(starts) else None)
+                for i, start in enumerate(starts)]
+
+    def merge_segments(self, segment_paths, output_path, fps):
+        """
+        Concatenate annotated segment videos in order
+
+        Uses ffmpeg's concat demuxer when ffmpeg is installed, which copies
+        the encoded streams instead of decoding and re-encoding every frame;
+        otherwise falls back to re-encoding with OpenCV.
+
+        Args:
+            segment_paths: Segment videos in playback order
+            output_path: Path for the merged video
+            fps: Frame rate for the OpenCV fallback
+
+        Raises:
+            IOError: If there are no segments, or one is missing or cannot be merged
+        """
+        if not segment_paths:
+            raise IOError("No frames decoded, nothing to merge")
+        missing = [path.name for path in segment_paths if not path.exists()]
+        if missing:
+            raise IOError(f"Missing segment videos: {', '.join(missing)}")
+
+        ffmpeg = shutil.which('ffmpeg')
+        if ffmpeg:
+            list_path = segment_paths[0].parent / 'segments.txt'
+            list_path.write_text(''.join(f"file '{path.resolve().as_posix()}'\n"
+                                         for path in segment_paths))
+            result = subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-f', 'concat',
+                                     '-safe', '0', '-i', str(list_path), '-c', 'copy',
+                                     str(output_path)],
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                    text=True)
+            if result.returncode != 0:
+                raise IOError(f"ffmpeg failed to merge segments: {result.stderr.strip()}")
+            return
+
+        writer = None
+        try:
+            for segment_path in segment_paths:
+                cap = cv2.VideoCapture(str(segment_path))
+                if not cap.isOpened():
+                    raise IOError(f"Failed to open segment video {segment_path.name}")
+                while True:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    if writer is None:
+                        height, width = frame.shape[:2]
+                        writer = cv2.VideoWriter(str(output_path),
+                                                 cv2.VideoWriter_fourcc(*VIDEO_FOURCC),
+                                                 fps, (width, height))
+                    writer.write(frame)
+                cap.release()
+        finally:
+            if writer is not None:
+                writer.release()
+
+    def process_video(self, video_path, output_path=None, progress_callback=None):
+        """
+        Process a video file with segments running in parallel
+
+        Args:
+            video_path: Path to video file
+            output_path: Optional path for the merged annotated video
+            progress_callback: Optional callback function(completed_segments, total_segments)
+
+        Raises:
+            IOError: If the video cannot be opened or the segments cannot be merged
+
+        Returns:
+            List of (frame_index, timestamp, detections) for every frame, in order
+        """
+        cap = cv2.VideoCapture(str(video_path))
+        if not cap.isOpened():
+            raise IOError(f"Failed to open {video_path}")
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or DEFAULT_OUTPUT_FPS
+        self.frame_shape = (int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                            int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)))
+        cap.release()
+
+        segments = self.plan_segments(frame_count, fps)
+        if not segments:
+            return []
+
+        temp_dir = Path(tempfile.mkdtemp(prefix='segments_')) if output_path else None
+        segment_paths = [temp_dir / f'segment_{i:05d}.mp4' if temp_dir else None
+                         for i in range(len(segments))]
+
+        segment_records = [None] * len(segments)
+        try:
+            # spawn: forking a parent that already holds torch threads can deadlock
+            with ProcessPoolExecutor(max_workers=min(self.num_workers, len(segments)),
+                                     mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=init_worker,
+                                     initargs=(self.threads_per_worker,
+                                               self.model_settings)) as executor:
+                futures = [
+                    executor.submit(process_segment, str(video_path), i, start, end,
+                                    segment_paths[i])
+                    for i, (start, end) in enumerate(segments)
+                ]
+                for completed, future in enumerate(as_completed(futures), start=1):
+                    segment_index, records = future.result()
+                    segment_records[segment_index] = records
+                    if progress_callback:
+                        progress_callback(completed, len(segments))
+
+            if output_path:
+                # Segments past the real end of the video read no frames and
+                # write no file; every other segment must have its video
+                self.merge_segments([path for path, records in zip(segment_paths, segment_records)
+                                     if records], output_path, fps)
+        finally:
+            if temp_dir is not None:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+
+        return [record for records in segment_records for record in records]
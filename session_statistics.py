@@ -0,0 +1,259 @@
+"""
+Session Statistics
+Constant-memory aggregate detection statistics over a whole session
+"""
+
+import csv
+import json
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from config import SESSION_HISTOGRAM_BINS, SESSION_QUANTILES, SESSION_RATE_MINUTES
+
+
+class P2Quantile:
+    """
+    Streaming quantile estimate with the P-square algorithm (Jain & Chlamtac)
+
+    Keeps five markers whose heights track the quantile, so memory is
+    constant however many values are added.
+    """
+
+    def __init__(self, quantile):
+        """
+        Initialize estimator
+
+        Args:
+            quantile: Quantile to track, in (0, 1)
+        """
+        self.quantile = quantile
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * quantile, 1 + 4 * quantile, 3 + 2 * quantile, 5]
+        self.increments = [0, quantile / 2, quantile, (1 + quantile) / 2, 1]
+
+    def add(self, value):
+        """Add one observation"""
+        heights = self.heights
+        if len(heights) < 5:
+            heights.append(value)
+            heights.sort()
+            return
+
+        # Find the cell containing value, widening the extremes if needed
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = next(i for i in range(4) if heights[i] <= value < heights[i + 1])
+
+        for i in range(cell + 1, 5):
+            self.positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # Move the middle markers towards their desired positions
+        positions = self.positions
+        for i in range(1, 4):
+            offset = self.desired[i] - positions[i]
+            if ((offset >= 1 and positions[i + 1] - positions[i] > 1) or
+                    (offset <= -1 and positions[i - 1] - positions[i] < -1)):
+                step = 1 if offset > 0 else -1
+                height = self.parabolic(i, step)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = self.linear(i, step)
+                heights[i] = height
+                positions[i] += step
+
+    def parabolic(self, i, step):
+        """Piecewise-parabolic height prediction for marker i"""
+        n, q = self.positions, self.heights
+        return q[i] + step / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+            (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+    def linear(self, i, step):
+        """Linear height prediction for marker i"""
+        n, q = self.positions, self.heights
+        return q[i] + step * (q[i + step] - q[i]) / (n[i + step] - n[i])
+
+    def value(self):
+        """Current estimate (exact while fewer than five values were added)"""
+        if not self.heights:
+            return 0.0
+        if len(self.heights) < 5:
+            return float(np.percentile(self.heights, self.quantile * 100))
+        return float(self.heights[2])
+
+
+class SessionStatistics:
+    """Aggregates detections of every frame and image of a session"""
+
+    def __init__(self, bins=None, quantiles=None, rate_minutes=None):
+        """
+        Initialize session statistics
+
+        Args:
+            bins: Confidence histogram bins over [0, 1] (defaults to
+                SESSION_HISTOGRAM_BINS)
+            quantiles: Confidence quantiles to track (defaults to SESSION_QUANTILES)
+            rate_minutes: Most recent minutes kept for per-minute rates
+                (defaults to SESSION_RATE_MINUTES)
+        """
+        self.bins = bins or SESSION_HISTOGRAM_BINS
+        self.quantiles = quantiles or SESSION_QUANTILES
+        self.rate_minutes = rate_minutes or SESSION_RATE_MINUTES
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Start a new session"""
+        with self.lock:
+            self.session_start = time.time()
+            self.start = time.monotonic()
+            self.frames = 0
+            self.detections = 0
+            self.confidence_sum = 0.0
+            self.histogram = np.zeros(self.bins, dtype=np.int64)
+            self.estimators = [P2Quantile(q) for q in self.quantiles]
+            self.names = {}
+            # Indexed by class id, grown as new ids appear
+            self.class_counts = np.zeros(0, dtype=np.int64)
+            self.class_confidence_sums = np.zeros(0, dtype=np.float64)
+            self.class_max_confidences = np.zeros(0, dtype=np.float64)
+            self.minutes = deque(maxlen=self.rate_minutes)  # [minute, frames, detections]
+
+    def update(self, detections):
+        """
+        Add one frame or image
+
+        Args:
+            detections: Detections of that frame or image (None if nothing found)
+        """
+        count = len(detections) if detections is not None else 0
+        minute = int((time.monotonic() - self.start) // 60)
+
+        with self.lock:
+            self.frames += 1
+            if not self.minutes or self.minutes[-1][0] != minute:
+                self.minutes.append([minute, 0, 0])
+            self.minutes[-1][1] += 1
+            self.minutes[-1][2] += count
+            if count == 0:
+                return
+
+            confidences = detections.confidences
+            class_ids = detections.class_ids
+            self.detections += count
+            self.confidence_sum += float(confidences.sum())
+            bin_index = np.minimum((confidences * self.bins).astype(np.int64), self.bins - 1)
+            self.histogram += np.bincount(bin_index, minlength=self.bins)
+            for estimator in self.estimators:
+                for confidence in confidences.tolist():
+                    estimator.add(confidence)
+
+            size = int(class_ids.max()) + 1
+            if size > len(self.class_counts):
+                grow = size - len(self.class_counts)
+                self.class_counts = np.pad(self.class_counts, (0, grow))
+                self.class_confidence_sums = np.pad(self.class_confidence_sums, (0, grow))
+                self.class_max_confidences = np.pad(self.class_max_confidences, (0, grow))
+            self.class_counts += np.bincount(class_ids, minlength=len(self.class_counts))
+            self.class_confidence_sums += np.bincount(class_ids, weights=confidences,
+                                                      minlength=len(self.class_counts))
+            np.maximum.at(self.class_max_confidences, class_ids, confidences)
+            for class_id in np.unique(class_ids).tolist():
+                if class_id not in self.names:
+                    self.names[class_id] = detections.names.get(class_id, str(class_id))
+
+    def snapshot(self):
+        """
+        Get current statistics
+
+        Returns:
+            Dictionary with totals, per-class counts, confidence histogram and
+            quantiles, and per-minute rates
+        """
+        with self.lock:
+            present = np.flatnonzero(self.class_counts)
+            order = present[np.argsort(-self.class_counts[present], kind='stable')]
+            classes = {
+                self.names[int(class_id)]: {
+                    'count': int(self.class_counts[class_id]),
+                    'mean_confidence': float(self.class_confidence_sums[class_id] /
+                                             self.class_counts[class_id]),
+                    'max_confidence': float(self.class_max_confidences[class_id])
+                }
+                for class_id in order
+            }
+            return {
+                'session_start': self.session_start,
+                'duration_s': time.monotonic() - self.start,
+                'frames': self.frames,
+                'detections': self.detections,
+                'detections_per_frame': self.detections / self.frames if self.frames else 0.0,
+                'mean_confidence': (self.confidence_sum / self.detections
+                                    if self.detections else 0.0),
+                'confidence_quantiles': {f'p{round(e.quantile * 100)}': e.value()
+                                         for e in self.estimators},
+                'confidence_histogram': {
+                    'edges': np.linspace(0, 1, self.bins + 1).round(4).tolist(),
+                    'counts': self.histogram.tolist()
+                },
+                'classes': classes,
+                'per_minute': [{'minute': m, 'frames': f, 'detections': d}
+                               for m, f, d in self.minutes]
+            }
+
+    def format_snapshot(self, max_classes=5):
+        """
+        Format statistics for the UI stats panel
+
+        Args:
+            max_classes: Most frequent classes listed
+
+        Returns:
+            Formatted string
+        """
+        snapshot = self.snapshot()
+        if snapshot['frames'] == 0:
+            return 'No session data yet'
+
+        quantiles = '  '.join(f'{name} {value:.2f}'
+                              for name, value in snapshot['confidence_quantiles'].items())
+        lines = [
+            f"Session: {snapshot['frames']} frames, {snapshot['detections']} detections",
+            f"Per frame: {snapshot['detections_per_frame']:.2f}",
+            f"Confidence: mean {snapshot['mean_confidence']:.2f}  {quantiles}"
+        ]
+        recent = snapshot['per_minute'][-1:] or [{'detections': 0}]
+        lines.append(f"Last minute: {recent[0]['detections']} detections")
+        for name, data in list(snapshot['classes'].items())[:max_classes]:
+            lines.append(f"  {name}: {data['count']}")
+        return '\n'.join(lines)
+
+    def export_json(self, path):
+        """Write the full snapshot to a JSON file"""
+        with open(path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def export_csv(self, path):
+        """Write per-class statistics to a CSV file, one row per class"""
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['class', 'count', 'mean_confidence', 'max_confidence'])
+            for name, data in self.snapshot()['classes'].items():
+                writer.writerow([name, data['count'], f"{data['mean_confidence']:.4f}",
+                                 f"{data['max_confidence']:.4f}"])
+
+    def export(self, path):
+        """Write statistics as CSV or JSON based on the file extension"""
+        if str(path).lower().endswith('.csv'):
+            self.export_csv(path)
+        else:
+            self.export_json(path)
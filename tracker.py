@@ -0,0 +1,180 @@
+"""
+Box Tracker
+Carries detections between detector runs with a vectorized Kalman filter
+and assigns stable track IDs
+"""
+
+import numpy as np
+from config import TRACKER_IOU_THRESHOLD, TRACKER_MAX_AGE
+from result_analyzer import ResultsAnalyzer
+
+# Constant-velocity model over [cx, cy, w, h, vcx, vcy, vw, vh], one step per frame
+TRANSITION = np.eye(8)
+TRANSITION[:4, 4:] = np.eye(4)
+MEASUREMENT = np.eye(4, 8)
+
+# Noise scales relative to box height, as in SORT/DeepSORT
+POSITION_STD = 1.0 / 20
+VELOCITY_STD = 1.0 / 160
+
+
+def xyxy_to_cxcywh(boxes):
+    """Convert (N, 4) [x1, y1, x2, y2] boxes to [cx, cy, w, h]"""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    wh = boxes[:, 2:] - boxes[:, :2]
+    return np.hstack([boxes[:, :2] + wh / 2, wh])
+
+
+def cxcywh_to_xyxy(boxes):
+    """Convert (N, 4) [cx, cy, w, h] boxes to [x1, y1, x2, y2]"""
+    half = boxes[:, 2:] / 2
+    return np.hstack([boxes[:, :2] - half, boxes[:, :2] + half])
+
+
+def greedy_match(scores, threshold):
+    """
+    Match rows to columns by repeatedly taking the best remaining score
+
+    Args:
+        scores: Array of shape (N, M)
+        threshold: Minimum score for a match
+
+    Returns:
+        Tuple (row indices, column indices) of matched pairs
+    """
+    scores = scores.copy()
+    rows, cols = [], []
+    while scores.size:
+        i, j = np.unravel_index(np.argmax(scores), scores.shape)
+        if scores[i, j] < threshold:
+            break
+        rows.append(i)
+        cols.append(j)
+        scores[i, :] = -1
+        scores[:, j] = -1
+    return np.array(rows, dtype=int), np.array(cols, dtype=int)
+
+
+class BoxTracker:
+    """IoU-matched, Kalman-smoothed multi-object tracker"""
+
+    def __init__(self, iou_threshold=None, max_age=None):
+        """
+        Initialize tracker
+
+        Args:
+            iou_threshold: Minimum IoU to match a detection to a track
+                (defaults to TRACKER_IOU_THRESHOLD)
+            max_age: Detector runs a track may go unmatched before it is
+                dropped (defaults to TRACKER_MAX_AGE)
+        """
+        self.iou_threshold = iou_threshold or TRACKER_IOU_THRESHOLD
+        self.max_age = max_age if max_age is not None else TRACKER_MAX_AGE
+        self.next_id = 1
+
+        self.state = np.zeros((0, 8))
+        self.covariance = np.zeros((0, 8, 8))
+        self.class_ids = np.zeros(0, dtype=int)
+        self.confidences = np.zeros(0, dtype=np.float32)
+        self.track_ids = np.zeros(0, dtype=int)
+        self.misses = np.zeros(0, dtype=int)
+
+    def reset(self):
+        """Drop all tracks"""
+        self.__init__(self.iou_threshold, self.max_age)
+
+    def noise(self, heights, position_scale, velocity_scale):
+        """Per-track diagonal noise covariance of shape (N, 8, 8)"""
+        heights = np.maximum(heights, 1.0)
+        std = np.empty((len(heights), 8))
+        std[:, :4] = position_scale * POSITION_STD * heights[:, None]
+        std[:, 4:] = velocity_scale * VELOCITY_STD * heights[:, None]
+        covariance = np.zeros((len(heights), 8, 8))
+        idx = np.arange(8)
+        covariance[:, idx, idx] = std ** 2
+        return covariance
+
+    def predict(self):
+        """Advance all tracks by one frame"""
+        if not len(self.state):
+            return
+        process_noise = self.noise(self.state[:, 3], 1.0, 1.0)
+        self.state = self.state @ TRANSITION.T
+        self.state[:, 2:4] = np.maximum(self.state[:, 2:4], 1.0)
+        self.covariance = TRANSITION @ self.covariance @ TRANSITION.T + process_noise
+
+    def correct(self, indices, measurements):
+        """Kalman update of the given tracks with (M, 4) [cx, cy, w, h] measurements"""
+        covariance = self.covariance[indices]
+        measurement_noise = self.noise(measurements[:, 3], 1.0, 0.0)[:, :4, :4]
+
+        innovation_cov = MEASUREMENT @ covariance @ MEASUREMENT.T + measurement_noise
+        gain = covariance @ MEASUREMENT.T @ np.linalg.inv(innovation_cov)
+        innovation = measurements - self.state[indices] @ MEASUREMENT.T
+
+        self.state[indices] += (gain @ innovation[:, :, None])[:, :, 0]
+        self.covariance[indices] = (np.eye(8) - gain @ MEASUREMENT) @ covariance
+
+    def add_tracks(self, measurements, class_ids, confidences):
+        """Start new tracks from unmatched detections"""
+        count = len(measurements)
+        state = np.hstack([measurements, np.zeros((count, 4))])
+        covariance = self.noise(measurements[:, 3], 2.0, 10.0)
+        track_ids = np.arange(self.next_id, self.next_id + count)
+        self.next_id += count
+
+        self.state = np.vstack([self.state, state])
+        self.covariance = np.concatenate([self.covariance, covariance])
+        self.class_ids = np.concatenate([self.class_ids, class_ids])
+        self.confidences = np.concatenate([self.confidences, confidences])
+        self.track_ids = np.concatenate([self.track_ids, track_ids])
+        self.misses = np.concatenate([self.misses, np.zeros(count, dtype=int)])
+
+    def update(self, boxes, class_ids, confidences):
+        """
+        Advance one frame and fold in a new set of detections
+
+        Args:
+            boxes: Array (N, 4) of [x1, y1, x2, y2]
+            class_ids: Array (N,) of class ids
+            confidences: Array (N,) of confidences
+        """
+        self.predict()
+
+        measurements = xyxy_to_cxcywh(boxes)
+        class_ids = np.asarray(class_ids, dtype=int)
+        confidences = np.asarray(confidences, dtype=np.float32)
+
+        ious = ResultsAnalyzer.box_iou(cxcywh_to_xyxy(self.state[:, :4]),
+                                       cxcywh_to_xyxy(measurements))
+        ious[self.class_ids[:, None] != class_ids[None, :]] = 0.0
+        track_idx, det_idx = greedy_match(ious, self.iou_threshold)
+
+        if len(track_idx):
+            self.correct(track_idx, measurements[det_idx])
+            self.confidences[track_idx] = confidences[det_idx]
+
+        self.misses += 1
+        self.misses[track_idx] = 0
+
+        keep = self.misses <= self.max_age
+        for name in ('state', 'covariance', 'class_ids', 'confidences',
+                     'track_ids', 'misses'):
+            setattr(self, name, getattr(self, name)[keep])
+
+        unmatched = np.setdiff1d(np.arange(len(measurements)), det_idx)
+        if len(unmatched):
+            self.add_tracks(measurements[unmatched], class_ids[unmatched],
+                            confidences[unmatched])
+
+    def active_tracks(self):
+        """
+        Get tracks matched by the most recent detector run
+
+        Returns:
+            Tuple (boxes (N, 4) xyxy, class_ids, confidences, track_ids)
+        """
+        active = self.misses == 0
+        boxes = cxcywh_to_xyxy(self.state[active, :4])
+        return (boxes, self.class_ids[active], self.confidences[active],
+                self.track_ids[active])
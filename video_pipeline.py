@@ -0,0 +1,445 @@
+"""
+Video Pipeline
+Runs capture, inference and rendering as concurrent stages joined by bounded queues
+"""
+
+import queue
+import threading
+import time
+
+import cv2
+from config import (VIDEO_BATCH_SIZE, PIPELINE_QUEUE_SIZE, CAMERA_DROP_POLICY,
+                    VIDEO_DROP_POLICY, DETECTION_INTERVAL, DETECTION_TIME_BUDGET,
+                    MOTION_GATING)
+from image_processor import ImageProcessor
+from motion_detector import MotionDetector
+from result_analyzer import ResultsAnalyzer, Detections
+from tracker import BoxTracker
+from video_writer import AsyncVideoWriter
+
+DROP_OLDEST = 'latest'  # Latest frame wins: drop the oldest queued item when full
+NEVER_DROP = 'never'  # Block the producer until there is room
+
+END_OF_STREAM = object()  # Sentinel passed down the stages when capture ends
+
+
+class FrameQueue:
+    """Bounded queue between two pipeline stages with a drop policy"""
+
+    def __init__(self, maxsize, drop_policy=NEVER_DROP):
+        """
+        Initialize frame queue
+
+        Args:
+            maxsize: Maximum number of queued items
+            drop_policy: DROP_OLDEST or NEVER_DROP
+        """
+        if drop_policy not in (DROP_OLDEST, NEVER_DROP):
+            raise ValueError(f"Unknown drop policy '{drop_policy}'")
+        self.queue = queue.Queue(maxsize=max(1, maxsize))
+        self.drop_policy = drop_policy
+        self.dropped = 0
+
+    def put(self, item, stop_event):
+        """
+        Add item, dropping or blocking according to the policy
+
+        Args:
+            item: Item to queue
+            stop_event: threading.Event that aborts a blocked put
+
+        Returns:
+            True if queued, False if the pipeline was stopped first
+        """
+        while not stop_event.is_set():
+            if self.drop_policy == NEVER_DROP:
+                try:
+                    self.queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+
+            try:
+                self.queue.put_nowait(item)
+                return True
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+        return False
+
+    def get(self, stop_event):
+        """
+        Wait for next item
+
+        Args:
+            stop_event: threading.Event that aborts the wait
+
+        Returns:
+            Next item, or END_OF_STREAM if the pipeline was stopped
+        """
+        while not stop_event.is_set():
+            try:
+                return self.queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return END_OF_STREAM
+
+    def get_nowait(self):
+        """Return next item or None if the queue is empty"""
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            return None
+
+
+class FramePacket:
+    """A captured frame and everything computed for it along the pipeline"""
+
+    def __init__(self, index, timestamp, image):
+        """
+        Initialize frame packet
+
+        Args:
+            index: Frame number within the source
+            timestamp: Source timestamp in seconds
+            image: Decoded frame (BGR numpy array)
+        """
+        self.index = index
+        self.timestamp = timestamp
+        self.image = image
+        self.results = None
+        self.tracks = None  # (boxes, class_ids, confidences, track_ids) when tracking
+
+
+def open_capture(source):
+    """
+    Open a video file or camera
+
+    Args:
+        source: Video file path or camera index
+
+    Returns:
+        cv2.VideoCapture
+    """
+    cap = cv2.VideoCapture(source)
+    if isinstance(source, int):
+        # Keep the driver from buffering stale frames
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+def capture_frames(cap, frame_queue, stop_event, is_camera=False, monitor=None):
+    """
+    Decode frames into a queue until the source ends or the pipeline stops
+
+    Always finishes by queueing END_OF_STREAM.
+
+    Args:
+        cap: Opened cv2.VideoCapture
+        frame_queue: FrameQueue receiving FramePacket items
+        stop_event: threading.Event that stops capture
+        is_camera: Timestamp frames by arrival time instead of stream position
+        monitor: Optional PerformanceMonitor receiving 'decode' timings
+    """
+    try:
+        index = 0
+        start = time.monotonic()
+        while not stop_event.is_set():
+            decode_start = time.perf_counter()
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if monitor is not None:
+                monitor.record('decode', (time.perf_counter() - decode_start) * 1000)
+            if is_camera:
+                # Camera position timestamps are unreliable; use arrival time
+                timestamp = time.monotonic() - start
+            else:
+                timestamp = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            if not frame_queue.put(FramePacket(index, timestamp, frame), stop_event):
+                break
+            index += 1
+    finally:
+        frame_queue.put(END_OF_STREAM, stop_event)
+
+
+class VideoPipeline:
+    """Capture -> inference -> render pipeline for one video file or camera"""
+
+    def __init__(self, source, model_handler, on_frame=None, on_error=None,
+                 drop_policy=None, queue_size=None, detection_interval=None,
+                 detection_time_budget=None, motion_gating=None, output_path=None,
+                 detection_writer=None):
+        """
+        Initialize video pipeline
+
+        Args:
+            source: Video file path or camera index
+            model_handler: ModelHandler instance for inference
+            on_frame: Optional callback function(annotated_frame), called from the
+                render stage
+            on_error: Optional callback function(message)
+            drop_policy: DROP_OLDEST or NEVER_DROP (defaults to CAMERA_DROP_POLICY
+                for cameras and VIDEO_DROP_POLICY for files)
+            queue_size: Capacity of each stage queue (defaults to PIPELINE_QUEUE_SIZE)
+            detection_interval: Run the detector every N frames and track in
+                between (defaults to DETECTION_INTERVAL)
+            detection_time_budget: Run the detector at most once per this many
+                seconds and track in between (defaults to DETECTION_TIME_BUDGET)
+            motion_gating: Skip inference on frames that barely differ from the
+                last inferred one and reuse its results (defaults to MOTION_GATING)
+            output_path: Optional path to export the annotated video to
+            detection_writer: Optional DetectionWriter receiving every frame's
+                detections; frames are only rendered if on_frame or
+                output_path needs them
+        """
+        self.source = source
+        self.model_handler = model_handler
+        self.on_frame = on_frame
+        self.on_error = on_error
+        self.is_camera = isinstance(source, int)
+
+        if drop_policy is None:
+            drop_policy = CAMERA_DROP_POLICY if self.is_camera else VIDEO_DROP_POLICY
+        queue_size = queue_size or PIPELINE_QUEUE_SIZE
+        self.capture_queue = FrameQueue(queue_size, drop_policy)
+        self.render_queue = FrameQueue(queue_size, drop_policy)
+
+        # Cameras infer one frame at a time so latency tracks the live frame
+        self.batch_size = 1 if self.is_camera else VIDEO_BATCH_SIZE
+        self.stop_event = threading.Event()
+
+        self.detection_interval = max(1, detection_interval or DETECTION_INTERVAL)
+        self.detection_time_budget = (detection_time_budget
+                                      if detection_time_budget is not None
+                                      else DETECTION_TIME_BUDGET)
+        self.tracker = None
+        if self.detection_interval > 1 or self.detection_time_budget > 0:
+            self.tracker = BoxTracker()
+            self.batch_size = 1  # The tracker consumes frames in order
+        self.last_detection_index = None
+        self.last_detection_time = 0.0
+        self.names = {}
+
+        if motion_gating is None:
+            motion_gating = MOTION_GATING
+        self.motion_detector = MotionDetector() if motion_gating else None
+        self.last_results = None
+        self.skipped_inferences = 0
+
+        self.output_path = output_path
+        self.video_writer = None
+        self.export_dropped = 0  # Frames the video export repeated instead of encoding
+        self.detection_writer = detection_writer
+        self.frames_processed = 0
+
+    def report_error(self, message):
+        """Forward error and stop all stages"""
+        if self.on_error and not self.stop_event.is_set():
+            self.on_error(message)
+        self.stop_event.set()
+
+    def capture_loop(self, cap):
+        """Capture stage: decode frames into the capture queue"""
+        try:
+            capture_frames(cap, self.capture_queue, self.stop_event, self.is_camera,
+                           self.model_handler.monitor)
+        except Exception as e:
+            self.report_error(f"Video processing error: {str(e)}")
+
+    def next_batch(self):
+        """
+        Collect up to batch_size frames without waiting for a full batch
+
+        Returns:
+            Tuple (list of FramePacket, reached_end)
+        """
+        packet = self.capture_queue.get(self.stop_event)
+        if packet is END_OF_STREAM:
+            return [], True
+
+        packets = [packet]
+        while len(packets) < self.batch_size:
+            packet = self.capture_queue.get_nowait()
+            if packet is None:
+                break
+            if packet is END_OF_STREAM:
+                return packets, True
+            packets.append(packet)
+        return packets, False
+
+    def scene_changed(self, packet):
+        """Check the motion gate; always True when gating is off"""
+        if self.motion_detector is None:
+            return True
+        if self.motion_detector.has_changed(packet.image):
+            return True
+        self.skipped_inferences += 1
+        return False
+
+    def should_detect(self, packet):
+        """Decide whether this frame gets a detector run or only tracking"""
+        if self.last_detection_index is None:
+            return self.scene_changed(packet)
+        if self.detection_time_budget > 0:
+            due = time.monotonic() - self.last_detection_time >= self.detection_time_budget
+        else:
+            due = packet.index - self.last_detection_index >= self.detection_interval
+        return due and self.scene_changed(packet)
+
+    def detect(self, packets):
+        """
+        Run the detector on a batch, reusing results for unchanged frames
+
+        Args:
+            packets: List of FramePacket
+        """
+        # Each frame is compared with the last frame that will be inferred
+        # before it, so a batch can mix inferred and reused frames
+        inferred = []
+        for packet in packets:
+            if self.scene_changed(packet):
+                if self.motion_detector is not None:
+                    self.motion_detector.update_reference()
+                inferred.append(packet)
+            else:
+                packet.results = None
+
+        if inferred:
+            # Live frames never repeat, so only files use the prediction cache
+            batch_results = self.model_handler.predict_batch(
+                [packet.image for packet in inferred], self.batch_size,
+                use_cache=not self.is_camera
+            )
+            for packet, results in zip(inferred, batch_results):
+                packet.results = results
+
+        for packet in packets:
+            if packet.results is None:
+                packet.results = self.last_results
+            self.last_results = packet.results
+
+    def track(self, packet):
+        """Run detector or carry tracks forward for one frame"""
+        if self.should_detect(packet):
+            results = self.model_handler.predict_batch([packet.image], 1,
+                                                      use_cache=not self.is_camera)[0]
+            self.tracker.update(*ResultsAnalyzer.extract_arrays(results))
+            if self.motion_detector is not None:
+                self.motion_detector.update_reference()
+            self.names = results.names
+            self.last_detection_index = packet.index
+            self.last_detection_time = time.monotonic()
+        else:
+            self.tracker.predict()
+        packet.tracks = self.tracker.active_tracks()
+
+    def inference_loop(self):
+        """Inference stage: run the detector on captured frames"""
+        try:
+            reached_end = False
+            while not reached_end and not self.stop_event.is_set():
+                packets, reached_end = self.next_batch()
+                if not packets:
+                    continue
+
+                try:
+                    if self.tracker is not None:
+                        for packet in packets:
+                            self.track(packet)
+                    else:
+                        self.detect(packets)
+                except Exception as e:
+                    self.report_error(f"Detection error: {str(e)}")
+                    break
+
+                for packet in packets:
+                    if not self.render_queue.put(packet, self.stop_event):
+                        break
+        finally:
+            self.render_queue.put(END_OF_STREAM, self.stop_event)
+
+    def render(self, packet):
+        """Annotate one frame from its detector results or carried tracks"""
+        if packet.tracks is not None:
+            boxes, class_ids, confidences, track_ids = packet.tracks
+            with self.model_handler.monitor.measure('plot'):
+                return ImageProcessor.draw_detections(packet.image, boxes, class_ids,
+                                                      confidences, self.names, track_ids)
+        # Results may be reused from an earlier, unchanged frame, so draw
+        # them on this frame's image
+        return self.model_handler.get_annotated_image(packet.results, packet.image)
+
+    def packet_detections(self, packet):
+        """Detections of one frame, from its results or tracks"""
+        if packet.tracks is None:
+            return ResultsAnalyzer.extract_detections(packet.results)
+        boxes, class_ids, confidences, track_ids = packet.tracks
+        return Detections(boxes, class_ids, confidences, self.names, track_ids)
+
+    def render_loop(self):
+        """Render stage: annotate frames and hand them to on_frame"""
+        try:
+            while not self.stop_event.is_set():
+                packet = self.render_queue.get(self.stop_event)
+                if packet is END_OF_STREAM:
+                    break
+                self.frames_processed += 1
+                detections = self.packet_detections(packet)
+                self.model_handler.statistics.update(detections)
+                if self.detection_writer is not None:
+                    self.detection_writer.write(str(self.source), packet.index,
+                                                packet.timestamp, detections,
+                                                packet.image.shape)
+                if self.on_frame is None and self.video_writer is None:
+                    continue
+
+                annotated_frame = self.render(packet)
+                if self.video_writer is not None:
+                    self.video_writer.write(annotated_frame, packet.timestamp)
+                if self.on_frame is not None:
+                    self.on_frame(annotated_frame)
+        except Exception as e:
+            self.report_error(f"Rendering error: {str(e)}")
+
+    def run(self):
+        """Run all stages until the source ends or stop() is called"""
+        cap = open_capture(self.source)
+        try:
+            if not cap.isOpened():
+                self.report_error("Failed to open video source")
+                return
+
+            if self.output_path:
+                # Encoding runs on its own thread; sources that never drop
+                # frames wait for it rather than lose frames in the export
+                self.video_writer = AsyncVideoWriter(
+                    self.output_path, cap.get(cv2.CAP_PROP_FPS),
+                    block=self.render_queue.drop_policy == NEVER_DROP
+                ).start()
+
+            capture_thread = threading.Thread(target=self.capture_loop, args=(cap,),
+                                              daemon=True)
+            render_thread = threading.Thread(target=self.render_loop, daemon=True)
+            capture_thread.start()
+            render_thread.start()
+
+            self.inference_loop()
+
+            render_thread.join()
+            self.stop_event.set()
+            capture_thread.join()
+        finally:
+            cap.release()
+            if self.video_writer is not None:
+                error = self.video_writer.close()
+                self.export_dropped = self.video_writer.dropped
+                if error and self.on_error:
+                    self.on_error(f"Video export error: {error}")
+
+    def stop(self):
+        """Stop all stages"""
+        self.stop_event.set()
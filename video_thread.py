@@ -1,11 +1,12 @@
 """
-Video Processing Thread
-Handles video/camera processing in separate thread for UI responsiveness
+Video Processing Threads
+Handles video/camera processing in separate threads for UI responsiveness
 """
 
-import cv2
 import numpy as np
 from PyQt5.QtCore import QThread, pyqtSignal
+from multi_stream import MultiStreamEngine
+from video_pipeline import VideoPipeline
 
 
 class VideoThread(QThread):
@@ -15,50 +16,82 @@ class VideoThread(QThread):
     finished = pyqtSignal()  # Emits when processing complete
     error_occurred = pyqtSignal(str)  # Emits error messages
     
-    def __init__(self, source, model_handler):
+    def __init__(self, source, model_handler, output_path=None):
         """
         Initialize video thread
         
         Args:
             source: Video file path or camera index (0 for default camera)
             model_handler: ModelHandler instance for inference
+            output_path: Optional path to save the annotated video to
         """
         super().__init__()
         self.source = source
         self.model_handler = model_handler
         self.running = True
+        self.pipeline = VideoPipeline(
+            source, model_handler,
+            on_frame=self.frame_ready.emit,
+            on_error=self.error_occurred.emit,
+            output_path=output_path
+        )
         
     def run(self):
         """Process video frames in separate thread"""
-        cap = None
         try:
-            cap = cv2.VideoCapture(self.source)
-            
-            if not cap.isOpened():
-                self.error_occurred.emit("Failed to open video source")
-                return
-            
-            while self.running and cap.isOpened():
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                    
-                # Run YOLO detection
-                try:
-                    results = self.model_handler.predict(frame)
-                    annotated_frame = self.model_handler.get_annotated_image(results)
-                    self.frame_ready.emit(annotated_frame)
-                except Exception as e:
-                    self.error_occurred.emit(f"Detection error: {str(e)}")
-                    break
-                    
+            # Capture and rendering run on their own threads; inference
+            # runs on this one
+            if self.running:
+                self.pipeline.run()
         except Exception as e:
             self.error_occurred.emit(f"Video processing error: {str(e)}")
         finally:
-            if cap is not None:
-                cap.release()
             self.finished.emit()
         
     def stop(self):
         """Stop video processing"""
-        self.running = False
\ No newline at end of file
+        self.running = False
+        self.pipeline.stop()
+
+class MultiStreamThread(QThread):
+    """Worker thread running several sources on one shared model"""
+    
+    frame_ready = pyqtSignal(int, np.ndarray)  # Emits (stream id, processed frame)
+    finished = pyqtSignal()  # Emits when all streams are complete
+    error_occurred = pyqtSignal(str)  # Emits error messages
+    
+    def __init__(self, sources, model_handler):
+        """
+        Initialize multi-stream thread
+        
+        Args:
+            sources: List of video file paths and/or camera indices; stream
+                ids in frame_ready follow this order
+            model_handler: ModelHandler instance shared by all streams
+        """
+        super().__init__()
+        self.engine = MultiStreamEngine(model_handler, on_error=self.forward_error)
+        for source in sources:
+            stream_id = len(self.engine.streams)
+            self.engine.add_stream(
+                source,
+                lambda frame, stream_id=stream_id: self.frame_ready.emit(stream_id, frame)
+            )
+        
+    def forward_error(self, stream_id, message):
+        """Emit engine error with its stream id"""
+        prefix = f"Stream {stream_id}: " if stream_id is not None else ""
+        self.error_occurred.emit(prefix + message)
+        
+    def run(self):
+        """Process all streams in separate thread"""
+        try:
+            self.engine.run()
+        except Exception as e:
+            self.error_occurred.emit(f"Video processing error: {str(e)}")
+        finally:
+            self.finished.emit()
+        
+    def stop(self):
+        """Stop all streams"""
+        self.engine.stop()
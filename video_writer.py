@@ -0,0 +1,130 @@
+"""
+Asynchronous Video Writer
+Encodes annotated frames on a dedicated thread so export never slows detection
+"""
+
+import queue
+import threading
+
+import cv2
+from config import VIDEO_WRITER_QUEUE_SIZE, VIDEO_FOURCC, DEFAULT_OUTPUT_FPS
+
+END_OF_STREAM = object()
+
+
+class AsyncVideoWriter:
+    """cv2.VideoWriter fed through a bounded queue by a background thread"""
+
+    def __init__(self, output_path, fps=None, queue_size=None, fourcc=None, block=False):
+        """
+        Initialize video writer
+
+        Args:
+            output_path: Path of the video file to write
+            fps: Output frame rate, normally the source FPS (defaults to
+                DEFAULT_OUTPUT_FPS when unknown)
+            queue_size: Frames buffered before write() starts dropping or
+                blocking (defaults to VIDEO_WRITER_QUEUE_SIZE)
+            fourcc: Four-character codec code (defaults to VIDEO_FOURCC)
+            block: Wait for the encoder instead of dropping frames; for
+                sources that already accept backpressure, such as video files
+        """
+        self.output_path = str(output_path)
+        self.fps = fps if fps and fps > 0 else DEFAULT_OUTPUT_FPS
+        self.fourcc = fourcc or VIDEO_FOURCC
+        self.block = block
+        self.queue = queue.Queue(maxsize=queue_size or VIDEO_WRITER_QUEUE_SIZE)
+        self.thread = threading.Thread(target=self.encode_loop, daemon=True)
+        self.writer = None
+        self.last_frame = None
+        self.first_timestamp = None
+        self.frames_written = 0
+        self.dropped = 0
+        self.error = None
+
+    def start(self):
+        """Start the encoder thread"""
+        self.thread.start()
+        return self
+
+    def write(self, frame, timestamp=None):
+        """
+        Queue a frame
+
+        When the encoder falls behind, a blocking writer waits for it. A
+        non-blocking writer drops the frame instead; its slot in the output
+        is filled by repeating the previous frame, so the output keeps the
+        source timing. Frames offered after the encoder thread stopped on
+        an error count as dropped.
+
+        Args:
+            frame: Annotated frame (BGR numpy array)
+            timestamp: Source timestamp in seconds (optional; frames without
+                one are written back to back)
+
+        Returns:
+            True if queued, False if dropped
+        """
+        while True:
+            try:
+                self.queue.put((frame, timestamp), timeout=0.1 if self.block else None,
+                               block=self.block)
+                return True
+            except queue.Full:
+                if not self.block or not self.thread.is_alive():
+                    self.dropped += 1
+                    return False
+
+    def open_writer(self, frame):
+        """Create the cv2.VideoWriter sized to the first frame"""
+        height, width = frame.shape[:2]
+        self.writer = cv2.VideoWriter(self.output_path,
+                                      cv2.VideoWriter_fourcc(*self.fourcc),
+                                      self.fps, (width, height))
+        if not self.writer.isOpened():
+            raise IOError(f"Failed to open video writer for {self.output_path}")
+
+    def encode(self, frame, timestamp):
+        """Write frame at the slot matching its timestamp"""
+        if self.writer is None:
+            self.open_writer(frame)
+
+        if timestamp is not None:
+            if self.first_timestamp is None:
+                self.first_timestamp = timestamp
+
+            # Repeat the previous frame over slots left by dropped frames
+            slot = int(round((timestamp - self.first_timestamp) * self.fps))
+            while self.last_frame is not None and self.frames_written < slot:
+                self.writer.write(self.last_frame)
+                self.frames_written += 1
+
+        self.writer.write(frame)
+        self.frames_written += 1
+        self.last_frame = frame
+
+    def encode_loop(self):
+        """Encoder thread: write queued frames until close()"""
+        try:
+            while True:
+                item = self.queue.get()
+                if item is END_OF_STREAM:
+                    break
+                self.encode(*item)
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            if self.writer is not None:
+                self.writer.release()
+
+    def close(self):
+        """
+        Flush queued frames and finish the file
+
+        Returns:
+            Error message, or None if the video was written successfully
+        """
+        if self.thread.is_alive():
+            self.queue.put(END_OF_STREAM)
+            self.thread.join()
+        return self.error